@@ -1,22 +1,83 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Blueprint, Request, current_app, request, g, has_request_context, jsonify, send_file, send_from_directory, stream_with_context, abort
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
+from sqlalchemy import tuple_
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError, TimeoutError as PoolTimeoutError
+from datetime import date, datetime, timedelta
 import os
+import base64
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
 import json
-
-app = Flask(__name__, static_folder='static', static_url_path='')
-CORS(app)
+import hashlib
+import sqlite3
+import mimetypes
+import tempfile
+import csv
+import io
+import functools
+import importlib.util
+import contextlib
+import threading
+import queue
+import random
+import select
+import time
+import re
+import heapq
+import multiprocessing
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from text_extraction import extract_document
+from task_graph import HOURS_PER_DAY, DependencyCycleError, find_cycle, schedule
+from metrics import Registry, SIZE_BUCKETS, COUNT_BUCKETS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# openpyxl is optional and slow to import, so it is loaded by the first XLSX import
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+
+# Read replica routing: GET requests read through this bind when DATABASE_REPLICA_URL is set
+REPLICA_BIND = 'replica'
+# GET endpoints that must see the latest commit: sync cursors, resumable upload offsets, job status, liveness of the primary
+PRIMARY_READ_ENDPOINTS = {'get_changes', 'event_stream', 'get_upload', 'get_job', 'health_check'}
+
+
+def reads_from_replica():
+    return (has_request_context() and request.method in ('GET', 'HEAD')
+            and endpoint_name(request.endpoint) not in PRIMARY_READ_ENDPOINTS)
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of GET requests to the replica bind, when one is configured"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # Flushes and DML always go to the primary, even from a GET handler
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False) and reads_from_replica():
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# Extensions are bound in create_app(); importing this module never touches the database
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
+jwt = JWTManager()
+api = Blueprint('api', __name__)
 
 # JWT Configuration
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-jwt = JWTManager(app)
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 
 # Database configuration
 # Default to Railway PostgreSQL database URL if env var not set
@@ -26,27 +87,311 @@ DATABASE_URL = os.getenv('DATABASE_URL', RAILWAY_POSTGRES_URL)
 # Handle PostgreSQL URL format for older drivers
 if DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
-app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Log database configuration (for debugging - remove in production)
-print(f"=== DATABASE CONFIGURATION ===")
-print(f"Database URL: {DATABASE_URL[:50]}..." if len(DATABASE_URL) > 50 else DATABASE_URL)
-print(f"Using PostgreSQL: {'postgresql://' in DATABASE_URL.lower() or 'postgres://' in DATABASE_URL.lower()}")
-print(f"Full URL: {DATABASE_URL}")
-print(f"===============================")
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL and DATABASE_REPLICA_URL.startswith('postgres://'):
+    DATABASE_REPLICA_URL = DATABASE_REPLICA_URL.replace('postgres://', 'postgresql://', 1)
+
+# Connection pool, per worker process and per database. Railway's TCP proxy drops idle
+# connections, so they are recycled before that happens and pinged on checkout.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 300))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() not in ('0', 'false', 'no')
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 10))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout waits, timeouts and new connections to /api/metrics"""
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, **kwargs):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        self.label = self.logging_name or 'primary'
+        self.capacity = pool_size + max_overflow if max_overflow >= 0 else float('inf')
+        # recreate() (after a dispose) hands the existing listeners over in _dispatch
+        if '_dispatch' not in kwargs:
+            db.event.listen(self, 'connect', self.count_connection)
+
+    def count_connection(self, dbapi_connection, connection_record):
+        POOL_CONNECTS.inc(pool=self.label)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc(pool=self.label)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=self.label)
+
+
+def engine_options(url, name):
+    """create_engine() arguments for one database; name labels its pool metrics"""
+    url = make_url(url)
+    options = {'pool_pre_ping': DB_POOL_PRE_PING, 'pool_recycle': DB_POOL_RECYCLE,
+               'pool_logging_name': name, 'connect_args': {}}
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # Flask-SQLAlchemy gives in-memory SQLite a single shared connection
+        return options
+    options.update(poolclass=InstrumentedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                   pool_timeout=DB_POOL_TIMEOUT,
+                   # Reusing the most recent connection lets the surplus ones idle out and get recycled
+                   pool_use_lifo=True)
+    if url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'connect_timeout': DB_CONNECT_TIMEOUT}
+    return options
+
+
+@db.event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite enforces foreign keys, and so ON DELETE CASCADE, only when each connection asks
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
+
+# Alembic revisions, applied by run_migrations.py
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
 
 # File upload configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'xls', 'xlsx', 'png', 'jpg', 'jpeg', 'gif'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Create upload folder if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+
+# Endpoints that spool large bodies to disk get their own size limit
+MAX_IMPORT_SIZE = int(os.getenv('MAX_IMPORT_SIZE', 512 * 1024 * 1024))
+MAX_UPLOAD_CHUNK_SIZE = int(os.getenv('MAX_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+ENDPOINT_BODY_LIMITS = {
+    'import_records': MAX_IMPORT_SIZE,
+    'put_upload_chunk': MAX_UPLOAD_CHUNK_SIZE,
+}
+
+# Document delivery: '' streams from Python, 'x-sendfile' (Apache/lighttpd) or
+# 'x-accel-redirect' (nginx) hand the file to the front proxy instead
+DOCUMENT_SENDFILE_MODE = os.getenv('DOCUMENT_SENDFILE_MODE', '').lower()
+DOCUMENT_ACCEL_PREFIX = os.getenv('DOCUMENT_ACCEL_PREFIX', '/protected-uploads/')
+DOCUMENT_CACHE_MAX_AGE = int(os.getenv('DOCUMENT_CACHE_MAX_AGE', 3600))
+
+# Resumable uploads assemble files from chunks, so they can exceed MAX_CONTENT_LENGTH
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 1024 * 1024 * 1024))
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+
+def endpoint_name(endpoint):
+    """View function name without the blueprint prefix"""
+    return (endpoint or 'unmatched').rpartition('.')[2]
+
+
+class SizeLimitedRequest(Request):
+    @property
+    def max_content_length(self):
+        name = endpoint_name(self.endpoint)
+        if name in ENDPOINT_BODY_LIMITS:
+            return ENDPOINT_BODY_LIMITS[name]
+        return super().max_content_length
+
+
+# Request instrumentation, exposed at /api/metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# Requests slower than this many seconds are logged with their slowest SQL statements (unset: off)
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', 0)) or None
+SLOW_LOG_STATEMENTS = 10
+# A SELECT run this many times in one request is logged as a likely N+1 pattern
+REPEATED_QUERY_THRESHOLD = int(os.getenv('REPEATED_QUERY_THRESHOLD', 10))
+UPLOAD_ENDPOINTS = {'upload_document', 'put_upload_chunk', 'import_records'}
+DOWNLOAD_ENDPOINTS = {'download_document', 'view_document', 'view_document_with_token'}
+
+metrics = Registry()
+REQUEST_COUNT = metrics.counter('http_requests_total', 'Requests handled', ('method', 'endpoint', 'status'))
+REQUEST_LATENCY = metrics.histogram(
+    'http_request_duration_seconds', 'Time from request start until the response body is sent', ('method', 'endpoint'))
+REQUESTS_IN_PROGRESS = metrics.gauge('http_requests_in_progress', 'Requests (including open streams) being served', ('endpoint',))
+RESPONSE_SIZE = metrics.histogram('http_response_size_bytes', 'Response body size', ('endpoint',), SIZE_BUCKETS)
+REQUEST_QUERIES = metrics.histogram('http_request_db_queries', 'SQL statements executed per request', ('endpoint',), COUNT_BUCKETS)
+REQUEST_DB_TIME = metrics.histogram('http_request_db_seconds', 'Time spent in SQL statements per request', ('endpoint',))
+SLOW_REQUESTS = metrics.counter('http_slow_requests_total', 'Requests slower than SLOW_REQUEST_SECONDS', ('endpoint',))
+REPEATED_QUERIES = metrics.counter(
+    'http_repeated_queries_total', 'Requests that ran one SELECT at least REPEATED_QUERY_THRESHOLD times', ('endpoint',))
+DB_QUERIES = metrics.counter('db_queries_total', 'SQL statements executed, including background work')
+DB_TIME = metrics.counter('db_query_seconds_total', 'Time spent in SQL statements, including background work')
+UPLOAD_BYTES = metrics.counter('document_upload_bytes_total', 'Request body bytes received by upload and import endpoints')
+DOWNLOAD_BYTES = metrics.counter('document_download_bytes_total', 'Document bytes sent by the app (not by a sendfile proxy)')
+CLEANUP_FILES_REMOVED = metrics.counter('cleanup_files_removed_total', 'Blob and upload files removed by cleanup jobs')
+JOB_RUNS = metrics.counter('jobs_total', 'Job attempts by outcome: succeeded, retried or failed', ('kind', 'outcome'))
+JOB_DURATION = metrics.histogram('job_duration_seconds', 'Time spent running one job attempt', ('kind',))
+POOL_CHECKOUT_WAIT = metrics.histogram('db_pool_checkout_seconds', 'Time spent waiting for a pooled connection', ('pool',))
+POOL_TIMEOUTS = metrics.counter('db_pool_checkout_timeouts_total', 'Checkouts that gave up after DB_POOL_TIMEOUT', ('pool',))
+POOL_CONNECTS = metrics.counter('db_pool_connections_opened_total', 'New database connections, including reconnects', ('pool',))
+POOL_CONNECTIONS = metrics.gauge('db_pool_connections', 'Pooled connections in use or idle when scraped', ('pool', 'state'))
+POOL_CAPACITY = metrics.gauge('db_pool_max_connections', 'DB_POOL_SIZE + DB_MAX_OVERFLOW', ('pool',))
+
+
+# Bound parameters and literal lists vary between runs of the same query; fingerprints ignore them
+PARAMETER_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|\d+))*\s*\)')
+PARAMETER = re.compile(r'%\(\w+\)s|\b\d+\b')
+
+
+def statement_fingerprint(statement):
+    statement = ' '.join(statement.split())
+    return PARAMETER.sub('?', PARAMETER_LIST.sub('(?)', statement))
+
+
+class QueryProfile:
+    """SQL activity of one request or query_budget block.
+    
+    Kept on the profile rather than the request context so statements run while streaming a body are counted too.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        self.slowest = []  # min-heap of (seconds, sequence, statement)
+
+    def record(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        self.fingerprints[statement_fingerprint(statement)] += 1
+        if SLOW_REQUEST_SECONDS:
+            entry = (elapsed, self.queries, statement)
+            if len(self.slowest) < SLOW_LOG_STATEMENTS:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def repeated(self, threshold):
+        """SELECT fingerprints run at least `threshold` times, most frequent first"""
+        return [(fingerprint, count) for fingerprint, count in self.fingerprints.most_common()
+                if count >= threshold and fingerprint.upper().startswith('SELECT')]
+
+    def report(self):
+        lines = [f"{self.queries} queries, {self.db_time:.3f}s in SQL"]
+        for fingerprint, count in self.fingerprints.most_common():
+            lines.append(f"  {count} x {fingerprint}")
+        return '\n'.join(lines)
+
+
+# Profiles opened by query_budget in this thread
+active_profiles = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextlib.contextmanager
+def query_budget(max_queries, max_repeats=None):
+    """Fail the enclosed block if it runs more than max_queries statements, or any SELECT more than max_repeats times.
+    
+    Meant for tests: wrap a test client request to pin down the number of queries an endpoint needs.
+    """
+    profile = QueryProfile()
+    stack = active_profiles.__dict__.setdefault('stack', [])
+    stack.append(profile)
+    try:
+        yield profile
+    finally:
+        stack.remove(profile)
+    if profile.queries > max_queries:
+        raise QueryBudgetExceeded(f"Expected at most {max_queries} queries, ran {profile.report()}")
+    if max_repeats is not None and profile.repeated(max_repeats + 1):
+        raise QueryBudgetExceeded(f"Expected no SELECT to run more than {max_repeats} times, ran {profile.report()}")
+
+
+@db.event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@db.event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    DB_QUERIES.inc()
+    DB_TIME.inc(elapsed)
+    stats = g.get('request_stats') if has_request_context() else None
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for profile in getattr(active_profiles, 'stack', ()):
+        profile.record(statement, elapsed)
+
+
+@db.event.listens_for(Engine, 'handle_error')
+def discard_query_timer(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def count_streamed_bytes(response, endpoint):
+    chunks = response.response
+    
+    def counted():
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+                yield chunk
+        finally:
+            RESPONSE_SIZE.observe(size, endpoint=endpoint)
+            if hasattr(chunks, 'close'):
+                chunks.close()
+    
+    response.response = counted()
+
+
+def finish_request(stats, method, endpoint, path, streaming_events):
+    duration = time.perf_counter() - stats.started
+    REQUESTS_IN_PROGRESS.dec(endpoint=endpoint)
+    # An event stream lasts as long as the client stays connected, which says nothing about latency
+    if not streaming_events:
+        REQUEST_LATENCY.observe(duration, method=method, endpoint=endpoint)
+    REQUEST_QUERIES.observe(stats.queries, endpoint=endpoint)
+    REQUEST_DB_TIME.observe(stats.db_time, endpoint=endpoint)
+    if SLOW_REQUEST_SECONDS and duration >= SLOW_REQUEST_SECONDS and not streaming_events:
+        SLOW_REQUESTS.inc(endpoint=endpoint)
+        lines = [f"Slow request: {method} {path} took {duration:.3f}s "
+                 f"({stats.queries} queries, {stats.db_time:.3f}s in SQL)"]
+        for elapsed, _, statement in sorted(stats.slowest, reverse=True):
+            lines.append(f"  {elapsed:.3f}s  {' '.join(statement.split())}")
+        print('\n'.join(lines))
+    repeated = stats.repeated(REPEATED_QUERY_THRESHOLD)
+    if repeated:
+        REPEATED_QUERIES.inc(endpoint=endpoint)
+        lines = [f"Repeated queries (possible N+1): {method} {path}"]
+        lines.extend(f"  {count} x {fingerprint}" for fingerprint, count in repeated)
+        print('\n'.join(lines))
+
+
+@api.before_app_request
+def start_request_stats():
+    g.request_stats = QueryProfile()
+    REQUESTS_IN_PROGRESS.inc(endpoint=endpoint_name(request.endpoint))
+
+
+@api.after_app_request
+def record_request_stats(response):
+    stats = g.get('request_stats')
+    if stats is None:
+        return response
+    endpoint = endpoint_name(request.endpoint)
+    REQUEST_COUNT.inc(method=request.method, endpoint=endpoint, status=str(response.status_code))
+    
+    if endpoint in UPLOAD_ENDPOINTS:
+        UPLOAD_BYTES.inc(request.content_length or 0)
+    if endpoint in DOWNLOAD_ENDPOINTS and response.status_code in (200, 206):
+        DOWNLOAD_BYTES.inc(response.content_length or 0)
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, endpoint=endpoint)
+    elif response.is_streamed:
+        count_streamed_bytes(response, endpoint)
+    
+    streaming_events = response.mimetype == 'text/event-stream'
+    response.call_on_close(functools.partial(
+        finish_request, stats, request.method, endpoint, request.path, streaming_events))
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -65,10 +410,24 @@ class Entity(db.Model):
     status = db.Column(db.String(50), default='active')
     date_of_incorporation = db.Column(db.Date)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every change to the entity or its accounts, tasks and documents; backs the ETags
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    accounts = db.relationship('Account', backref='entity', lazy=True, cascade='all, delete-orphan')
-    tasks = db.relationship('Task', backref='entity', lazy=True, cascade='all, delete-orphan')
-    documents = db.relationship('Document', backref='entity', lazy=True, cascade='all, delete-orphan')
+    __table_args__ = (
+        db.Index('ix_entity_created_at_id', 'created_at', 'id'),
+        db.Index('ix_entity_updated_at', 'updated_at'),
+        db.Index('ix_entity_name_id', 'name', 'id'),
+        db.Index('ix_entity_status_created_at_id', 'status', 'created_at', 'id'),
+        db.Index('ix_entity_state_created_at_id', 'state_of_incorporation', 'created_at', 'id'),
+        # Imports match existing entities by EIN
+        db.Index('ix_entity_ein', 'ein'),
+    )
+    
+    # The foreign keys cascade deletes in the database, so deleting an entity never loads its children
+    accounts = db.relationship('Account', backref='entity', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    tasks = db.relationship('Task', backref='entity', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    documents = db.relationship('Document', backref='entity', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -81,13 +440,23 @@ class Entity(db.Model):
             'state_of_incorporation': self.state_of_incorporation,
             'status': self.status,
             'date_of_incorporation': self.date_of_incorporation.isoformat() if self.date_of_incorporation else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version
         }
 
 
+# Case-insensitive name prefix search (text_pattern_ops lets Postgres use it for LIKE 'abc%')
+db.Index(
+    'ix_entity_name_lower',
+    db.func.lower(Entity.name).label('name_lower'),
+    postgresql_ops={'name_lower': 'text_pattern_ops'}
+)
+
+
 class Account(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id'), nullable=False)
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), nullable=False)
     account_name = db.Column(db.String(100), nullable=False)
     account_number = db.Column(db.String(50))
     balance = db.Column(db.Float, default=0.0)
@@ -98,6 +467,11 @@ class Account(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Serves the per-entity listing and the import's (entity_id, account_number) match
+        db.Index('ix_account_entity_id_number', 'entity_id', 'account_number'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -116,7 +490,7 @@ class Account(db.Model):
 
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id'), nullable=False)
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     status = db.Column(db.String(50), default='pending')
@@ -131,6 +505,12 @@ class Task(db.Model):
     dependencies = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_task_entity_id_status_due_date', 'entity_id', 'status', 'due_date'),
+        # Dependencies and imports look tasks up by title within an entity
+        db.Index('ix_task_entity_id_title', 'entity_id', 'title'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -151,15 +531,33 @@ class Task(db.Model):
         }
 
 
+class TaskDependency(db.Model):
+    """Edge meaning task_id cannot start until depends_on_id is done"""
+    __tablename__ = 'task_dependency'
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True)
+    depends_on_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True, index=True)
+    # Denormalized so a whole entity's graph loads with one indexed query
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), nullable=False, index=True)
+
+
 class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id'), nullable=False)
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     file_path = db.Column(db.String(500))
     original_filename = db.Column(db.String(500))
     document_type = db.Column(db.String(100))
     file_size = db.Column(db.Integer)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # SHA-256 of the stored content; null for files uploaded before content-addressed storage
+    content_hash = db.Column(db.String(64), index=True)
+    
+    __table_args__ = (
+        db.Index('ix_document_entity_id_uploaded_at', 'entity_id', 'uploaded_at'),
+    )
+    
+    extracted_text = db.relationship('DocumentText', uselist=False, lazy=True, cascade='all, delete-orphan',
+                                     passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -174,6 +572,147 @@ class Document(db.Model):
         }
 
 
+class DocumentText(db.Model):
+    """Text extracted from a document's file by the background pipeline"""
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id', ondelete='CASCADE'), primary_key=True)
+    # pending -> done | failed | unsupported
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    content = db.Column(db.Text)
+    error = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'document_id': self.document_id,
+            'status': self.status,
+            'error': self.error,
+            'characters': len(self.content) if self.content else 0,
+            'content': self.content,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class Blob(db.Model):
+    """A content-addressed upload shared by every Document with the same SHA-256"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    file_path = db.Column(db.String(500), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class UploadSession(db.Model):
+    """A resumable upload being assembled in uploads/tmp/<id>.part"""
+    id = db.Column(db.String(32), primary_key=True)
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    original_filename = db.Column(db.String(500), nullable=False)
+    document_type = db.Column(db.String(100))
+    size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'entity_id': self.entity_id,
+            'original_filename': self.original_filename,
+            'size': self.size,
+            'offset': self.received,
+            'chunk_size': MAX_UPLOAD_CHUNK_SIZE,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class EntityRollup(db.Model):
+    """Running account, task and document totals for one entity, maintained by deltas on every write"""
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), primary_key=True)
+    account_count = db.Column(db.Integer, nullable=False, default=0)
+    total_balance = db.Column(db.Float, nullable=False, default=0.0)
+    task_count = db.Column(db.Integer, nullable=False, default=0)
+    document_count = db.Column(db.Integer, nullable=False, default=0)
+    document_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class TaskRollup(db.Model):
+    """Task counts per entity, status and priority ('' when unset)"""
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    priority = db.Column(db.String(50), primary_key=True)
+    task_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TaskDueRollup(db.Model):
+    """Open (not completed) tasks per entity and due date, so overdue counts never scan the task table"""
+    entity_id = db.Column(db.Integer, db.ForeignKey('entity.id', ondelete='CASCADE'), primary_key=True)
+    due_date = db.Column(db.Date, primary_key=True)
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ChangeLog(db.Model):
+    """Append-only feed of record writes; its id is the cursor clients sync from"""
+    __tablename__ = 'change_log'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    # Null for deletions, whose row is already gone when they are logged
+    entity_id = db.Column(db.Integer)
+    # upsert | delete, or 'pruned' for the marker left where older entries were removed
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+def search_vector(title_terms, body_terms):
+    """Weighted tsvector over the search columns; Postgres indexes and queries this exact expression"""
+    return db.func.setweight(
+        db.func.to_tsvector(db.literal_column("'simple'"), title_terms), db.literal_column("'A'")
+    ).op('||')(db.func.setweight(
+        db.func.to_tsvector(db.literal_column("'simple'"), body_terms), db.literal_column("'B'")
+    ))
+
+
+class SearchIndex(db.Model):
+    """One row per searchable record, holding normalized terms for the full-text index"""
+    __tablename__ = 'search_index'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False, index=True)
+    label = db.Column(db.String(500))
+    title_terms = db.Column(db.Text, nullable=False, default='')
+    body_terms = db.Column(db.Text, nullable=False, default='')
+    
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'record_id', name='uq_search_index_kind_record'),
+        db.Index(
+            'ix_search_index_vector', search_vector(title_terms, body_terms), postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+    )
+
+
+SEARCH_VECTOR = search_vector(SearchIndex.title_terms, SearchIndex.body_terms)
+
+# SQLite: an external-content FTS5 table kept in step with search_index by triggers
+for statement in (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title_terms, body_terms, content='search_index', content_rowid='id', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS search_index_ai AFTER INSERT ON search_index BEGIN
+        INSERT INTO search_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_index_ad AFTER DELETE ON search_index BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_index_au AFTER UPDATE ON search_index BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+        INSERT INTO search_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END""",
+):
+    db.event.listen(SearchIndex.__table__, 'after_create', db.DDL(statement).execute_if(dialect='sqlite'))
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -188,8 +727,870 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
 
+class Job(db.Model):
+    """A unit of background work, claimed from this table by the job workers of any process"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON arguments for the handler
+    # queued -> running -> succeeded | failed; a failed attempt with retries left goes back to queued
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    priority = db.Column(db.Integer, nullable=False, default=0)  # higher runs first
+    # Client- or server-chosen key; enqueueing the same key again returns the existing job
+    idempotency_key = db.Column(db.String(200), unique=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not before; pushed back by retries
+    # A running job whose worker died is claimed again once its lease runs out
+    locked_until = db.Column(db.DateTime)
+    result = db.Column(db.Text)  # JSON returned by the handler
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Workers look for the most urgent due job
+        db.Index('ix_job_status_priority_run_at', 'status', 'priority', 'run_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+# Alembic revision run_migrations.py upgrades to; keep it at the head of migrations/versions
+SCHEMA_REVISION = '0007'
+
+
+# Column projection for list endpoints: selects plain row tuples instead of
+# hydrating ORM instances, and serializes only the requested fields
+def isoformat_or_none(value):
+    return value.isoformat() if value else None
+
+
+def json_or_none(value):
+    return json.loads(value) if value else None
+
+
+class Projection:
+    def __init__(self, model, fields, converters=None):
+        self.model = model
+        self.field_names = list(fields)
+        self.columns = {name: getattr(model, name) for name in self.field_names}
+        self.converters = {}
+        for name, column in self.columns.items():
+            if isinstance(column.type, (db.Date, db.DateTime)):
+                self.converters[name] = isoformat_or_none
+        self.converters.update(converters or {})
+    
+    def parse_fields(self, raw):
+        """Parse a ?fields=a,b,c value, defaulting to every field"""
+        if not raw:
+            return self.field_names
+        fields = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+        unknown = [name for name in fields if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+    
+    def select(self, fields, extra=()):
+        """Build a SELECT of the requested columns, plus any extra ones needed internally"""
+        names = list(dict.fromkeys([*fields, *extra]))
+        return db.select(*(self.columns[name] for name in names)), names
+    
+    def serialize(self, rows, names, fields):
+        """Turn row tuples selected with `names` into dicts holding only `fields`"""
+        plan = [(name, names.index(name), self.converters.get(name)) for name in fields]
+        return [
+            {name: convert(row[i]) if convert else row[i] for name, i, convert in plan}
+            for row in rows
+        ]
+
+
+ENTITY_PROJECTION = Projection(Entity, [
+    'id', 'name', 'description', 'ein', 'registered_address', 'registered_phone',
+    'state_of_incorporation', 'status', 'date_of_incorporation', 'created_at', 'updated_at', 'version'
+])
+ACCOUNT_PROJECTION = Projection(Account, [
+    'id', 'entity_id', 'account_name', 'account_number', 'balance', 'account_type',
+    'username', 'password', 'account_url', 'notes', 'created_at'
+])
+TASK_PROJECTION = Projection(Task, [
+    'id', 'entity_id', 'title', 'description', 'status', 'priority', 'due_date', 'category',
+    'assigned_to', 'estimated_hours', 'actual_hours', 'start_date', 'completion_date',
+    'dependencies', 'created_at'
+], converters={'dependencies': json_or_none})
+DOCUMENT_PROJECTION = Projection(Document, [
+    'id', 'entity_id', 'title', 'file_path', 'original_filename', 'document_type',
+    'file_size', 'uploaded_at'
+])
+
+
+def dumps_json(payload):
+    """Encode to compact JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps_json(payload), status=status, mimetype='application/json')
+
+
+def list_entity_children(projection, entity_id, fields, limit=None):
+    """Select one entity's child rows in id order as serialized dicts"""
+    model = projection.model
+    stmt, names = projection.select(fields)
+    stmt = stmt.where(model.entity_id == entity_id).order_by(model.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.session.execute(stmt).all()
+    return projection.serialize(rows, names, fields)
+
+
+def list_entity_collections(entity_id, limits):
+    """The first rows of several of an entity's child collections in one UNION ALL.
+    
+    `limits` maps ENTITY_COLLECTIONS names to row limits; returns {name: serialized rows}.
+    Each branch fills its own collection's columns and typed NULLs in the others', so
+    the branches line up column for column on every database.
+    """
+    columns, starts = [], {}
+    for name in limits:
+        starts[name] = len(columns)
+        columns += ENTITY_COLLECTIONS[name].columns.values()
+    
+    branches = []
+    for position, (name, limit) in enumerate(limits.items()):
+        projection = ENTITY_COLLECTIONS[name]
+        model = projection.model
+        stmt, names = projection.select(projection.field_names)
+        rows = stmt.where(model.entity_id == entity_id).order_by(model.id).limit(limit).subquery()
+        values = [db.cast(db.null(), column.type) for column in columns]
+        values[starts[name]:starts[name] + len(names)] = [rows.c[field] for field in names]
+        branches.append(db.select(
+            db.literal(position).label('collection'), rows.c.id.label('row_id'),
+            *(value.label(f'c{i}') for i, value in enumerate(values))
+        ))
+    
+    result = {name: [] for name in limits}
+    if not branches:
+        return result
+    grouped = defaultdict(list)
+    for row in db.session.execute(db.union_all(*branches).order_by('collection', 'row_id')):
+        grouped[row[0]].append(row[2:])
+    for position, name in enumerate(limits):
+        projection = ENTITY_COLLECTIONS[name]
+        start = starts[name]
+        rows = [row[start:start + len(projection.field_names)] for row in grouped[position]]
+        result[name] = projection.serialize(rows, projection.field_names, projection.field_names)
+    return result
+
+
+# Conditional GET: strong ETags derived from Entity.version, plus an in-process
+# LRU of encoded response bodies that write endpoints invalidate per entity
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+
+
+class ResponseCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (entity_id, etag, body)
+        self.keys_by_entity = {}      # entity_id (None for entity lists) -> set of keys
+        self.lock = threading.Lock()
+    
+    def get(self, key, etag):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] != etag:
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+    
+    def put(self, key, entity_id, etag, body):
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (entity_id, etag, body)
+            self.keys_by_entity.setdefault(entity_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._discard(next(iter(self.entries)))
+    
+    def invalidate(self, entity_id):
+        """Drop cached responses for one entity, or for the entity lists when entity_id is None"""
+        with self.lock:
+            for key in self.keys_by_entity.pop(entity_id, ()):
+                self.entries.pop(key, None)
+    
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            keys = self.keys_by_entity.get(entry[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_entity[entry[0]]
+
+
+def response_cache():
+    """This app's cache; each app gets its own, as bodies from different databases share keys"""
+    return current_app.extensions['response_cache']
+
+
+def entity_etag(entity_id, **kwargs):
+    """ETag for one entity's representations, 404 if it doesn't exist.
+    
+    Loads the whole row and keeps it as g.entity, so views behind this tag don't query it again.
+    """
+    entity = g.entity = db.session.get(Entity, entity_id)
+    if entity is None:
+        abort(404)
+    return entity_id, f'e{entity_id}v{entity.version}'
+
+
+def entity_list_etag(**kwargs):
+    """ETag for one entity list page: the ids and versions of the rows on it.
+    
+    Reads only the page, through the same index as the page itself, so the cost doesn't
+    grow with the portfolio. Any write to an entity bumps its version.
+    """
+    try:
+        sort_column, descending, limit = entity_list_order(request.args)
+        query = filter_entity_page(db.select(Entity.id, Entity.version), request.args, sort_column, descending, limit)
+    except ValueError:
+        # Bad parameters: the view reports them
+        return None, None
+    rows = db.session.execute(query).all()
+    digest = hashlib.sha1(','.join(f'{row_id}.{version}' for row_id, version in rows).encode()).hexdigest()
+    return None, f'l{digest}'
+
+
+def conditional_get(etag_fn):
+    """Serve a GET with a strong ETag, answering If-None-Match with 304 and reusing cached bodies"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            entity_id, tag = etag_fn(**kwargs)
+            if tag is None:
+                return view(**kwargs)
+            headers = {'ETag': f'"{tag}"', 'Cache-Control': 'private, no-cache'}
+            if request.if_none_match.contains(tag):
+                return current_app.response_class(status=304, headers=headers)
+            
+            key = request.full_path
+            body = response_cache().get(key, tag)
+            if body is None:
+                response = view(**kwargs)
+                if not isinstance(response, current_app.response_class) or response.status_code != 200:
+                    return response
+                body = response.get_data()
+                response_cache().put(key, entity_id, tag, body)
+            return current_app.response_class(body, mimetype='application/json', headers=headers)
+        return wrapper
+    return decorator
+
+
+def mark_entities_changed(*entity_ids, listing=False):
+    """Bump the version of entities whose data changed and drop their cached responses.
+    
+    Call before committing so the version bump is part of the write's transaction;
+    listing=True also drops cached entity list pages (the entity row itself changed).
+    """
+    entity_ids = {entity_id for entity_id in entity_ids if entity_id is not None}
+    if entity_ids:
+        db.session.execute(
+            db.update(Entity).where(Entity.id.in_(entity_ids)).values(version=Entity.version + 1),
+            execution_options={'synchronize_session': False}
+        )
+    for entity_id in entity_ids:
+        response_cache().invalidate(entity_id)
+    if listing:
+        response_cache().invalidate(None)
+
+
+# Full-text search index maintenance: write handlers call reindex_search before committing
+SEARCH_FIELDS = {
+    # model: (kind, title columns weighted highest, body columns)
+    Entity: ('entity', (Entity.name,), (Entity.description, Entity.ein)),
+    Account: ('account', (Account.account_name,), (Account.notes,)),
+    Task: ('task', (Task.title,), (Task.description, Task.category)),
+    Document: ('document', (Document.title,), (Document.original_filename, DocumentText.content)),
+}
+# Tables outer-joined in for body columns that live outside the model
+SEARCH_JOINS = {
+    Document: (DocumentText, DocumentText.document_id == Document.id),
+}
+SEARCH_TERM = re.compile(r'[^\W_]+')
+
+
+def search_terms(*values):
+    """Lowercase words joined by spaces, so Postgres and FTS5 tokenize them identically"""
+    return ' '.join(term for value in values if value for term in SEARCH_TERM.findall(str(value).lower()))
+
+
+def reindex_search(model, ids):
+    """Rewrite the search rows for these records; ids that no longer exist are dropped from the index.
+    
+    Returns {record id: entity id} for the records that still exist.
+    """
+    ids = {record_id for record_id in ids if record_id is not None}
+    if not ids:
+        return {}
+    kind, title_fields, body_fields = SEARCH_FIELDS[model]
+    owner = model.id if model is Entity else model.entity_id
+    stmt = db.select(model.id, owner, *title_fields, *body_fields).select_from(model).where(model.id.in_(ids))
+    if model in SEARCH_JOINS:
+        stmt = stmt.outerjoin(*SEARCH_JOINS[model])
+    rows = db.session.execute(stmt).all()
+    
+    db.session.execute(db.delete(SearchIndex).where(SearchIndex.kind == kind, SearchIndex.record_id.in_(ids)))
+    if rows:
+        split = 2 + len(title_fields)
+        db.session.execute(db.insert(SearchIndex), [{
+            'kind': kind,
+            'record_id': row[0],
+            'entity_id': row[1],
+            'label': row[2],
+            'title_terms': search_terms(*row[2:split]),
+            'body_terms': search_terms(*row[split:])
+        } for row in rows])
+    return {row[0]: row[1] for row in rows}
+
+
+def unindex_entity(entity_id):
+    """Drop an entity and everything filed under it from the search index"""
+    db.session.execute(db.delete(SearchIndex).where(SearchIndex.entity_id == entity_id))
+
+
+# Task dependency edges: the JSON `dependencies` column keeps the labels clients sent,
+# and task_dependency holds the edges they resolve to
+def dependency_graph(entity_id):
+    """Map each of an entity's task ids to the set of task ids it depends on"""
+    graph = defaultdict(set)
+    edges = db.select(TaskDependency.task_id, TaskDependency.depends_on_id).where(TaskDependency.entity_id == entity_id)
+    for task_id, depends_on_id in db.session.execute(edges):
+        graph[task_id].add(depends_on_id)
+    return graph
+
+
+def resolve_dependency_labels(labels, task_ids, ids_by_title):
+    """Task ids for dependency labels, which name a task by id or by title; unknown labels are skipped"""
+    resolved = []
+    for label in labels or ():
+        if isinstance(label, int) or (isinstance(label, str) and label.strip().isdigit()):
+            if int(label) in task_ids:
+                resolved.append(int(label))
+                continue
+        if isinstance(label, str) and label.strip().lower() in ids_by_title:
+            resolved.append(ids_by_title[label.strip().lower()])
+    return list(dict.fromkeys(resolved))
+
+
+def sync_task_dependencies(entity_id, labels_by_task):
+    """Replace the dependency edges of the given tasks (all in one entity) from their labels.
+    
+    Raises DependencyCycleError before writing anything if the new edges would close a cycle.
+    """
+    if not labels_by_task:
+        return
+    ids_by_title = {}
+    task_ids = set()
+    for task_id, title in db.session.execute(db.select(Task.id, Task.title).where(Task.entity_id == entity_id)):
+        task_ids.add(task_id)
+        ids_by_title.setdefault(title.strip().lower(), task_id)
+    
+    graph = dependency_graph(entity_id)
+    edges = []
+    for task_id, labels in labels_by_task.items():
+        graph.pop(task_id, None)
+        depends_on = resolve_dependency_labels(labels, task_ids, ids_by_title)
+        cycle = find_cycle(graph, task_id, depends_on)
+        if cycle:
+            raise DependencyCycleError(cycle)
+        graph[task_id] = set(depends_on)
+        edges += [{'task_id': task_id, 'depends_on_id': upstream, 'entity_id': entity_id} for upstream in depends_on]
+    
+    db.session.execute(db.delete(TaskDependency).where(TaskDependency.task_id.in_(labels_by_task)))
+    if edges:
+        db.session.execute(db.insert(TaskDependency), edges)
+
+
+def sync_dependency_rows(rows, entity_by_task):
+    """sync_task_dependencies for bulk-written task rows that set `dependencies`, grouped by entity"""
+    by_entity = defaultdict(dict)
+    for row in rows:
+        if 'dependencies' in row:
+            labels = json.loads(row['dependencies']) if row['dependencies'] else []
+            by_entity[entity_by_task[row['id']]][row['id']] = labels
+    for entity_id, labels_by_task in by_entity.items():
+        sync_task_dependencies(entity_id, labels_by_task)
+
+
+def delete_task_edges(task_ids):
+    db.session.execute(db.delete(TaskDependency).where(db.or_(
+        TaskDependency.task_id.in_(task_ids), TaskDependency.depends_on_id.in_(task_ids)
+    )))
+
+
+# Dashboard rollups: writes snapshot the rows they touch before and after, and the
+# difference is added to the rollup tables in the same transaction
+ROLLUP_COLUMNS = {
+    Account: (Account.entity_id, Account.balance),
+    Task: (Task.entity_id, Task.status, Task.priority, Task.due_date),
+    Document: (Document.entity_id, Document.file_size),
+}
+ROLLUP_KEYS = {
+    EntityRollup: ('entity_id',),
+    TaskRollup: ('entity_id', 'status', 'priority'),
+    TaskDueRollup: ('entity_id', 'due_date'),
+}
+
+
+def rollup_contributions(model, row):
+    """(rollup model, key, {column: amount}) triples that one account, task or document row adds"""
+    if model is Account:
+        entity_id, balance = row
+        yield EntityRollup, (entity_id,), {'account_count': 1, 'total_balance': balance or 0.0}
+    elif model is Task:
+        entity_id, status, priority, due_date = row
+        yield EntityRollup, (entity_id,), {'task_count': 1}
+        yield TaskRollup, (entity_id, status or '', priority or ''), {'task_count': 1}
+        if due_date and status != 'completed':
+            yield TaskDueRollup, (entity_id, due_date), {'open_count': 1}
+    elif model is Document:
+        entity_id, file_size = row
+        yield EntityRollup, (entity_id,), {'document_count': 1, 'document_bytes': file_size or 0}
+
+
+def rollup_snapshot(model, ids):
+    """The rollup-relevant columns of these rows as they currently stand"""
+    ids = [record_id for record_id in ids if record_id is not None]
+    if model not in ROLLUP_COLUMNS or not ids:
+        return []
+    return db.session.execute(db.select(*ROLLUP_COLUMNS[model]).where(model.id.in_(ids))).all()
+
+
+def upsert_increment(rollup, rows):
+    """INSERT ... ON CONFLICT DO UPDATE adding each row's amounts to the stored ones"""
+    insert = (postgresql if db.engine.dialect.name == 'postgresql' else sqlite).insert(rollup)
+    amounts = [name for name in rows[0] if name not in ROLLUP_KEYS[rollup]]
+    stmt = insert.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEYS[rollup]),
+        set_={name: getattr(rollup, name) + getattr(insert.excluded, name) for name in amounts}
+    )
+    db.session.execute(stmt, rows)
+
+
+def add_rollup_deltas(deltas):
+    """Apply {(rollup model, key): {column: amount}} and drop count rows that reached zero"""
+    by_rollup = defaultdict(list)
+    for (rollup, key), amounts in deltas.items():
+        if any(amounts.values()):
+            by_rollup[rollup].append((key, amounts))
+    for rollup, changes in by_rollup.items():
+        keys = ROLLUP_KEYS[rollup]
+        columns = sorted({name for _, amounts in changes for name in amounts})
+        upsert_increment(rollup, [
+            {**dict(zip(keys, key)), **{name: amounts.get(name, 0) for name in columns}} for key, amounts in changes
+        ])
+        if rollup is not EntityRollup:
+            count = rollup.task_count if rollup is TaskRollup else rollup.open_count
+            entity_ids = {key[0] for key, _ in changes}
+            db.session.execute(db.delete(rollup).where(rollup.entity_id.in_(entity_ids), count <= 0))
+
+
+def update_rollups(model, before, ids):
+    """Add the difference between `before` (a rollup_snapshot) and the current state of these rows"""
+    if model not in ROLLUP_COLUMNS:
+        return
+    deltas = defaultdict(lambda: defaultdict(int))
+    for sign, rows in ((-1, before), (1, rollup_snapshot(model, ids))):
+        for row in rows:
+            for rollup, key, amounts in rollup_contributions(model, tuple(row)):
+                for name, amount in amounts.items():
+                    deltas[rollup, key][name] += sign * amount
+    add_rollup_deltas(deltas)
+
+
+# Full recomputation for recovery. Migration 0005 seeds the tables from its own frozen copy of
+# these statements, as revisions never import app.py; a change here needs a new revision too
+ROLLUP_REBUILD_SQL = (
+    "DELETE FROM task_due_rollup",
+    "DELETE FROM task_rollup",
+    "DELETE FROM entity_rollup",
+    """INSERT INTO entity_rollup (entity_id, account_count, total_balance, task_count, document_count, document_bytes)
+    SELECT entity_id, sum(account_count), sum(total_balance), sum(task_count), sum(document_count), sum(document_bytes)
+    FROM (
+        SELECT entity_id, count(*) AS account_count, coalesce(sum(balance), 0) AS total_balance,
+               0 AS task_count, 0 AS document_count, 0 AS document_bytes
+        FROM account GROUP BY entity_id
+        UNION ALL
+        SELECT entity_id, 0, 0, count(*), 0, 0 FROM task GROUP BY entity_id
+        UNION ALL
+        SELECT entity_id, 0, 0, 0, count(*), coalesce(sum(file_size), 0) FROM document GROUP BY entity_id
+    ) AS totals
+    GROUP BY entity_id""",
+    """INSERT INTO task_rollup (entity_id, status, priority, task_count)
+    SELECT entity_id, coalesce(status, ''), coalesce(priority, ''), count(*)
+    FROM task
+    GROUP BY entity_id, coalesce(status, ''), coalesce(priority, '')""",
+    """INSERT INTO task_due_rollup (entity_id, due_date, open_count)
+    SELECT entity_id, due_date, count(*)
+    FROM task
+    WHERE due_date IS NOT NULL AND (status IS NULL OR status <> 'completed')
+    GROUP BY entity_id, due_date""",
+)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from the source tables (recovery only; caller commits)"""
+    for statement in ROLLUP_REBUILD_SQL:
+        db.session.execute(db.text(statement))
+
+
+# Change feed: every write appends upserts and tombstones to change_log, which
+# GET /api/changes serves to clients keeping a local copy in sync
+CHANGE_LOG_RETENTION = timedelta(days=int(os.getenv('CHANGE_LOG_RETENTION_DAYS', 30)))
+CHANGE_LOG_LOCK = 7301  # advisory lock key serializing change_log writers on Postgres
+_change_log_pruned_at = None
+
+
+def log_changes(model, ids, present):
+    """Append one change per id: an upsert if it is in `present` ({id: entity id}), else a tombstone"""
+    insert_changes({model: ids}, present)
+
+
+def insert_changes(ids_by_model, present):
+    if db.engine.dialect.name == 'postgresql':
+        # Hold ids in commit order, so a reader never sees id N+1 before id N commits
+        db.session.execute(db.text('SELECT pg_advisory_xact_lock(:key)'), {'key': CHANGE_LOG_LOCK})
+    now = datetime.utcnow()
+    changes = [{
+        'kind': SEARCH_FIELDS[model][0],
+        'record_id': record_id,
+        'entity_id': present.get(record_id),
+        'op': 'upsert' if record_id in present else 'delete',
+        'changed_at': now
+    } for model, ids in ids_by_model.items() for record_id in sorted(ids)]
+    if not changes:
+        return
+    # Only the highest id is needed, so the insert can go out as one multi-row statement
+    cursors = sorted(db.session.scalars(db.insert(ChangeLog).returning(ChangeLog.id), changes))
+    publish_change_event(cursors, changes)
+    prune_change_log(now)
+
+
+def prune_change_log(now):
+    """Drop entries past retention (at most hourly per process), leaving a 'pruned' marker at the cut"""
+    global _change_log_pruned_at
+    if _change_log_pruned_at and now - _change_log_pruned_at < timedelta(hours=1):
+        return
+    _change_log_pruned_at = now
+    cut = db.session.scalar(db.select(db.func.max(ChangeLog.id)).where(ChangeLog.changed_at < now - CHANGE_LOG_RETENTION))
+    if cut is not None:
+        db.session.execute(db.delete(ChangeLog).where(ChangeLog.id < cut))
+        db.session.execute(db.update(ChangeLog).where(ChangeLog.id == cut).values(op='pruned'))
+
+
+def record_changes(model, ids):
+    """Update the search index and change feed for rows this transaction wrote or deleted (call before commit)"""
+    ids = {record_id for record_id in ids if record_id is not None}
+    if ids:
+        log_changes(model, ids, reindex_search(model, ids))
+
+
+# Live updates: change events fan out to open /api/events streams. On Postgres they
+# travel through NOTIFY (sent on commit) to a LISTEN thread in every worker process;
+# otherwise the writing process publishes them itself after commit.
+EVENT_CHANNEL = 'entity_changes'
+EVENT_HEARTBEAT = 15
+MAX_EVENT_CHANGES = 100  # longer change lists are cut; clients fetch the rest from /api/changes
+MAX_EVENT_STREAMS = int(os.getenv('MAX_EVENT_STREAMS', 500))
+
+
+class EventBroker:
+    """In-process pub/sub between change events and this process's open event streams"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.listener = None
+    
+    def subscribe(self):
+        """A queue receiving every event from now on, or None when this process has too many streams"""
+        subscription = queue.Queue(maxsize=1000)
+        with self.lock:
+            if len(self.subscribers) >= MAX_EVENT_STREAMS:
+                return None
+            self.subscribers.add(subscription)
+            if self.listener is None and db.engine.dialect.name == 'postgresql':
+                url = db.engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+                self.listener = threading.Thread(target=self.listen, args=(url,), daemon=True, name='event-listener')
+                self.listener.start()
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+    
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                # A stalled client misses the notification but catches up through /api/changes
+                pass
+    
+    def listen(self, url):
+        """Relay NOTIFYs on EVENT_CHANNEL to local subscribers, reconnecting after failures"""
+        import psycopg2
+        while True:
+            try:
+                connection = psycopg2.connect(url)
+                connection.autocommit = True
+                connection.cursor().execute(f'LISTEN {EVENT_CHANNEL}')
+                while True:
+                    if select.select([connection], [], [], EVENT_HEARTBEAT) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.publish(json.loads(connection.notifies.pop(0).payload))
+            except Exception as e:
+                print(f"Event listener error, reconnecting: {e}")
+                time.sleep(5)
+
+
+event_broker = EventBroker()
+
+
+def publish_change_event(cursors, changes):
+    """Queue an event describing logged changes, delivered only if the transaction commits"""
+    event = {
+        'cursor': str(cursors[-1]),
+        'changes': [{'type': change['kind'], 'id': change['record_id'], 'op': change['op']}
+                    for change in changes[:MAX_EVENT_CHANGES]],
+        'truncated': len(changes) > MAX_EVENT_CHANGES
+    }
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text('SELECT pg_notify(:channel, :payload)'),
+                           {'channel': EVENT_CHANNEL, 'payload': json.dumps(event)})
+    else:
+        db.session.info.setdefault('pending_events', []).append(event)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def publish_pending_events(session):
+    for event in session.info.pop('pending_events', []):
+        event_broker.publish(event)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def discard_pending_events(session):
+    session.info.pop('pending_events', None)
+
+
+# Background jobs: endpoints insert a Job row in their own transaction and answer right
+# away; worker threads in every process claim due jobs from the table, highest priority
+# first, and retry failures with exponential backoff
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # threads per process; 0 leaves jobs queued
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 5))
+JOB_LEASE = timedelta(seconds=int(os.getenv('JOB_LEASE_SECONDS', 900)))
+JOB_RETRY_BASE = float(os.getenv('JOB_RETRY_BASE_SECONDS', 10))
+JOB_RETRY_MAX = float(os.getenv('JOB_RETRY_MAX_SECONDS', 3600))
+JOB_RETENTION = timedelta(days=int(os.getenv('JOB_RETENTION_DAYS', 7)))
+JOB_PRIORITY_HIGH, JOB_PRIORITY_NORMAL, JOB_PRIORITY_LOW = 10, 0, -10
+JOB_HANDLERS = {}
+_jobs_pruned_at = None
+
+
+def job_handler(kind):
+    """Register a function run for jobs of `kind`; it receives the payload and returns a JSON result"""
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def enqueue_job(kind, payload=None, priority=JOB_PRIORITY_NORMAL, idempotency_key=None, max_attempts=5):
+    """Add a job to the caller's transaction, so it only exists if that commits; returns (job, created)
+
+    A job already holding `idempotency_key` is returned instead of adding another.
+    """
+    if idempotency_key is not None:
+        existing = Job.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing, False
+    job = Job(kind=kind, payload=json.dumps(payload or {}), priority=priority,
+              idempotency_key=idempotency_key, max_attempts=max_attempts)
+    if idempotency_key is None:
+        db.session.add(job)
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.add(job)
+        except IntegrityError:
+            # A concurrent request enqueued the same key first
+            return Job.query.filter_by(idempotency_key=idempotency_key).one(), False
+    db.session.info['jobs_enqueued'] = True
+    return job, True
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, so jobs failing together don't retry together"""
+    delay = min(JOB_RETRY_BASE * 2 ** (attempts - 1), JOB_RETRY_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def claimable_jobs(now):
+    return db.or_(
+        db.and_(Job.status == 'queued', Job.run_at <= now),
+        db.and_(Job.status == 'running', Job.locked_until < now)
+    )
+
+
+def run_next_job():
+    """Claim the most urgent due job and run it; returns False when there was none"""
+    now = datetime.utcnow()
+    # SKIP LOCKED keeps Postgres workers from queueing behind each other; SQLite ignores it
+    job_id = db.session.scalar(
+        db.select(Job.id).where(claimable_jobs(now))
+        .order_by(Job.priority.desc(), Job.run_at, Job.id).limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if job_id is None:
+        db.session.rollback()
+        return False
+    # The conditional update makes the claim safe where rows can't be locked
+    claimed = db.session.execute(
+        db.update(Job).where(Job.id == job_id, claimable_jobs(now))
+        .values(status='running', attempts=Job.attempts + 1, locked_until=now + JOB_LEASE, updated_at=now)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return True
+
+    job = db.session.get(Job, job_id)
+    kind, payload, attempts, max_attempts = job.kind, json.loads(job.payload), job.attempts, job.max_attempts
+    started = time.perf_counter()
+    try:
+        if attempts > max_attempts:
+            # Its lease ran out on the last attempt, most likely because the worker died
+            raise RuntimeError('Job did not finish within its lease')
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            raise LookupError(f'No handler for job kind {kind!r}')
+        result = handler(payload)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.error = f'{type(e).__name__}: {e}'[:500]
+        job.locked_until = None
+        if attempts < max_attempts:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + retry_delay(attempts)
+            outcome = 'retried'
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            outcome = 'failed'
+    else:
+        job = db.session.get(Job, job_id)
+        job.status = 'succeeded'
+        job.result = json.dumps(result) if result is not None else None
+        job.error = None
+        job.locked_until = None
+        job.finished_at = datetime.utcnow()
+        outcome = 'succeeded'
+    db.session.commit()
+    JOB_RUNS.inc(kind=kind, outcome=outcome)
+    JOB_DURATION.observe(time.perf_counter() - started, kind=kind)
+    return True
+
+
+def prune_jobs(now):
+    """Delete jobs that finished before JOB_RETENTION (at most hourly per process)"""
+    global _jobs_pruned_at
+    if _jobs_pruned_at and now - _jobs_pruned_at < timedelta(hours=1):
+        return
+    _jobs_pruned_at = now
+    db.session.execute(db.delete(Job).where(Job.status.in_(('succeeded', 'failed')),
+                                            Job.finished_at < now - JOB_RETENTION))
+    db.session.commit()
+
+
+class JobQueue:
+    """One app's job worker threads, started by its first request or enqueued job"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.threads = []
+
+    def start(self):
+        if self.threads or JOB_WORKERS <= 0:
+            return
+        with self.lock:
+            if not self.threads:
+                self.threads = [threading.Thread(target=self.run, daemon=True, name=f'job-worker-{n}')
+                                for n in range(JOB_WORKERS)]
+                for thread in self.threads:
+                    thread.start()
+
+    def wake(self):
+        """Look for due jobs now rather than at the next poll"""
+        self.start()
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.work()
+            self.wakeup.wait(JOB_POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def work(self):
+        """Run due jobs until none is left"""
+        try:
+            with self.app.app_context():
+                while run_next_job():
+                    pass
+                prune_jobs(datetime.utcnow())
+        except SQLAlchemyError as e:
+            # Claimed jobs are retried once their lease runs out
+            print(f"Job worker error: {e}")
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def wake_job_workers(session):
+    if session.info.pop('jobs_enqueued', False):
+        current_app.extensions['job_queue'].wake()
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def discard_enqueued_jobs(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+@api.before_app_request
+def start_job_workers():
+    # Jobs left from before a restart, or enqueued by other processes, are picked up by polling
+    current_app.extensions['job_queue'].start()
+
+
 # Authentication endpoints
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.json
     if not data.get('username') or not data.get('password') or not data.get('email'):
@@ -211,7 +1612,7 @@ def register():
     return jsonify({'message': 'User created successfully'}), 201
 
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     data = request.json
     username = data.get('username')
@@ -229,222 +1630,937 @@ def login():
     return jsonify({'access_token': access_token, 'username': username}), 200
 
 
+# Payload parsing shared by the single-row and batch endpoints
+MAX_BATCH_SIZE = 1000
+ENTITY_FIELDS = ('name', 'description', 'ein', 'registered_address', 'registered_phone', 'state_of_incorporation', 'status')
+ACCOUNT_FIELDS = ('account_name', 'account_number', 'balance', 'account_type', 'username', 'account_url', 'notes')
+TASK_FIELDS = ('title', 'description', 'status', 'priority', 'category', 'assigned_to', 'estimated_hours', 'actual_hours')
+TASK_DATE_FIELDS = ('due_date', 'start_date', 'completion_date')
+NUMERIC_FIELDS = ('balance', 'estimated_hours', 'actual_hours')
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def entity_values(data, partial=False):
+    """Column values for an Entity from a request payload.
+    
+    With partial=True only the keys present in the payload are returned, the way
+    update_entity applies them; an empty date leaves the stored one alone.
+    """
+    if partial:
+        values = {key: data[key] for key in ENTITY_FIELDS if key in data}
+    else:
+        values = {key: data.get(key) for key in ENTITY_FIELDS}
+        values['name'] = data['name']
+        values['status'] = data.get('status', 'active')
+        values['date_of_incorporation'] = None
+    if data.get('date_of_incorporation'):
+        values['date_of_incorporation'] = parse_date(data['date_of_incorporation'])
+    return values
+
+
+def account_values(data, partial=False):
+    """Column values for an Account from a request payload.
+    
+    With partial=True only the keys present in the payload are returned, the way
+    update_account applies them; a blank password never overwrites the stored one.
+    """
+    if partial:
+        values = {key: data[key] for key in ACCOUNT_FIELDS if key in data}
+    else:
+        values = {key: data.get(key) for key in ACCOUNT_FIELDS}
+        values['account_name'] = data['account_name']
+        values['balance'] = data.get('balance', 0.0)
+        values['password'] = data.get('password')
+    if data.get('password'):
+        values['password'] = data['password']
+    return values
+
+
+def task_values(data, partial=False):
+    """Column values for a Task from a request payload, with dates parsed and dependencies JSON-encoded.
+    
+    With partial=True only the keys present in the payload are returned, the way
+    update_task applies them; empty dates leave the stored values alone, while an
+    empty or null `dependencies` clears them.
+    """
+    if partial:
+        values = {key: data[key] for key in TASK_FIELDS if key in data}
+    else:
+        values = {key: data.get(key) for key in TASK_FIELDS}
+        values['title'] = data['title']
+        values['status'] = data.get('status', 'pending')
+    for key in TASK_DATE_FIELDS:
+        if data.get(key):
+            values[key] = parse_date(data[key])
+        elif not partial:
+            values[key] = None
+    if data.get('dependencies'):
+        values['dependencies'] = json.dumps(data['dependencies'])
+    elif 'dependencies' in data or not partial:
+        values['dependencies'] = None
+    return values
+
+
+def validate_batch_item(item, values_fn, required, partial):
+    """Return (values, error) for one batch item"""
+    if not isinstance(item, dict):
+        return None, 'Item must be an object'
+    missing = [key for key in required if not item.get(key)]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+    try:
+        values = values_fn(item, partial=partial)
+    except (TypeError, ValueError) as e:
+        return None, f'Invalid value: {e}'
+    for key in NUMERIC_FIELDS:
+        value = values.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return None, f'{key} must be a number'
+    return values, None
+
+
+def read_batch(key):
+    """Return the list under `key` in the request body, or raise ValueError"""
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'Request body must contain a non-empty "{key}" list')
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f'Batches are limited to {MAX_BATCH_SIZE} items')
+    return items
+
+
+def is_row_id(value):
+    # bool is a subclass of int, but true/false are not ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def batch_rejected(errors, count):
+    """Per-item results for a batch that failed validation and was not applied"""
+    results = [
+        {'index': i, 'status': 400, 'error': errors[i]} if i in errors
+        else {'index': i, 'status': 424, 'error': 'Not applied because other items failed validation'}
+        for i in range(count)
+    ]
+    return jsonify({'error': 'Batch rejected', 'results': results}), 400
+
+
+def batch_create(model, entity_id, values_fn, required):
+    """Validate every item, then insert them all in one statement and one transaction"""
+    try:
+        items = read_batch('items')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows, errors = [], {}
+    for i, item in enumerate(items):
+        values, error = validate_batch_item(item, values_fn, required, partial=False)
+        if error:
+            errors[i] = error
+        else:
+            rows.append({**values, 'entity_id': entity_id})
+    if errors:
+        return batch_rejected(errors, len(items))
+    
+    created = db.session.scalars(
+        db.insert(model).returning(model, sort_by_parameter_order=True),
+        rows
+    ).all()
+    if model is Task:
+        created_ids = [obj.id for obj in created]
+        try:
+            sync_dependency_rows([{**row, 'id': task_id} for row, task_id in zip(rows, created_ids)],
+                                 dict.fromkeys(created_ids, entity_id))
+        except DependencyCycleError as e:
+            db.session.rollback()
+            return batch_rejected({created_ids.index(e.cycle[0]): str(e)}, len(items))
+    record_changes(model, [obj.id for obj in created])
+    update_rollups(model, [], [obj.id for obj in created])
+    mark_entities_changed(entity_id)
+    db.session.commit()
+    return jsonify({'results': [
+        {'index': i, 'status': 201, 'data': obj.to_dict()} for i, obj in enumerate(created)
+    ]}), 201
+
+
+def batch_update(model, values_fn):
+    """Validate every item against existing rows, then apply them as one bulk UPDATE by primary key"""
+    try:
+        items = read_batch('items')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    ids = [item.get('id') for item in items if isinstance(item, dict)]
+    existing = dict(db.session.execute(db.select(model.id, model.entity_id).where(model.id.in_(
+        [i for i in ids if is_row_id(i)]
+    ))).all())
+    
+    rows, errors, seen = [], {}, set()
+    for i, item in enumerate(items):
+        values, error = validate_batch_item(item, values_fn, (), partial=True)
+        item_id = item.get('id') if isinstance(item, dict) else None
+        if error is None and not is_row_id(item_id):
+            error = 'id must be an integer'
+        if error is None and item_id not in existing:
+            error = f'{model.__name__} {item_id} not found'
+        if error is None and item_id in seen:
+            error = f'{model.__name__} {item_id} appears more than once'
+        if error:
+            errors[i] = error
+            continue
+        seen.add(item_id)
+        if values:
+            rows.append({**values, 'id': item_id})
+    if errors:
+        return batch_rejected(errors, len(items))
+    
+    if rows:
+        before = rollup_snapshot(model, [row['id'] for row in rows])
+        db.session.execute(db.update(model), rows)
+        if model is Task:
+            try:
+                sync_dependency_rows(rows, existing)
+            except DependencyCycleError as e:
+                db.session.rollback()
+                index = next(i for i, item in enumerate(items) if item['id'] == e.cycle[0])
+                return batch_rejected({index: str(e)}, len(items))
+        record_changes(model, [row['id'] for row in rows])
+        update_rollups(model, before, [row['id'] for row in rows])
+        mark_entities_changed(*(existing[row['id']] for row in rows))
+    db.session.commit()
+    updated = {obj.id: obj for obj in model.query.filter(model.id.in_(seen))}
+    return jsonify({'results': [
+        {'index': i, 'status': 200, 'data': updated[item['id']].to_dict()} for i, item in enumerate(items)
+    ]})
+
+
+def batch_delete(model):
+    """Delete every listed row in one statement, or none of them if any id is unknown"""
+    try:
+        ids = read_batch('ids')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    existing = dict(db.session.execute(db.select(model.id, model.entity_id).where(model.id.in_(
+        [i for i in ids if is_row_id(i)]
+    ))).all())
+    errors = {i: 'id must be an integer' if not is_row_id(item_id) else f'{model.__name__} {item_id} not found'
+              for i, item_id in enumerate(ids) if not is_row_id(item_id) or item_id not in existing}
+    if errors:
+        return batch_rejected(errors, len(ids))
+    
+    if model is Task:
+        delete_task_edges(existing)
+    before = rollup_snapshot(model, existing)
+    db.session.execute(db.delete(model).where(model.id.in_(existing)))
+    record_changes(model, existing)
+    update_rollups(model, before, existing)
+    mark_entities_changed(*existing.values())
+    db.session.commit()
+    return jsonify({'results': [{'index': i, 'status': 204, 'id': item_id} for i, item_id in enumerate(ids)]})
+
+
+# Entity list pagination
+ENTITY_PAGE_SIZE = 50
+MAX_ENTITY_PAGE_SIZE = 200
+ENTITY_SORTS = {
+    'created_at': (Entity.created_at, False),
+    '-created_at': (Entity.created_at, True),
+    'name': (Entity.name, False),
+    '-name': (Entity.name, True),
+}
+
+
+def encode_cursor(value, row_id):
+    """Encode the last row's (sort value, id) as an opaque cursor"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_column):
+    """Decode a cursor from encode_cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        if sort_column is Entity.created_at:
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def entity_list_order(args):
+    """(sort column, descending, page size) for GET /api/entities, raising ValueError on bad values"""
+    sort = args.get('sort', 'created_at')
+    if sort not in ENTITY_SORTS:
+        raise ValueError(f"Invalid sort, expected one of: {', '.join(ENTITY_SORTS)}")
+    try:
+        limit = min(max(int(args.get('limit', ENTITY_PAGE_SIZE)), 1), MAX_ENTITY_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('limit must be an integer') from None
+    return (*ENTITY_SORTS[sort], limit)
+
+
+def filter_entity_page(query, args, sort_column, descending, limit):
+    """Narrow a select over Entity to one list page, plus one row to tell whether another page exists"""
+    if args.get('status'):
+        query = query.filter(Entity.status == args['status'])
+    if args.get('state_of_incorporation'):
+        query = query.filter(Entity.state_of_incorporation == args['state_of_incorporation'])
+    if args.get('name_prefix'):
+        prefix = args['name_prefix'].lower()
+        prefix = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(db.func.lower(Entity.name).like(prefix + '%', escape='\\'))
+    
+    # Keyset pagination: continue strictly after the (sort value, id) of the previous page
+    if args.get('cursor'):
+        value, last_id = decode_cursor(args['cursor'], sort_column)
+        if descending:
+            query = query.filter(tuple_(sort_column, Entity.id) < (value, last_id))
+        else:
+            query = query.filter(tuple_(sort_column, Entity.id) > (value, last_id))
+    
+    if descending:
+        query = query.order_by(sort_column.desc(), Entity.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Entity.id.asc())
+    return query.limit(limit + 1)
+
+
+# Entity detail collections
+ENTITY_COLLECTIONS = {
+    'accounts': ACCOUNT_PROJECTION,
+    'tasks': TASK_PROJECTION,
+    'documents': DOCUMENT_PROJECTION,
+}
+DETAIL_COLLECTION_LIMIT = 500
+MAX_DETAIL_COLLECTION_LIMIT = 5000
+
+
 # Entity endpoints
-@app.route('/api/entities', methods=['GET'])
+@api.route('/api/entities', methods=['GET'])
 @jwt_required()
+@conditional_get(entity_list_etag)
 def get_entities():
-    entities = Entity.query.all()
-    return jsonify([e.to_dict() for e in entities])
+    try:
+        sort_column, descending, limit = entity_list_order(request.args)
+        fields = ENTITY_PROJECTION.parse_fields(request.args.get('fields'))
+        # The sort column and id are always selected so the next cursor can be built
+        query, names = ENTITY_PROJECTION.select(fields, extra=(sort_column.key, 'id'))
+        query = filter_entity_page(query, request.args, sort_column, descending, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows = db.session.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[names.index(sort_column.key)], last[names.index('id')])
+    
+    return json_response({
+        'entities': ENTITY_PROJECTION.serialize(rows, names, fields),
+        'next_cursor': next_cursor
+    })
 
 
-@app.route('/api/entities/<int:entity_id>', methods=['GET'])
+@api.route('/api/entities/<int:entity_id>', methods=['GET'])
 @jwt_required()
+@conditional_get(entity_etag)
 def get_entity(entity_id):
-    entity = Entity.query.get_or_404(entity_id)
-    result = entity.to_dict()
-    result['accounts'] = [a.to_dict() for a in entity.accounts]
-    result['tasks'] = [t.to_dict() for t in entity.tasks]
-    result['documents'] = [d.to_dict() for d in entity.documents]
-    return jsonify(result)
+    # ?include=accounts,tasks,documents selects the child collections (default: all, empty: none)
+    if 'include' in request.args:
+        include = [name.strip() for name in request.args['include'].split(',') if name.strip()]
+    else:
+        include = list(ENTITY_COLLECTIONS)
+    unknown = [name for name in include if name not in ENTITY_COLLECTIONS]
+    if unknown:
+        return jsonify({'error': f"Unknown include: {', '.join(unknown)}"}), 400
+    
+    limits = {}
+    try:
+        default_limit = int(request.args.get('limit', DETAIL_COLLECTION_LIMIT))
+        for name in include:
+            limits[name] = min(max(int(request.args.get(f'{name}_limit', default_limit)), 0), MAX_DETAIL_COLLECTION_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'Collection limits must be integers'}), 400
+    
+    result = g.entity.to_dict()
+    result['has_more'] = {}
+    
+    # All requested collections, bounded, in one query instead of unbounded lazy loads;
+    # the extra row tells us whether a collection was truncated
+    collections = list_entity_collections(entity_id, {name: limits[name] + 1 for name in include})
+    for name, rows in collections.items():
+        result['has_more'][name] = len(rows) > limits[name]
+        result[name] = rows[:limits[name]]
+    return json_response(result)
 
 
-@app.route('/api/entities', methods=['POST'])
+@api.route('/api/entities', methods=['POST'])
 @jwt_required()
 def create_entity():
-    data = request.json
-    incorporation_date = datetime.strptime(data['date_of_incorporation'], '%Y-%m-%d').date() if data.get('date_of_incorporation') else None
-    entity = Entity(
-        name=data['name'],
-        description=data.get('description'),
-        ein=data.get('ein'),
-        registered_address=data.get('registered_address'),
-        registered_phone=data.get('registered_phone'),
-        state_of_incorporation=data.get('state_of_incorporation'),
-        status=data.get('status', 'active'),
-        date_of_incorporation=incorporation_date
-    )
+    entity = Entity(**entity_values(request.json))
     db.session.add(entity)
+    db.session.flush()
+    record_changes(Entity, [entity.id])
+    mark_entities_changed(listing=True)
     db.session.commit()
     return jsonify(entity.to_dict()), 201
 
 
-@app.route('/api/entities/<int:entity_id>', methods=['PUT'])
+@api.route('/api/entities/<int:entity_id>', methods=['PUT'])
 @jwt_required()
 def update_entity(entity_id):
     entity = Entity.query.get_or_404(entity_id)
-    data = request.json
-    entity.name = data.get('name', entity.name)
-    entity.description = data.get('description', entity.description)
-    entity.ein = data.get('ein', entity.ein)
-    entity.registered_address = data.get('registered_address', entity.registered_address)
-    entity.registered_phone = data.get('registered_phone', entity.registered_phone)
-    entity.state_of_incorporation = data.get('state_of_incorporation', entity.state_of_incorporation)
-    entity.status = data.get('status', entity.status)
-    if data.get('date_of_incorporation'):
-        entity.date_of_incorporation = datetime.strptime(data['date_of_incorporation'], '%Y-%m-%d').date()
+    for key, value in entity_values(request.json, partial=True).items():
+        setattr(entity, key, value)
+    record_changes(Entity, [entity_id])
+    mark_entities_changed(entity_id, listing=True)
     db.session.commit()
     return jsonify(entity.to_dict())
 
 
-@app.route('/api/entities/<int:entity_id>', methods=['DELETE'])
+# Rows deleted along with their entity by ON DELETE CASCADE
+ENTITY_CHILD_MODELS = (Account, Task, Document)
+
+
+@api.route('/api/entities/<int:entity_id>', methods=['DELETE'])
 @jwt_required()
 def delete_entity(entity_id):
-    entity = Entity.query.get_or_404(entity_id)
-    db.session.delete(entity)
+    """Delete an entity with one DELETE; the foreign keys cascade it to accounts, tasks, documents and rollups"""
+    # Each of the entity's documents gives up its blob reference; a sweep_blobs job removes unreferenced blobs
+    references = (db.select(db.func.count()).where(Document.entity_id == entity_id, Document.content_hash == Blob.sha256)
+                  .scalar_subquery())
+    released = db.session.execute(
+        db.update(Blob)
+        .where(Blob.sha256.in_(db.select(Document.content_hash).where(Document.entity_id == entity_id)))
+        .values(ref_count=Blob.ref_count - references)
+    ).rowcount
+    # Files from before content-addressed storage, and unfinished resumable uploads, belong to this entity alone
+    paths = db.session.scalars(db.select(Document.file_path).where(
+        Document.entity_id == entity_id, Document.content_hash.is_(None), Document.file_path.isnot(None))).all()
+    paths += [staging_path(upload_id) for upload_id in
+              db.session.scalars(db.select(UploadSession.id).where(UploadSession.entity_id == entity_id))]
+    # The cascade deletes the children without a trace in the change feed, so collect their ids first
+    children = {model: [] for model in ENTITY_CHILD_MODELS}
+    for position, child_id in db.session.execute(db.union_all(*(
+        db.select(db.literal(position), model.id).where(model.entity_id == entity_id)
+        for position, model in enumerate(ENTITY_CHILD_MODELS)
+    ))):
+        children[ENTITY_CHILD_MODELS[position]].append(child_id)
+    
+    if not db.session.execute(db.delete(Entity).where(Entity.id == entity_id)).rowcount:
+        db.session.rollback()
+        abort(404)
+    unindex_entity(entity_id)
+    # Tombstones for the entity and every child, so synced clients and event streams drop them all
+    insert_changes({Entity: [entity_id], **children}, {})
+    # Cached responses are keyed by entity, so this also drops the children's
+    mark_entities_changed(entity_id, listing=True)
+    if released:
+        enqueue_job('sweep_blobs', priority=JOB_PRIORITY_LOW)
+    if paths:
+        enqueue_job('remove_files', {'paths': paths}, priority=JOB_PRIORITY_LOW)
     db.session.commit()
     return '', 204
 
 
 # Account endpoints
-@app.route('/api/entities/<int:entity_id>/accounts', methods=['GET'])
+@api.route('/api/entities/<int:entity_id>/accounts', methods=['GET'])
 @jwt_required()
+@conditional_get(entity_etag)
 def get_accounts(entity_id):
-    entity = Entity.query.get_or_404(entity_id)
-    return jsonify([a.to_dict() for a in entity.accounts])
+    try:
+        fields = ACCOUNT_PROJECTION.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return json_response(list_entity_children(ACCOUNT_PROJECTION, entity_id, fields))
 
 
-@app.route('/api/entities/<int:entity_id>/accounts', methods=['POST'])
+@api.route('/api/entities/<int:entity_id>/accounts', methods=['POST'])
 @jwt_required()
 def create_account(entity_id):
     Entity.query.get_or_404(entity_id)
-    data = request.json
-    account = Account(
-        entity_id=entity_id,
-        account_name=data['account_name'],
-        account_number=data.get('account_number'),
-        balance=data.get('balance', 0.0),
-        account_type=data.get('account_type'),
-        username=data.get('username'),
-        password=data.get('password'),
-        account_url=data.get('account_url'),
-        notes=data.get('notes')
-    )
+    account = Account(entity_id=entity_id, **account_values(request.json))
     db.session.add(account)
+    db.session.flush()
+    record_changes(Account, [account.id])
+    update_rollups(Account, [], [account.id])
+    mark_entities_changed(entity_id)
     db.session.commit()
     return jsonify(account.to_dict()), 201
 
 
-@app.route('/api/accounts/<int:account_id>', methods=['GET'])
+@api.route('/api/entities/<int:entity_id>/accounts:batch', methods=['POST'])
+@jwt_required()
+def create_accounts_batch(entity_id):
+    Entity.query.get_or_404(entity_id)
+    return batch_create(Account, entity_id, account_values, required=('account_name',))
+
+
+@api.route('/api/accounts:batch', methods=['PATCH'])
+@jwt_required()
+def update_accounts_batch():
+    return batch_update(Account, account_values)
+
+
+@api.route('/api/accounts:batch', methods=['DELETE'])
+@jwt_required()
+def delete_accounts_batch():
+    return batch_delete(Account)
+
+
+@api.route('/api/accounts/<int:account_id>', methods=['GET'])
 @jwt_required()
 def get_account(account_id):
     account = Account.query.get_or_404(account_id)
     return jsonify(account.to_dict())
 
 
-@app.route('/api/accounts/<int:account_id>', methods=['PUT'])
+@api.route('/api/accounts/<int:account_id>', methods=['PUT'])
 @jwt_required()
 def update_account(account_id):
     account = Account.query.get_or_404(account_id)
-    data = request.json
-    account.account_name = data.get('account_name', account.account_name)
-    account.account_number = data.get('account_number', account.account_number)
-    account.balance = data.get('balance', account.balance)
-    account.account_type = data.get('account_type', account.account_type)
-    account.username = data.get('username', account.username)
-    if data.get('password'):
-        account.password = data['password']
-    account.account_url = data.get('account_url', account.account_url)
-    account.notes = data.get('notes', account.notes)
+    before = rollup_snapshot(Account, [account_id])
+    for key, value in account_values(request.json, partial=True).items():
+        setattr(account, key, value)
+    record_changes(Account, [account_id])
+    update_rollups(Account, before, [account_id])
+    mark_entities_changed(account.entity_id)
     db.session.commit()
     return jsonify(account.to_dict())
 
 
-@app.route('/api/accounts/<int:account_id>', methods=['DELETE'])
+@api.route('/api/accounts/<int:account_id>', methods=['DELETE'])
 @jwt_required()
 def delete_account(account_id):
     account = Account.query.get_or_404(account_id)
+    before = rollup_snapshot(Account, [account_id])
     db.session.delete(account)
+    record_changes(Account, [account_id])
+    update_rollups(Account, before, [account_id])
+    mark_entities_changed(account.entity_id)
     db.session.commit()
     return '', 204
 
 
 # Task endpoints
-@app.route('/api/entities/<int:entity_id>/tasks', methods=['GET'])
+@api.route('/api/entities/<int:entity_id>/tasks', methods=['GET'])
 @jwt_required()
+@conditional_get(entity_etag)
 def get_tasks(entity_id):
-    entity = Entity.query.get_or_404(entity_id)
-    return jsonify([t.to_dict() for t in entity.tasks])
+    try:
+        fields = TASK_PROJECTION.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return json_response(list_entity_children(TASK_PROJECTION, entity_id, fields))
+
+
+def task_graph_etag(entity_id, **kwargs):
+    # Schedules are measured from today, so the tag also turns over at midnight
+    entity_id, tag = entity_etag(entity_id)
+    return entity_id, f'{tag}d{date.today():%Y%m%d}'
 
 
-@app.route('/api/entities/<int:entity_id>/tasks', methods=['POST'])
+@api.route('/api/entities/<int:entity_id>/tasks/graph', methods=['GET'])
+@jwt_required()
+@conditional_get(task_graph_etag)
+def get_task_graph(entity_id):
+    """Dependency order, critical path and slack for an entity's tasks"""
+    rows = db.session.execute(
+        db.select(Task.id, Task.title, Task.status, Task.estimated_hours, Task.start_date, Task.due_date)
+        .where(Task.entity_id == entity_id)
+    ).all()
+    graph = dependency_graph(entity_id)
+    origin = date.today()
+    # Completed tasks take no more time and are no longer held back by their start dates
+    tasks = {row.id: {
+        'duration': 0 if row.status == 'completed' else (row.estimated_hours or 0),
+        'start': None if row.status == 'completed' else row.start_date,
+        'due': row.due_date
+    } for row in rows}
+    plan = schedule(tasks, graph, origin)
+    
+    nodes = []
+    for row in rows:
+        node = {
+            'id': row.id,
+            'title': row.title,
+            'status': row.status,
+            'depends_on': sorted(graph.get(row.id, ())),
+            'duration': tasks[row.id]['duration']
+        }
+        node.update(plan['timings'].get(row.id, {}))
+        nodes.append(node)
+    return json_response({
+        'origin': origin.isoformat(),
+        'hours_per_day': HOURS_PER_DAY,
+        'project_finish': plan['project_finish'],
+        'order': plan['order'],
+        'critical_path': plan['critical_path'],
+        'blocked': plan['blocked'],
+        'tasks': nodes
+    })
+
+
+@api.route('/api/entities/<int:entity_id>/tasks', methods=['POST'])
 @jwt_required()
 def create_task(entity_id):
     Entity.query.get_or_404(entity_id)
-    data = request.json
-    due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date() if data.get('due_date') else None
-    start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date() if data.get('start_date') else None
-    completion_date = datetime.strptime(data['completion_date'], '%Y-%m-%d').date() if data.get('completion_date') else None
-    dependencies_json = json.dumps(data.get('dependencies')) if data.get('dependencies') else None
-    task = Task(
-        entity_id=entity_id,
-        title=data['title'],
-        description=data.get('description'),
-        status=data.get('status', 'pending'),
-        priority=data.get('priority'),
-        due_date=due_date,
-        category=data.get('category'),
-        assigned_to=data.get('assigned_to'),
-        estimated_hours=data.get('estimated_hours'),
-        actual_hours=data.get('actual_hours'),
-        start_date=start_date,
-        completion_date=completion_date,
-        dependencies=dependencies_json
-    )
+    task = Task(entity_id=entity_id, **task_values(request.json))
     db.session.add(task)
+    db.session.flush()
+    try:
+        sync_task_dependencies(entity_id, {task.id: request.json.get('dependencies') or []})
+    except DependencyCycleError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'cycle': e.cycle}), 400
+    record_changes(Task, [task.id])
+    update_rollups(Task, [], [task.id])
+    mark_entities_changed(entity_id)
     db.session.commit()
     return jsonify(task.to_dict()), 201
 
 
-@app.route('/api/tasks/<int:task_id>', methods=['GET'])
+@api.route('/api/entities/<int:entity_id>/tasks:batch', methods=['POST'])
+@jwt_required()
+def create_tasks_batch(entity_id):
+    Entity.query.get_or_404(entity_id)
+    return batch_create(Task, entity_id, task_values, required=('title',))
+
+
+@api.route('/api/tasks:batch', methods=['PATCH'])
+@jwt_required()
+def update_tasks_batch():
+    return batch_update(Task, task_values)
+
+
+@api.route('/api/tasks:batch', methods=['DELETE'])
+@jwt_required()
+def delete_tasks_batch():
+    return batch_delete(Task)
+
+
+@api.route('/api/tasks/<int:task_id>', methods=['GET'])
 @jwt_required()
 def get_task(task_id):
     task = Task.query.get_or_404(task_id)
     return jsonify(task.to_dict())
 
 
-@app.route('/api/tasks/<int:task_id>', methods=['PUT'])
+@api.route('/api/tasks/<int:task_id>', methods=['PUT'])
 @jwt_required()
 def update_task(task_id):
     task = Task.query.get_or_404(task_id)
-    data = request.json
-    task.title = data.get('title', task.title)
-    task.description = data.get('description', task.description)
-    task.status = data.get('status', task.status)
-    task.priority = data.get('priority', task.priority)
-    task.category = data.get('category', task.category)
-    task.assigned_to = data.get('assigned_to', task.assigned_to)
-    task.estimated_hours = data.get('estimated_hours', task.estimated_hours)
-    task.actual_hours = data.get('actual_hours', task.actual_hours)
-    if data.get('due_date'):
-        task.due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date()
-    if data.get('start_date'):
-        task.start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
-    if data.get('completion_date'):
-        task.completion_date = datetime.strptime(data['completion_date'], '%Y-%m-%d').date()
-    if data.get('dependencies'):
-        task.dependencies = json.dumps(data['dependencies'])
+    before = rollup_snapshot(Task, [task_id])
+    values = task_values(request.json, partial=True)
+    for key, value in values.items():
+        setattr(task, key, value)
+    if 'dependencies' in values:
+        try:
+            sync_task_dependencies(task.entity_id, {task_id: request.json['dependencies']})
+        except DependencyCycleError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e), 'cycle': e.cycle}), 400
+    record_changes(Task, [task_id])
+    update_rollups(Task, before, [task_id])
+    mark_entities_changed(task.entity_id)
     db.session.commit()
     return jsonify(task.to_dict())
 
 
-@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@api.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 @jwt_required()
 def delete_task(task_id):
     task = Task.query.get_or_404(task_id)
+    before = rollup_snapshot(Task, [task_id])
+    delete_task_edges([task_id])
     db.session.delete(task)
+    record_changes(Task, [task_id])
+    update_rollups(Task, before, [task_id])
+    mark_entities_changed(task.entity_id)
     db.session.commit()
     return '', 204
 
 
+# Content-addressed document storage: uploads are hashed while they are spooled
+# to disk, and identical content is kept once under uploads/blobs/<aa>/<sha256>
+BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, 'blobs')
+UPLOAD_TEMP_FOLDER = os.path.join(UPLOAD_FOLDER, 'tmp')
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def blob_path(digest):
+    return os.path.join(BLOB_FOLDER, digest[:2], digest)
+
+
+def spool_upload(stream):
+    """Write a stream to a temp file in the upload volume, returning (sha256, size, temp path)"""
+    os.makedirs(UPLOAD_TEMP_FOLDER, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_TEMP_FOLDER, delete=False) as temp:
+        try:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            temp.close()
+            os.remove(temp.name)
+            raise
+    return digest.hexdigest(), size, temp.name
+
+
+def store_blob(temp_path, digest, size):
+    """Take a reference to the blob for `digest`, moving the temp file into place if it is new.
+    
+    Runs inside the caller's transaction; returns the blob's file path.
+    """
+    path = blob_path(digest)
+    referenced = db.session.execute(
+        db.update(Blob).where(Blob.sha256 == digest).values(ref_count=Blob.ref_count + 1)
+    ).rowcount
+    if not referenced:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        try:
+            with db.session.begin_nested():
+                db.session.add(Blob(sha256=digest, file_path=path, size=size, ref_count=1))
+            return path
+        except IntegrityError:
+            # A concurrent upload of the same content created the blob first
+            db.session.execute(
+                db.update(Blob).where(Blob.sha256 == digest).values(ref_count=Blob.ref_count + 1)
+            )
+            return path
+    
+    if os.path.exists(path):
+        os.remove(temp_path)
+    else:
+        # Self-heal a blob whose file went missing from the volume
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+    return path
+
+
+def release_blob(digest):
+    """Drop a reference to a blob; returns True when that was the last one"""
+    db.session.execute(
+        db.update(Blob).where(Blob.sha256 == digest).values(ref_count=Blob.ref_count - 1)
+    )
+    remaining = db.session.scalar(db.select(Blob.ref_count).where(Blob.sha256 == digest))
+    return remaining is not None and remaining <= 0
+
+
+# Blob cleanup: deletes only decrement blobs' reference counts and enqueue a sweep_blobs
+# job, which deletes unreferenced blobs and their files in batches after the commit
+BLOB_SWEEP_BATCH = 500
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    CLEANUP_FILES_REMOVED.inc()
+    return True
+
+
+def sweep_blobs(limit=BLOB_SWEEP_BATCH):
+    """Delete up to `limit` unreferenced blobs and their files; returns how many blobs were deleted
+    
+    The files are unlinked before the delete commits. Until then the rows stay locked, so an
+    upload of the same content waits in store_blob and then stores its file afresh, instead of
+    recreating the row around a file that is about to be unlinked.
+    """
+    digests = db.session.scalars(db.select(Blob.sha256).where(Blob.ref_count <= 0).limit(limit)).all()
+    if not digests:
+        return 0
+    # A blob uploaded again since the select has a reference once more and stays
+    deleted = db.session.scalars(
+        db.delete(Blob).where(Blob.sha256.in_(digests), Blob.ref_count <= 0).returning(Blob.sha256)
+    ).all()
+    for digest in deleted:
+        remove_file(blob_path(digest))
+    db.session.commit()
+    return len(deleted)
+
+
+@job_handler('sweep_blobs')
+def run_blob_sweep(payload):
+    deleted = 0
+    while True:
+        swept = sweep_blobs()
+        deleted += swept
+        if swept < BLOB_SWEEP_BATCH:
+            return {'blobs_deleted': deleted}
+
+
+@job_handler('remove_files')
+def run_file_removal(payload):
+    """Remove files no blob owns: pre-content-addressing uploads and resumable upload staging files"""
+    return {'files_removed': sum(remove_file(path) for path in payload['paths'])}
+
+
+def staging_path(upload_id):
+    return os.path.join(UPLOAD_TEMP_FOLDER, f'{upload_id}.part')
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def expire_upload_sessions(limit=100):
+    """Remove abandoned resumable uploads and their staging files"""
+    cutoff = datetime.utcnow() - UPLOAD_SESSION_TTL
+    stale = UploadSession.query.filter(UploadSession.created_at < cutoff).limit(limit).all()
+    for session in stale:
+        if os.path.exists(staging_path(session.id)):
+            os.remove(staging_path(session.id))
+        db.session.delete(session)
+
+
+# Background text extraction: new documents get a pending DocumentText row and an
+# extract_text job, which runs the extraction in a process pool after the upload returns
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', 2))
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+
+def extraction_pool():
+    """The worker processes, started on first use by a job thread.
+    
+    They are spawned rather than forked: a fork from a threaded server copies locks other
+    threads hold (logging, the connection pool) and can deadlock the child. Spawned workers
+    import only text_extraction, which needs nothing from this process.
+    """
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            _extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+        return _extraction_pool
+
+
+def document_extension(document):
+    name = document.original_filename or document.file_path or ''
+    return name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+
+
+def save_extracted_text(document_id, status, content, error):
+    """Store an extraction outcome and refresh the document's search row (caller commits)"""
+    db.session.execute(
+        db.update(DocumentText).where(DocumentText.document_id == document_id)
+        .values(status=status, content=content, error=error, updated_at=datetime.utcnow())
+    )
+    if status == 'done':
+        reindex_search(Document, [document_id])
+
+
+@job_handler('extract_text')
+def run_extraction(payload):
+    document = db.session.get(Document, payload['document_id'])
+    if document is None or not document.file_path:
+        # Deleted before its turn came
+        return None
+    future = extraction_pool().submit(extract_document, document.file_path, document_extension(document))
+    try:
+        status, content, error = future.result()
+    except Exception as e:
+        # The worker process died (e.g. out of memory); the backfill command can retry it
+        status, content, error = 'failed', None, f'{type(e).__name__}: {e}'[:500]
+    save_extracted_text(document.id, status, content, error)
+    db.session.commit()
+    return {'status': status}
+
+
+def enqueue_extraction(document):
+    """Queue text extraction for a document in the caller's transaction; it stays pending if the pool is disabled"""
+    if EXTRACTION_WORKERS <= 0 or not document.file_path:
+        return
+    enqueue_job('extract_text', {'document_id': document.id}, priority=JOB_PRIORITY_HIGH)
+
+
+def document_mimetype(document):
+    """Blobs have no extension, so the content type comes from the original filename"""
+    return mimetypes.guess_type(document.original_filename or document.file_path or '')[0] or 'application/octet-stream'
+
+
+def send_document(document, as_attachment):
+    """Send a document's file with byte-range support and validators from its stored metadata"""
+    if not document.file_path or not os.path.exists(document.file_path):
+        return jsonify({'error': 'File not found'}), 404
+    
+    # Content-addressed files never change, so the hash is a perfect strong ETag
+    if document.content_hash:
+        etag = document.content_hash
+    else:
+        stamp = int(document.uploaded_at.timestamp()) if document.uploaded_at else 0
+        etag = f'{document.id}-{document.file_size}-{stamp}'
+    download_name = document.original_filename or document.title
+    
+    if DOCUMENT_SENDFILE_MODE == 'x-accel-redirect':
+        response = current_app.response_class(mimetype=document_mimetype(document))
+        relative = os.path.relpath(document.file_path, UPLOAD_FOLDER).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = DOCUMENT_ACCEL_PREFIX.rstrip('/') + '/' + relative
+        disposition = 'attachment' if as_attachment else 'inline'
+        response.headers.set('Content-Disposition', disposition, filename=download_name)
+        response.set_etag(etag)
+        response.last_modified = document.uploaded_at
+        response.cache_control.max_age = DOCUMENT_CACHE_MAX_AGE
+        # The proxy serves ranges itself; only answer revalidation here
+        response.make_conditional(request)
+        if response.status_code == 304:
+            del response.headers['X-Accel-Redirect']
+    else:
+        # conditional=True answers Range with 206 and If-None-Match/If-Modified-Since with 304;
+        # with USE_X_SENDFILE the body is replaced by an X-Sendfile header
+        response = send_file(
+            os.path.abspath(document.file_path),
+            mimetype=document_mimetype(document),
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=etag,
+            last_modified=document.uploaded_at,
+            max_age=DOCUMENT_CACHE_MAX_AGE
+        )
+    
+    # Documents sit behind authentication, so only the browser may cache them
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if document.content_hash:
+        response.cache_control.immutable = True
+    return response
+
+
 # Document endpoints
-@app.route('/api/entities/<int:entity_id>/documents', methods=['GET'])
+@api.route('/api/entities/<int:entity_id>/documents', methods=['GET'])
 @jwt_required()
+@conditional_get(entity_etag)
 def get_documents(entity_id):
-    entity = Entity.query.get_or_404(entity_id)
-    return jsonify([d.to_dict() for d in entity.documents])
+    try:
+        fields = DOCUMENT_PROJECTION.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return json_response(list_entity_children(DOCUMENT_PROJECTION, entity_id, fields))
 
 
-@app.route('/api/entities/<int:entity_id>/documents', methods=['POST'])
+@api.route('/api/entities/<int:entity_id>/documents', methods=['POST'])
 @jwt_required()
 def upload_document(entity_id):
     Entity.query.get_or_404(entity_id)
@@ -460,14 +2576,9 @@ def upload_document(entity_id):
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
-        # Generate unique filename
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{uuid.uuid4()}.{ext}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        
-        # Get file size
-        file_size = os.path.getsize(filepath)
+        # Hash while spooling, then reuse the stored blob if this content was uploaded before
+        digest, file_size, temp_path = spool_upload(file.stream)
+        filepath = store_blob(temp_path, digest, file_size)
         
         # Create document record
         document = Document(
@@ -476,72 +2587,215 @@ def upload_document(entity_id):
             file_path=filepath,
             original_filename=file.filename,
             document_type=document_type,
-            file_size=file_size
+            file_size=file_size,
+            content_hash=digest
         )
         db.session.add(document)
+        db.session.flush()
+        db.session.add(DocumentText(document_id=document.id))
+        record_changes(Document, [document.id])
+        update_rollups(Document, [], [document.id])
+        mark_entities_changed(entity_id)
+        enqueue_extraction(document)
         db.session.commit()
         return jsonify(document.to_dict()), 201
     
     return jsonify({'error': 'File type not allowed'}), 400
 
 
-@app.route('/api/documents/<int:document_id>', methods=['PUT'])
+# Resumable chunked uploads: init, PUT chunks at the current offset, then complete
+@api.route('/api/entities/<int:entity_id>/uploads', methods=['POST'])
+@jwt_required()
+def create_upload(entity_id):
+    Entity.query.get_or_404(entity_id)
+    data = request.json
+    filename = data.get('filename') or ''
+    size = data.get('size')
+    sha256 = (data.get('sha256') or '').lower()
+    
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return jsonify({'error': 'size must be a positive integer'}), 400
+    if size > MAX_UPLOAD_SIZE:
+        return jsonify({'error': f'Files are limited to {MAX_UPLOAD_SIZE} bytes'}), 413
+    if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+        return jsonify({'error': 'sha256 must be a hex SHA-256 digest'}), 400
+    
+    expire_upload_sessions()
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        entity_id=entity_id,
+        title=data.get('title') or filename,
+        original_filename=filename,
+        document_type=data.get('document_type', ''),
+        size=size,
+        sha256=sha256
+    )
+    os.makedirs(UPLOAD_TEMP_FOLDER, exist_ok=True)
+    open(staging_path(session.id), 'wb').close()
+    db.session.add(session)
+    db.session.commit()
+    return jsonify(session.to_dict()), 201
+
+
+@api.route('/api/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Report how many bytes were received so an interrupted client knows where to resume"""
+    session = UploadSession.query.get_or_404(upload_id)
+    return jsonify(session.to_dict())
+
+
+@api.route('/api/uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+def put_upload_chunk(upload_id):
+    session = UploadSession.query.get_or_404(upload_id)
+    try:
+        offset = int(request.args['offset'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'offset query parameter is required'}), 400
+    if offset != session.received:
+        # Out-of-order or replayed chunk; tell the client where to continue
+        return jsonify({'error': 'Offset does not match received bytes', **session.to_dict()}), 409
+    
+    # Write at the offset rather than appending, so a retried chunk overwrites a partial one
+    received = offset
+    with open(staging_path(upload_id), 'r+b') as f:
+        f.seek(offset)
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > session.size:
+                return jsonify({'error': 'Chunk runs past the declared file size'}), 400
+            f.write(chunk)
+        f.truncate()
+    
+    updated = db.session.execute(
+        db.update(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.received == offset)
+        .values(received=received)
+    ).rowcount
+    db.session.commit()
+    if not updated:
+        return jsonify({'error': 'Another chunk was written concurrently', **UploadSession.query.get_or_404(upload_id).to_dict()}), 409
+    session = db.session.get(UploadSession, upload_id)
+    return jsonify(session.to_dict())
+
+
+@api.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(upload_id):
+    """Verify the assembled file's checksum and turn it into a Document"""
+    session = UploadSession.query.get_or_404(upload_id)
+    if session.received != session.size:
+        return jsonify({'error': 'Upload is incomplete', **session.to_dict()}), 409
+    
+    path = staging_path(upload_id)
+    digest = hash_file(path)
+    if digest != session.sha256:
+        # Start over: the assembled bytes don't match what the client declared
+        open(path, 'wb').close()
+        session.received = 0
+        db.session.commit()
+        return jsonify({'error': 'Checksum mismatch, upload must be restarted', **session.to_dict()}), 422
+    
+    filepath = store_blob(path, digest, session.size)
+    document = Document(
+        entity_id=session.entity_id,
+        title=session.title,
+        file_path=filepath,
+        original_filename=session.original_filename,
+        document_type=session.document_type,
+        file_size=session.size,
+        content_hash=digest
+    )
+    db.session.add(document)
+    db.session.delete(session)
+    db.session.flush()
+    db.session.add(DocumentText(document_id=document.id))
+    record_changes(Document, [document.id])
+    update_rollups(Document, [], [document.id])
+    mark_entities_changed(document.entity_id)
+    enqueue_extraction(document)
+    db.session.commit()
+    return jsonify(document.to_dict()), 201
+
+
+@api.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload(upload_id):
+    session = UploadSession.query.get_or_404(upload_id)
+    if os.path.exists(staging_path(upload_id)):
+        os.remove(staging_path(upload_id))
+    db.session.delete(session)
+    db.session.commit()
+    return '', 204
+
+
+@api.route('/api/documents/<int:document_id>', methods=['PUT'])
 @jwt_required()
 def update_document(document_id):
     document = Document.query.get_or_404(document_id)
     data = request.json
     document.title = data.get('title', document.title)
     document.document_type = data.get('document_type', document.document_type)
+    record_changes(Document, [document_id])
+    mark_entities_changed(document.entity_id)
     db.session.commit()
     return jsonify(document.to_dict())
 
 
-@app.route('/api/documents/<int:document_id>', methods=['DELETE'])
+@api.route('/api/documents/<int:document_id>', methods=['DELETE'])
 @jwt_required()
 def delete_document(document_id):
     document = Document.query.get_or_404(document_id)
     
-    # Delete file from filesystem
-    if document.file_path and os.path.exists(document.file_path):
-        os.remove(document.file_path)
+    # Files are removed by jobs once the delete has committed; shared blobs only with their last document
+    if document.content_hash:
+        if release_blob(document.content_hash):
+            enqueue_job('sweep_blobs', priority=JOB_PRIORITY_LOW)
+    elif document.file_path:
+        enqueue_job('remove_files', {'paths': [document.file_path]}, priority=JOB_PRIORITY_LOW)
     
+    before = rollup_snapshot(Document, [document_id])
     db.session.delete(document)
+    record_changes(Document, [document_id])
+    update_rollups(Document, before, [document_id])
+    mark_entities_changed(document.entity_id)
     db.session.commit()
     return '', 204
 
 
-@app.route('/api/documents/<int:document_id>/download', methods=['GET'])
+@api.route('/api/documents/<int:document_id>/text', methods=['GET'])
+@jwt_required()
+def get_document_text(document_id):
+    Document.query.get_or_404(document_id)
+    extracted = db.session.get(DocumentText, document_id)
+    if extracted is None:
+        # Uploaded before extraction existed and not yet backfilled
+        return jsonify({'document_id': document_id, 'status': 'pending', 'error': None,
+                        'characters': 0, 'content': None, 'updated_at': None})
+    return jsonify(extracted.to_dict())
+
+
+@api.route('/api/documents/<int:document_id>/download', methods=['GET'])
 @jwt_required()
 def download_document(document_id):
     document = Document.query.get_or_404(document_id)
-    
-    if not document.file_path or not os.path.exists(document.file_path):
-        return jsonify({'error': 'File not found'}), 404
-    
-    return send_from_directory(
-        os.path.dirname(document.file_path),
-        os.path.basename(document.file_path),
-        download_name=document.original_filename or document.title,
-        as_attachment=True
-    )
+    return send_document(document, as_attachment=True)
 
 
-@app.route('/api/documents/<int:document_id>/view', methods=['GET'])
+@api.route('/api/documents/<int:document_id>/view', methods=['GET'])
 @jwt_required()
 def view_document(document_id):
     document = Document.query.get_or_404(document_id)
-    
-    if not document.file_path or not os.path.exists(document.file_path):
-        return jsonify({'error': 'File not found'}), 404
-    
-    return send_from_directory(
-        os.path.dirname(document.file_path),
-        os.path.basename(document.file_path),
-        as_attachment=False
-    )
+    return send_document(document, as_attachment=False)
 
 
-@app.route('/api/documents/<int:document_id>/token/<token>', methods=['GET'])
+@api.route('/api/documents/<int:document_id>/token/<token>', methods=['GET'])
 def view_document_with_token(document_id, token):
     """View document with temporary token for iframe compatibility"""
     from flask_jwt_extended import decode_token
@@ -550,36 +2804,674 @@ def view_document_with_token(document_id, token):
         # Verify the token
         decoded = decode_token(token)
         document = Document.query.get_or_404(document_id)
-        
-        if not document.file_path or not os.path.exists(document.file_path):
-            return jsonify({'error': 'File not found'}), 404
-        
-        return send_from_directory(
-            os.path.dirname(document.file_path),
-            os.path.basename(document.file_path),
-            as_attachment=False
-        )
+        return send_document(document, as_attachment=False)
     except Exception as e:
         return jsonify({'error': 'Invalid or expired token'}), 401
 
 
-@app.route('/api/health', methods=['GET'])
+# Portfolio export
+EXPORT_BATCH_SIZE = 1000
+EXPORT_RESOURCES = {
+    'entities': ENTITY_PROJECTION,
+    'accounts': ACCOUNT_PROJECTION,
+    'tasks': TASK_PROJECTION,
+    'documents': DOCUMENT_PROJECTION,
+}
+
+
+def stream_projection(projection, order_by):
+    """Yield serialized rows through a server-side cursor, one batch in memory at a time"""
+    stmt, names = projection.select(projection.field_names)
+    stmt = stmt.order_by(*order_by).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    for partition in db.session.execute(stmt).partitions():
+        yield from projection.serialize(partition, names, projection.field_names)
+
+
+def stream_portfolio():
+    """Yield each entity in the GET /api/entities/<id> shape.
+    
+    Each child table is streamed once ordered by entity_id and merged against the
+    entity stream, so the export costs four queries regardless of portfolio size.
+    """
+    children = {}
+    for name, projection in ENTITY_COLLECTIONS.items():
+        model = projection.model
+        rows = stream_projection(projection, [model.entity_id, model.id])
+        children[name] = [rows, next(rows, None)]
+    
+    for entity in stream_projection(ENTITY_PROJECTION, [Entity.id]):
+        for name, state in children.items():
+            rows, head = state
+            items = []
+            while head is not None and head['entity_id'] <= entity['id']:
+                if head['entity_id'] == entity['id']:
+                    items.append(head)
+                head = next(rows, None)
+            state[1] = head
+            entity[name] = items
+        yield entity
+
+
+def ndjson_chunks(records):
+    batch = []
+    for record in records:
+        batch.append(dumps_json(record))
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield b'\n'.join(batch) + b'\n'
+            batch = []
+    if batch:
+        yield b'\n'.join(batch) + b'\n'
+
+
+def csv_chunks(projection, records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(projection.field_names)
+    for count, record in enumerate(records, 1):
+        writer.writerow([
+            json.dumps(value) if isinstance(value, (list, dict)) else value
+            for value in record.values()
+        ])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+@api.route('/api/export', methods=['GET'])
+@jwt_required()
+def export_portfolio():
+    """Stream the portfolio as NDJSON (nested entities by default) or as CSV for one resource"""
+    export_format = request.args.get('format', 'ndjson')
+    resource = request.args.get('resource')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    if resource is not None and resource not in EXPORT_RESOURCES:
+        return jsonify({'error': f"resource must be one of: {', '.join(EXPORT_RESOURCES)}"}), 400
+    
+    if export_format == 'csv':
+        projection = EXPORT_RESOURCES[resource or 'entities']
+        records = stream_projection(projection, [projection.model.id])
+        chunks = csv_chunks(projection, records)
+        filename = f"{resource or 'entities'}.csv"
+        mimetype = 'text/csv'
+    else:
+        if resource:
+            projection = EXPORT_RESOURCES[resource]
+            records = stream_projection(projection, [projection.model.id])
+        else:
+            records = stream_portfolio()
+        chunks = ndjson_chunks(records)
+        filename = f"{resource or 'portfolio'}.ndjson"
+        mimetype = 'application/x-ndjson'
+    
+    return current_app.response_class(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+# Spreadsheet import
+IMPORT_CHUNK_SIZE = 500
+MAX_IMPORT_ERRORS = 1000
+IMPORT_EXTENSIONS = {'csv', 'xlsx'}
+MAX_IDEMPOTENCY_KEY_LENGTH = 100
+IMPORT_RESOURCES = {
+    'entities': {'model': Entity, 'values': entity_values, 'required': ('name',), 'key': ('ein',)},
+    'accounts': {'model': Account, 'values': account_values, 'required': ('account_name',), 'key': ('entity_id', 'account_number')},
+    'tasks': {'model': Task, 'values': task_values, 'required': ('title',), 'key': ('entity_id', 'title')},
+}
+
+
+def normalize_cell(value):
+    """Convert a CSV/XLSX cell to the payload representation used by the JSON endpoints"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def iter_spreadsheet_rows(stream, extension):
+    """Yield (row number, {column: value}) from a binary CSV or XLSX stream without loading it whole"""
+    if extension == 'csv':
+        rows = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    else:
+        import openpyxl
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    
+    header = next(rows, None) or []
+    columns = [str(name).strip().lower().replace(' ', '_') if name is not None else '' for name in header]
+    for number, values in enumerate(rows, start=2):
+        record = {}
+        for column, value in zip(columns, values):
+            value = normalize_cell(value)
+            if column and value is not None:
+                record[column] = value
+        if record:
+            yield number, record
+
+
+def coerce_import_record(record):
+    """Convert spreadsheet text into the JSON types the payload parsers expect"""
+    for key in ('id', 'entity_id'):
+        if key in record:
+            record[key] = int(float(record[key]))
+    for key in NUMERIC_FIELDS:
+        if key in record and isinstance(record[key], str):
+            record[key] = float(record[key].replace(',', '').lstrip('$'))
+    for key in ('account_number', 'ein'):
+        if key in record and not isinstance(record[key], str):
+            record[key] = str(int(record[key])) if isinstance(record[key], float) and record[key].is_integer() else str(record[key])
+    if isinstance(record.get('dependencies'), str):
+        text = record['dependencies']
+        record['dependencies'] = json.loads(text) if text.startswith('[') else [d.strip() for d in text.split(',') if d.strip()]
+    return record
+
+
+def changed_update_rows(model, rows):
+    """The update rows that would change their record, each cut down to the values that differ"""
+    rows = [row for row in rows if len(row) > 1]
+    if not rows:
+        return []
+    names = sorted({name for row in rows for name in row if name != 'id'})
+    stored = {record.id: record for record in db.session.execute(
+        db.select(model.id, *[getattr(model, name) for name in names]).where(model.id.in_([row['id'] for row in rows]))
+    )}
+    changed = []
+    for row in rows:
+        values = {name: value for name, value in row.items()
+                  if name != 'id' and getattr(stored[row['id']], name) != value}
+        if values:
+            changed.append({'id': row['id'], **values})
+    return changed
+
+
+def import_chunk(spec, chunk, summary):
+    """Upsert one chunk of (row number, record) pairs in a single transaction"""
+    model = spec['model']
+    errors = []
+    
+    # Resolve entity references for child rows in one query
+    if model is not Entity:
+        eins = {record['entity_ein'] for _, record in chunk if 'entity_ein' in record and 'entity_id' not in record}
+        if eins:
+            by_ein = dict(db.session.execute(db.select(Entity.ein, Entity.id).where(Entity.ein.in_(eins))).all())
+            for _, record in chunk:
+                if 'entity_ein' in record and 'entity_id' not in record and record['entity_ein'] in by_ein:
+                    record['entity_id'] = by_ein[record['entity_ein']]
+        entity_ids = {record['entity_id'] for _, record in chunk if 'entity_id' in record}
+        known_entities = set(db.session.scalars(db.select(Entity.id).where(Entity.id.in_(entity_ids))))
+    
+    # Match rows to existing records by id, then by the natural key
+    ids = {record['id'] for _, record in chunk if 'id' in record}
+    owner = model.id if model is Entity else model.entity_id
+    existing_ids = dict(db.session.execute(db.select(model.id, owner).where(model.id.in_(ids))).all())
+    key_columns = [getattr(model, name) for name in spec['key']]
+    keys = {tuple(record[name] for name in spec['key']) for _, record in chunk
+            if 'id' not in record and all(name in record for name in spec['key'])}
+    by_key = {}
+    if keys:
+        if len(key_columns) == 1:
+            condition = key_columns[0].in_([key[0] for key in keys])
+        else:
+            condition = tuple_(*key_columns).in_(keys)
+        lookup = db.select(*key_columns, model.id, owner).where(condition)
+        by_key = {}
+        for row in db.session.execute(lookup):
+            by_key[tuple(row[:-2])] = row[-2]
+            existing_ids[row[-2]] = row[-1]
+    
+    inserts, pending, updates = [], {}, {}
+    for number, record in chunk:
+        needs_entity = 'entity_id' in record or 'id' not in record
+        if model is not Entity and needs_entity and record.get('entity_id') not in known_entities:
+            errors.append({'row': number, 'error': 'Unknown entity (set entity_id or entity_ein)'})
+            continue
+        key = tuple(record.get(name) for name in spec['key'])
+        target_id = record['id'] if 'id' in record else by_key.get(key)
+        if 'id' in record and target_id not in existing_ids:
+            errors.append({'row': number, 'error': f"{model.__name__} {record['id']} not found"})
+            continue
+        
+        if target_id is not None:
+            values, error = validate_batch_item(record, spec['values'], (), partial=True)
+            if error is None:
+                updates.setdefault(target_id, {'id': target_id}).update(values)
+        elif key in pending and all(key):
+            # A repeated natural key within the chunk updates the pending insert
+            values, error = validate_batch_item(record, spec['values'], (), partial=True)
+            if error is None:
+                pending[key].update(values)
+        else:
+            values, error = validate_batch_item(record, spec['values'], spec['required'], partial=False)
+            if error is None:
+                if model is not Entity:
+                    values['entity_id'] = record['entity_id']
+                inserts.append(values)
+                if all(key):
+                    pending[key] = values
+        if error:
+            errors.append({'row': number, 'error': error})
+    
+    update_rows = []
+    try:
+        # Rows that match a record without changing it are neither written nor counted
+        update_rows = changed_update_rows(model, updates.values())
+        before = rollup_snapshot(model, [row['id'] for row in update_rows])
+        inserted_ids = []
+        if inserts:
+            inserted_ids = db.session.scalars(
+                db.insert(model).returning(model.id, sort_by_parameter_order=True), inserts
+            ).all()
+        if update_rows:
+            db.session.execute(db.update(model), update_rows)
+        if model is Task:
+            inserted = [{**row, 'id': task_id} for row, task_id in zip(inserts, inserted_ids)]
+            entity_by_task = {**existing_ids, **{row['id']: row['entity_id'] for row in inserted}}
+            sync_dependency_rows(inserted + update_rows, entity_by_task)
+        record_changes(model, inserted_ids + [row['id'] for row in update_rows])
+        update_rollups(model, before, inserted_ids + [row['id'] for row in update_rows])
+        changed = [existing_ids[row['id']] for row in update_rows]
+        if model is not Entity:
+            changed += [row['entity_id'] for row in inserts]
+        mark_entities_changed(*changed, listing=model is Entity)
+        db.session.commit()
+    except (SQLAlchemyError, DependencyCycleError) as e:
+        # The database rejected the chunk as a whole, so none of its rows were written
+        db.session.rollback()
+        error = str(getattr(e, 'orig', e)).strip().splitlines()[0]
+        errors = [{'row': number, 'error': f'Chunk rolled back: {error}'} for number, _ in chunk]
+        inserts, update_rows = [], []
+    
+    summary['rows'] += len(chunk)
+    summary['inserted'] += len(inserts)
+    summary['updated'] += len(update_rows)
+    summary['failed'] += len(errors)
+    room = MAX_IMPORT_ERRORS - len(summary['errors'])
+    summary['errors'].extend(errors[:max(room, 0)])
+
+
+def run_import(spec, rows, summary):
+    """Import rows chunk by chunk, updating `summary` and yielding after each committed chunk"""
+    chunk = []
+    for number, record in rows:
+        try:
+            chunk.append((number, coerce_import_record(record)))
+        except (TypeError, ValueError) as e:
+            summary['rows'] += 1
+            summary['failed'] += 1
+            if len(summary['errors']) < MAX_IMPORT_ERRORS:
+                summary['errors'].append({'row': number, 'error': f'Invalid value: {e}'})
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            import_chunk(spec, chunk, summary)
+            chunk = []
+            yield
+    if chunk:
+        import_chunk(spec, chunk, summary)
+        yield
+
+
+def new_import_summary():
+    return {'rows': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': []}
+
+
+@job_handler('import_records')
+def run_import_job(payload):
+    """Import a spooled spreadsheet and remove it; import jobs get a single attempt"""
+    spec = IMPORT_RESOURCES[payload['resource']]
+    summary = new_import_summary()
+    try:
+        with open(payload['path'], 'rb') as f:
+            for _ in run_import(spec, iter_spreadsheet_rows(f, payload['extension']), summary):
+                pass
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(payload['path'])
+    return summary
+
+
+def job_accepted(job):
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response
+
+
+def enqueue_import(resource, file, extension):
+    """Spool an import to the upload volume and queue it, honouring the client's Idempotency-Key"""
+    key = request.headers.get('Idempotency-Key')
+    if key is not None:
+        if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters'}), 400
+        # Keys are per user, so clients can't collide with (or look up) each other's imports
+        key = f'import:{get_jwt_identity()}:{key}'
+        existing = Job.query.filter_by(idempotency_key=key).first()
+        if existing is not None:
+            return job_accepted(existing)
+    
+    _, _, path = spool_upload(file.stream)
+    # A retry after a partial import would insert the rows without keys twice, so no retries
+    job, created = enqueue_job('import_records', {'resource': resource, 'path': path, 'extension': extension},
+                               idempotency_key=key, max_attempts=1)
+    db.session.commit()
+    if not created:
+        os.remove(path)
+    return job_accepted(job)
+
+
+@api.route('/api/import/<resource>', methods=['POST'])
+@jwt_required()
+def import_records(resource):
+    """Upsert entities, accounts or tasks from an uploaded CSV/XLSX, streaming NDJSON progress
+    
+    With `Prefer: respond-async` the file is imported by a background job instead, and the
+    response is 202 with the job to poll at GET /api/jobs/<id>.
+    """
+    spec = IMPORT_RESOURCES.get(resource)
+    if spec is None:
+        return jsonify({'error': f"resource must be one of: {', '.join(IMPORT_RESOURCES)}"}), 400
+    
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No file provided'}), 400
+    extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+    if extension not in IMPORT_EXTENSIONS:
+        return jsonify({'error': 'Only CSV and XLSX files can be imported'}), 400
+    if extension == 'xlsx' and not OPENPYXL_AVAILABLE:
+        return jsonify({'error': 'XLSX import requires openpyxl to be installed'}), 400
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return enqueue_import(resource, file, extension)
+    
+    def generate():
+        summary = new_import_summary()
+        for _ in run_import(spec, iter_spreadsheet_rows(file.stream, extension), summary):
+            progress = {key: value for key, value in summary.items() if key != 'errors'}
+            yield dumps_json({'event': 'progress', **progress}) + b'\n'
+        yield dumps_json({'event': 'complete', **summary}) + b'\n'
+    
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# Background job status
+@api.route('/api/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Poll a job queued by a 202 response: status, attempts, and the handler's result or last error"""
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+
+# Full-text search
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+@api.route('/api/search', methods=['GET'])
+@jwt_required()
+def search():
+    """Ranked prefix search over entities, accounts, tasks and documents"""
+    terms = SEARCH_TERM.findall(request.args.get('q', '').lower())
+    if not terms:
+        return jsonify({'error': 'q must contain at least one word'}), 400
+    kinds = {kind for kind, _, _ in SEARCH_FIELDS.values()}
+    types = [t for t in request.args.get('type', '').split(',') if t]
+    if any(t not in kinds for t in types):
+        return jsonify({'error': f"type must be a comma-separated list of: {', '.join(sorted(kinds))}"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_PAGE_SIZE)), 1), MAX_SEARCH_PAGE_SIZE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    columns = [SearchIndex.kind, SearchIndex.record_id, SearchIndex.entity_id, SearchIndex.label]
+    if db.engine.dialect.name == 'postgresql':
+        # Every word must match as a prefix, so results appear while typing
+        query = db.func.to_tsquery(db.literal_column("'simple'"), ' & '.join(f'{term}:*' for term in terms))
+        rank = db.func.ts_rank_cd(SEARCH_VECTOR, query)
+        stmt = db.select(*columns, rank.label('rank')).where(SEARCH_VECTOR.op('@@')(query)) \
+            .order_by(rank.desc(), SearchIndex.id)
+    else:
+        fts = db.table('search_fts', db.column('rowid'))
+        # bm25 is lower-is-better; weight title matches ten times body matches
+        rank = -db.func.bm25(db.literal_column('search_fts'), 10.0, 1.0)
+        stmt = db.select(*columns, rank.label('rank')) \
+            .join(fts, fts.c.rowid == SearchIndex.id) \
+            .where(db.literal_column('search_fts').op('MATCH')(' '.join(f'"{term}"*' for term in terms))) \
+            .order_by(rank.desc(), SearchIndex.id)
+    if types:
+        stmt = stmt.where(SearchIndex.kind.in_(types))
+    
+    rows = db.session.execute(stmt.limit(limit + 1).offset(offset)).all()
+    results = [{
+        'type': row.kind,
+        'id': row.record_id,
+        'entity_id': row.entity_id,
+        'label': row.label,
+        'rank': float(row.rank)
+    } for row in rows[:limit]]
+    return json_response({'results': results, 'next_offset': offset + limit if len(rows) > limit else None})
+
+
+# Change feed
+CHANGE_PAGE_SIZE = 500
+MAX_CHANGE_PAGE_SIZE = 5000
+CHANGE_PROJECTIONS = {
+    'entity': ENTITY_PROJECTION,
+    'account': ACCOUNT_PROJECTION,
+    'task': TASK_PROJECTION,
+    'document': DOCUMENT_PROJECTION,
+}
+
+
+@api.route('/api/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """Changes after the `since` cursor, collapsed to the latest state of each record.
+    
+    Without `since` only the current cursor is returned, for clients to take before their initial load.
+    """
+    if 'since' not in request.args:
+        latest = db.session.scalar(db.select(db.func.max(ChangeLog.id))) or 0
+        return json_response({'changes': [], 'next_cursor': str(latest), 'has_more': False})
+    try:
+        since = int(request.args['since'])
+        limit = min(max(int(request.args.get('limit', CHANGE_PAGE_SIZE)), 1), MAX_CHANGE_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    
+    pruned = db.session.scalar(db.select(db.func.max(ChangeLog.id)).where(ChangeLog.op == 'pruned'))
+    if pruned is not None and since < pruned:
+        return jsonify({'error': 'Cursor is older than the change log; reload everything and start again'}), 410
+    
+    entries = db.session.execute(
+        db.select(ChangeLog.id, ChangeLog.kind, ChangeLog.record_id, ChangeLog.op)
+        .where(ChangeLog.id > since, ChangeLog.op != 'pruned')
+        .order_by(ChangeLog.id)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    
+    # Several writes to one record in the page collapse into its current state
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.kind, entry.record_id), None)
+        latest[entry.kind, entry.record_id] = entry
+    current = {}
+    for kind, projection in CHANGE_PROJECTIONS.items():
+        ids = [record_id for (entry_kind, record_id), entry in latest.items() if entry_kind == kind and entry.op == 'upsert']
+        for start in range(0, len(ids), MAX_BATCH_SIZE):
+            stmt, names = projection.select(projection.field_names)
+            rows = db.session.execute(stmt.where(projection.model.id.in_(ids[start:start + MAX_BATCH_SIZE]))).all()
+            for record in projection.serialize(rows, names, projection.field_names):
+                current[kind, record['id']] = record
+    
+    changes = []
+    for key, entry in latest.items():
+        record = current.get(key)
+        if record is not None:
+            changes.append({'cursor': str(entry.id), 'type': entry.kind, 'op': 'upsert', 'id': entry.record_id, 'data': record})
+        else:
+            # Deleted in this page, or since: either way the client should drop it
+            changes.append({'cursor': str(entry.id), 'type': entry.kind, 'op': 'delete', 'id': entry.record_id})
+    next_cursor = str(entries[-1].id) if entries else str(since)
+    return json_response({'changes': changes, 'next_cursor': next_cursor, 'has_more': has_more})
+
+
+def format_event(event):
+    return f"id: {event['cursor']}\nevent: change\ndata: {json.dumps(event)}\n\n"
+
+
+@api.route('/api/events', methods=['GET'])
+def event_stream():
+    """Server-Sent Events stream of change notifications.
+    
+    EventSource cannot send headers, so the JWT comes as ?token=. A reconnecting client's
+    Last-Event-ID is answered with the changes it missed from the change log.
+    """
+    from flask_jwt_extended import decode_token
+    
+    try:
+        decode_token(request.args.get('token', ''))
+    except Exception:
+        return jsonify({'error': 'Invalid or expired token'}), 401
+    
+    subscription = event_broker.subscribe()
+    if subscription is None:
+        return jsonify({'error': 'Too many open event streams'}), 503, {'Retry-After': '30'}
+    
+    replay = None
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    if last_event_id.isdigit():
+        missed = db.session.execute(
+            db.select(ChangeLog.id, ChangeLog.kind, ChangeLog.record_id, ChangeLog.op)
+            .where(ChangeLog.id > int(last_event_id), ChangeLog.op != 'pruned')
+            .order_by(ChangeLog.id)
+            .limit(MAX_EVENT_CHANGES + 1)
+        ).all()
+        if missed:
+            latest = db.session.scalar(db.select(db.func.max(ChangeLog.id)))
+            replay = {
+                'cursor': str(latest),
+                'changes': [{'type': row.kind, 'id': row.record_id, 'op': row.op} for row in missed[:MAX_EVENT_CHANGES]],
+                'truncated': len(missed) > MAX_EVENT_CHANGES
+            }
+    # Don't hold a pooled connection for the life of the stream
+    db.session.close()
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            if replay:
+                yield format_event(replay)
+            while True:
+                try:
+                    event = subscription.get(timeout=EVENT_HEARTBEAT)
+                except queue.Empty:
+                    # Comment lines keep proxies from closing an idle stream and reveal dead clients
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            event_broker.unsubscribe(subscription)
+    
+    return current_app.response_class(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+# Portfolio dashboard
+@api.route('/api/dashboard', methods=['GET'])
+@jwt_required()
+def get_dashboard():
+    """Per-entity and portfolio totals read from the rollup tables, one row per entity"""
+    entities = db.session.execute(
+        db.select(Entity.id, Entity.name, Entity.status, EntityRollup)
+        .outerjoin(EntityRollup, EntityRollup.entity_id == Entity.id)
+        .order_by(Entity.name, Entity.id)
+    ).all()
+    by_status, by_priority = defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int))
+    for entity_id, status, priority, count in db.session.execute(
+        db.select(TaskRollup.entity_id, TaskRollup.status, TaskRollup.priority, TaskRollup.task_count)
+    ):
+        by_status[entity_id][status or 'none'] += count
+        by_priority[entity_id][priority or 'none'] += count
+    overdue = dict(db.session.execute(
+        db.select(TaskDueRollup.entity_id, db.func.sum(TaskDueRollup.open_count))
+        .where(TaskDueRollup.due_date < date.today())
+        .group_by(TaskDueRollup.entity_id)
+    ).all())
+    
+    totals = {'entities': len(entities), 'accounts': 0, 'total_balance': 0.0, 'tasks': 0, 'overdue_tasks': 0,
+              'documents': 0, 'document_bytes': 0,
+              'tasks_by_status': defaultdict(int), 'tasks_by_priority': defaultdict(int)}
+    results = []
+    for entity_id, name, status, rollup in entities:
+        summary = {
+            'id': entity_id,
+            'name': name,
+            'status': status,
+            'accounts': rollup.account_count if rollup else 0,
+            'total_balance': rollup.total_balance if rollup else 0.0,
+            'tasks': rollup.task_count if rollup else 0,
+            'tasks_by_status': dict(by_status.get(entity_id, {})),
+            'tasks_by_priority': dict(by_priority.get(entity_id, {})),
+            'overdue_tasks': int(overdue.get(entity_id) or 0),
+            'documents': rollup.document_count if rollup else 0,
+            'document_bytes': rollup.document_bytes if rollup else 0
+        }
+        results.append(summary)
+        for key in ('accounts', 'total_balance', 'tasks', 'overdue_tasks', 'documents', 'document_bytes'):
+            totals[key] += summary[key]
+        for key in ('tasks_by_status', 'tasks_by_priority'):
+            for label, count in summary[key].items():
+                totals[key][label] += count
+    return json_response({'totals': totals, 'entities': results})
+
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'status': 'unhealthy', 'database': str(e.__cause__ or e)}), 503
     return jsonify({'status': 'healthy'})
 
 
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint; set METRICS_TOKEN to require it as a bearer token"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Invalid metrics token'}), 401
+    for engine in db.engines.values():
+        pool = engine.pool
+        if isinstance(pool, InstrumentedQueuePool):
+            POOL_CONNECTIONS.set(pool.checkedout(), pool=pool.label, state='in_use')
+            POOL_CONNECTIONS.set(pool.checkedin(), pool=pool.label, state='idle')
+            POOL_CAPACITY.set(pool.capacity, pool=pool.label)
+    return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 # Serve static files
-@app.route('/')
+@api.route('/')
 def index():
     return send_from_directory('static', 'index.html')
 
 
-@app.route('/uploads/<filename>')
+@api.route('/uploads/<filename>')
 def serve_upload(filename):
     return send_from_directory(UPLOAD_FOLDER, filename)
 
 
-@app.route('/api/info', methods=['GET'])
+@api.route('/api/info', methods=['GET'])
 def api_info():
     return jsonify({
         'message': 'Entuq - Entity Tracking API',
@@ -592,12 +3484,71 @@ def api_info():
     })
 
 
-# Initialize database
-with app.app_context():
-    db.create_all()
-    print("Database tables initialized")
+# Schema version check: one query per worker, on its first request rather than at import
+_schema_check_lock = threading.Lock()
+
+
+@api.before_app_request
+def check_schema_version():
+    state = current_app.extensions.setdefault('schema_version', {})
+    if 'version' in state:
+        return
+    with _schema_check_lock:
+        if 'version' in state:
+            return
+        try:
+            version = db.session.scalar(db.text('SELECT version_num FROM alembic_version'))
+        except SQLAlchemyError:
+            db.session.rollback()
+            version = None
+        state['version'] = version
+    if version != SCHEMA_REVISION:
+        print(f"WARNING: database schema is at revision {version}, this code expects {SCHEMA_REVISION}; "
+              f"run python run_migrations.py")
+
+
+def create_app(config=None):
+    """Build the app and bind the extensions.
+    
+    Nothing here connects to the database: run_migrations.py creates and upgrades the
+    schema once per deploy, and each worker checks its version on the first request.
+    """
+    app = Flask(__name__, static_folder='static', static_url_path='')
+    app.config['JWT_SECRET_KEY'] = JWT_SECRET_KEY
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    app.config['USE_X_SENDFILE'] = DOCUMENT_SENDFILE_MODE == 'x-sendfile'
+    app.config['DATABASE_REPLICA_URL'] = DATABASE_REPLICA_URL
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI'], 'primary'))
+    replica_url = app.config['DATABASE_REPLICA_URL']
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {
+            'url': replica_url, **engine_options(replica_url, REPLICA_BIND)}
+    app.request_class = SizeLimitedRequest
+    
+    CORS(app)
+    jwt.init_app(app)
+    db.init_app(app)
+    # Each revision commits on its own, so a failure leaves the earlier ones applied
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR, transaction_per_migration=True)
+    app.register_blueprint(api)
+    app.extensions['job_queue'] = JobQueue(app)
+    app.extensions['response_cache'] = ResponseCache(RESPONSE_CACHE_SIZE)
+    # No uploads/ here: the code that writes a file creates the folder it writes to, so
+    # importing the app leaves the working directory alone
+    return app
+
+
+app = create_app()
 
 
 if __name__ == '__main__':
+    # The development server sets up its own database; deployments run run_migrations.py
+    with app.app_context():
+        db.create_all()
     port = int(os.environ.get('PORT', 8000))
     app.run(debug=False, host='0.0.0.0', port=port)
@@ -0,0 +1,524 @@
+"""Load test every API endpoint against a seeded database and save the latencies as JSON.
+
+By default a gunicorn server (gunicorn.conf.py) is started on a fresh SQLite
+database in a temporary directory, seeded with synthetic data over the API,
+and driven by concurrent keep-alive clients:
+
+    python benchmark.py --entities 200 --requests 200 --concurrency 8
+    python benchmark.py --database-url postgresql://localhost/bench --output after.json --compare before.json
+    python benchmark.py --url http://localhost:8000 --no-seed --only entity_detail,search
+
+Generated data is reproducible for a given --seed. The SSE stream (/api/events)
+and legacy /uploads/<filename> paths are not load tested: one is a long-lived
+connection, the other only serves files from before content-addressed storage.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit, quote
+import argparse
+import hashlib
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_SIZE = 500
+WORDS = ('capital', 'holdings', 'ventures', 'partners', 'trust', 'realty', 'logistics', 'energy', 'labs',
+         'annual', 'filing', 'audit', 'renewal', 'payroll', 'invoice', 'lease', 'license', 'insurance',
+         'escrow', 'budget', 'forecast', 'review', 'contract', 'compliance', 'tax', 'board', 'minutes')
+STATES = ('DE', 'NV', 'WY', 'TX', 'CA', 'NY', 'FL')
+ACCOUNT_TYPES = ('checking', 'savings', 'credit', 'brokerage', 'loan')
+TASK_STATUSES = ('pending', 'in_progress', 'completed', 'blocked')
+PRIORITIES = ('low', 'medium', 'high', 'urgent')
+
+
+class Client:
+    """Minimal keep-alive HTTP client; one per thread"""
+
+    def __init__(self, base_url, token=None):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connect = lambda: connection_class(parts.hostname, parts.port, timeout=120)
+        self.prefix = parts.path.rstrip('/')
+        self.token = token
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.token and 'Authorization' not in headers:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = self.connect()
+            try:
+                self.connection.request(method, self.prefix + path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                return response.status, response.read(), response.headers
+            except (http.client.HTTPException, OSError):
+                # The server closed the kept-alive connection; retry once on a new one
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+
+    def json(self, method, path, body=None, headers=None, expect=(200, 201)):
+        status, data, _ = self.request(method, path, body, headers)
+        if status not in expect:
+            raise RuntimeError(f'{method} {path} returned {status}: {data[:200]!r}')
+        return json.loads(data) if data else None
+
+
+def encode_multipart(fields, files):
+    """Return (body, content type) for form fields and {name: (filename, bytes)} files"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def phrase(rng, words=3):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def document_content(rng, size):
+    text = []
+    while sum(len(line) for line in text) < size:
+        text.append(phrase(rng, 12) + '\n')
+    return ''.join(text)[:size].encode()
+
+
+# Synthetic data
+def seed_portfolio(client, rng, entities, accounts, tasks, documents, document_size):
+    """Create entities with accounts, dependent tasks and text documents through the API"""
+    started = time.perf_counter()
+    today = date.today()
+    for n in range(entities):
+        entity = client.json('POST', '/api/entities', {
+            'name': f'{phrase(rng, 2).title()} {n}',
+            'description': phrase(rng, 8),
+            'ein': f'{rng.randint(10, 99)}-{n:07d}',
+            'state_of_incorporation': rng.choice(STATES),
+            'status': 'active' if rng.random() < 0.9 else 'inactive'
+        })
+        entity_id = entity['id']
+        for start in range(0, accounts, BATCH_SIZE):
+            client.json('POST', f'/api/entities/{entity_id}/accounts:batch', {'items': [{
+                'account_name': f'{phrase(rng, 2).title()} {i}',
+                'account_number': f'{n:05d}{i:05d}',
+                'account_type': rng.choice(ACCOUNT_TYPES),
+                'balance': round(rng.uniform(-5000, 250000), 2)
+            } for i in range(start, min(start + BATCH_SIZE, accounts))]})
+        for start in range(0, tasks, BATCH_SIZE):
+            titles = [f'{phrase(rng, 3).capitalize()} {i}' for i in range(start, min(start + BATCH_SIZE, tasks))]
+            client.json('POST', f'/api/entities/{entity_id}/tasks:batch', {'items': [{
+                'title': title,
+                'description': phrase(rng, 10),
+                'status': rng.choice(TASK_STATUSES),
+                'priority': rng.choice(PRIORITIES),
+                'due_date': (today + timedelta(days=rng.randint(-30, 120))).isoformat(),
+                'estimated_hours': rng.choice((1, 2, 4, 8, 16)),
+                # Depend on up to two recent tasks so the graph endpoint schedules real chains
+                'dependencies': rng.sample(titles[max(0, offset - 5):offset], min(offset, rng.randint(0, 2)))
+            } for offset, title in enumerate(titles)]})
+        for i in range(documents):
+            body, content_type = encode_multipart(
+                {'title': f'{phrase(rng, 2).title()} {i}', 'document_type': rng.choice(('contract', 'filing', 'statement'))},
+                {'file': (f'document-{n}-{i}.txt', document_content(rng, document_size))}
+            )
+            client.json('POST', f'/api/entities/{entity_id}/documents', body, {'Content-Type': content_type})
+        if (n + 1) % 50 == 0 or n + 1 == entities:
+            print(f"Seeded {n + 1}/{entities} entities ({time.perf_counter() - started:.1f}s)")
+
+
+class Portfolio:
+    """Ids of the rows the scenarios pick from"""
+
+    def __init__(self, client):
+        self.entity_ids, self.account_ids, self.task_ids, self.document_ids = [], [], [], []
+        cursor = ''
+        while True:
+            page = client.json('GET', f'/api/entities?limit=200&fields=id{cursor}')
+            self.entity_ids.extend(entity['id'] for entity in page['entities'])
+            if not page.get('next_cursor'):
+                break
+            cursor = f"&cursor={quote(page['next_cursor'])}"
+        if not self.entity_ids:
+            raise RuntimeError('The database has no entities; run without --no-seed')
+        for entity_id in self.entity_ids[:50]:
+            self.account_ids.extend(row['id'] for row in client.json('GET', f'/api/entities/{entity_id}/accounts?fields=id'))
+            self.task_ids.extend(row['id'] for row in client.json('GET', f'/api/entities/{entity_id}/tasks?fields=id'))
+            self.document_ids.extend(row['id'] for row in client.json('GET', f'/api/entities/{entity_id}/documents?fields=id'))
+
+
+# Scenarios: build() returns the measured (method, path, body, headers); setup() runs unmeasured first
+class Scenario:
+    def __init__(self, name, build, setup=None):
+        self.name = name
+        self.build = build
+        self.setup = setup
+
+
+def new_account(client, ctx, rng):
+    return client.json('POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/accounts',
+                       {'account_name': phrase(rng, 2), 'balance': 100})['id']
+
+
+def new_task(client, ctx, rng):
+    return client.json('POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/tasks', {'title': phrase(rng, 4)})['id']
+
+
+def new_document(client, ctx, rng):
+    body, content_type = encode_multipart({'title': phrase(rng, 2)},
+                                          {'file': ('scratch.txt', document_content(rng, ctx.document_size))})
+    return client.json('POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/documents', body,
+                       {'Content-Type': content_type})['id']
+
+
+def new_upload(client, ctx, rng, put_chunk=False):
+    content = document_content(rng, ctx.document_size)
+    upload = client.json('POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/uploads', {
+        'filename': 'resumable.txt', 'size': len(content), 'sha256': hashlib.sha256(content).hexdigest()
+    })
+    if put_chunk:
+        client.json('PUT', f"/api/uploads/{upload['upload_id']}?offset=0", content, {'Content-Type': 'application/octet-stream'})
+    return upload['upload_id'], content
+
+
+def import_csv(rng, ctx):
+    lines = ['entity_id,account_name,account_number,balance']
+    entity_id = rng.choice(ctx.entity_ids)
+    for i in range(20):
+        lines.append(f'{entity_id},Imported {i},IMP{rng.randint(0, 10 ** 9):09d},{rng.randint(0, 10000)}')
+    return encode_multipart({}, {'file': ('accounts.csv', '\n'.join(lines).encode())})
+
+
+def json_body(method, path, body):
+    return method, path, body, None
+
+
+def multipart(method, path, encoded):
+    body, content_type = encoded
+    return method, path, body, {'Content-Type': content_type}
+
+
+SCENARIOS = [
+    Scenario('health', lambda ctx, rng, state: ('GET', '/api/health', None, None)),
+    Scenario('info', lambda ctx, rng, state: ('GET', '/api/info', None, None)),
+    Scenario('index', lambda ctx, rng, state: ('GET', '/', None, None)),
+    Scenario('metrics', lambda ctx, rng, state: ('GET', '/api/metrics', None, None)),
+    Scenario('register', lambda ctx, rng, state: json_body('POST', '/api/auth/register', {
+        'username': f'bench-{uuid.uuid4().hex}', 'email': f'{uuid.uuid4().hex}@example.com', 'password': 'benchmark'})),
+    Scenario('login', lambda ctx, rng, state: json_body('POST', '/api/auth/login',
+                                                        {'username': ctx.username, 'password': ctx.password})),
+    Scenario('list_entities', lambda ctx, rng, state: ('GET', '/api/entities', None, None)),
+    Scenario('list_entities_filtered', lambda ctx, rng, state: (
+        'GET', f'/api/entities?sort=name&status=active&name_prefix={rng.choice(WORDS)[:3]}', None, None)),
+    Scenario('entity_detail', lambda ctx, rng, state: ('GET', f'/api/entities/{rng.choice(ctx.entity_ids)}', None, None)),
+    Scenario('entity_detail_revalidate',
+             lambda ctx, rng, state: ('GET', state[0], None, {'If-None-Match': state[1]}),
+             setup=lambda client, ctx, rng: revalidation_target(client, f'/api/entities/{rng.choice(ctx.entity_ids)}')),
+    Scenario('create_entity', lambda ctx, rng, state: json_body('POST', '/api/entities', {'name': phrase(rng, 3)})),
+    Scenario('update_entity', lambda ctx, rng, state: json_body(
+        'PUT', f'/api/entities/{rng.choice(ctx.entity_ids)}', {'description': phrase(rng, 8)})),
+    Scenario('delete_entity', lambda ctx, rng, state: ('DELETE', f'/api/entities/{state}', None, None),
+             setup=lambda client, ctx, rng: client.json('POST', '/api/entities', {'name': phrase(rng, 3)})['id']),
+    Scenario('list_accounts', lambda ctx, rng, state: (
+        'GET', f'/api/entities/{rng.choice(ctx.entity_ids)}/accounts', None, None)),
+    Scenario('get_account', lambda ctx, rng, state: ('GET', f'/api/accounts/{rng.choice(ctx.account_ids)}', None, None)),
+    Scenario('create_account', lambda ctx, rng, state: json_body(
+        'POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/accounts', {'account_name': phrase(rng, 2), 'balance': 10})),
+    Scenario('update_account', lambda ctx, rng, state: json_body(
+        'PUT', f'/api/accounts/{rng.choice(ctx.account_ids)}', {'balance': rng.randint(0, 10 ** 6)})),
+    Scenario('delete_account', lambda ctx, rng, state: ('DELETE', f'/api/accounts/{state}', None, None), setup=new_account),
+    Scenario('create_accounts_batch', lambda ctx, rng, state: json_body(
+        'POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/accounts:batch',
+        {'items': [{'account_name': phrase(rng, 2), 'balance': i} for i in range(50)]})),
+    Scenario('update_accounts_batch', lambda ctx, rng, state: json_body('PATCH', '/api/accounts:batch', {
+        'items': [{'id': account_id, 'balance': rng.randint(0, 10 ** 6)}
+                  for account_id in rng.sample(ctx.account_ids, min(50, len(ctx.account_ids)))]})),
+    Scenario('delete_accounts_batch', lambda ctx, rng, state: json_body('DELETE', '/api/accounts:batch', {'ids': state}),
+             setup=lambda client, ctx, rng: [new_account(client, ctx, rng) for _ in range(10)]),
+    Scenario('list_tasks', lambda ctx, rng, state: ('GET', f'/api/entities/{rng.choice(ctx.entity_ids)}/tasks', None, None)),
+    Scenario('task_graph', lambda ctx, rng, state: (
+        'GET', f'/api/entities/{rng.choice(ctx.entity_ids)}/tasks/graph', None, None)),
+    Scenario('get_task', lambda ctx, rng, state: ('GET', f'/api/tasks/{rng.choice(ctx.task_ids)}', None, None)),
+    Scenario('create_task', lambda ctx, rng, state: json_body(
+        'POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/tasks', {'title': phrase(rng, 4), 'priority': 'high'})),
+    Scenario('update_task', lambda ctx, rng, state: json_body(
+        'PUT', f'/api/tasks/{rng.choice(ctx.task_ids)}', {'status': rng.choice(TASK_STATUSES)})),
+    Scenario('delete_task', lambda ctx, rng, state: ('DELETE', f'/api/tasks/{state}', None, None), setup=new_task),
+    Scenario('create_tasks_batch', lambda ctx, rng, state: json_body(
+        'POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/tasks:batch',
+        {'items': [{'title': f'{phrase(rng, 3)} {i}'} for i in range(50)]})),
+    Scenario('update_tasks_batch', lambda ctx, rng, state: json_body('PATCH', '/api/tasks:batch', {
+        'items': [{'id': task_id, 'priority': rng.choice(PRIORITIES)}
+                  for task_id in rng.sample(ctx.task_ids, min(50, len(ctx.task_ids)))]})),
+    Scenario('delete_tasks_batch', lambda ctx, rng, state: json_body('DELETE', '/api/tasks:batch', {'ids': state}),
+             setup=lambda client, ctx, rng: [new_task(client, ctx, rng) for _ in range(10)]),
+    Scenario('list_documents', lambda ctx, rng, state: (
+        'GET', f'/api/entities/{rng.choice(ctx.entity_ids)}/documents', None, None)),
+    Scenario('upload_document', lambda ctx, rng, state: multipart(
+        'POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/documents',
+        encode_multipart({'title': phrase(rng, 2)}, {'file': ('upload.txt', document_content(rng, ctx.document_size))}))),
+    Scenario('create_upload', lambda ctx, rng, state: json_body(
+        'POST', f'/api/entities/{rng.choice(ctx.entity_ids)}/uploads',
+        {'filename': 'resumable.txt', 'size': 1024, 'sha256': hashlib.sha256(os.urandom(16)).hexdigest()})),
+    Scenario('get_upload', lambda ctx, rng, state: ('GET', f'/api/uploads/{state[0]}', None, None), setup=new_upload),
+    Scenario('put_upload_chunk', lambda ctx, rng, state: (
+        'PUT', f'/api/uploads/{state[0]}?offset=0', state[1], {'Content-Type': 'application/octet-stream'}),
+        setup=new_upload),
+    Scenario('complete_upload', lambda ctx, rng, state: ('POST', f'/api/uploads/{state[0]}/complete', None, None),
+             setup=lambda client, ctx, rng: new_upload(client, ctx, rng, put_chunk=True)),
+    Scenario('cancel_upload', lambda ctx, rng, state: ('DELETE', f'/api/uploads/{state[0]}', None, None), setup=new_upload),
+    Scenario('update_document', lambda ctx, rng, state: json_body(
+        'PUT', f'/api/documents/{rng.choice(ctx.document_ids)}', {'title': phrase(rng, 2)})),
+    Scenario('delete_document', lambda ctx, rng, state: ('DELETE', f'/api/documents/{state}', None, None),
+             setup=new_document),
+    Scenario('document_text', lambda ctx, rng, state: (
+        'GET', f'/api/documents/{rng.choice(ctx.document_ids)}/text', None, None)),
+    Scenario('download_document', lambda ctx, rng, state: (
+        'GET', f'/api/documents/{rng.choice(ctx.document_ids)}/download', None, None)),
+    Scenario('view_document', lambda ctx, rng, state: (
+        'GET', f'/api/documents/{rng.choice(ctx.document_ids)}/view', None, None)),
+    Scenario('view_document_with_token', lambda ctx, rng, state: (
+        'GET', f'/api/documents/{rng.choice(ctx.document_ids)}/token/{ctx.token}', None, None)),
+    Scenario('search', lambda ctx, rng, state: ('GET', f'/api/search?q={quote(phrase(rng, 2))}', None, None)),
+    Scenario('search_prefix', lambda ctx, rng, state: ('GET', f'/api/search?q={rng.choice(WORDS)[:4]}', None, None)),
+    Scenario('dashboard', lambda ctx, rng, state: ('GET', '/api/dashboard', None, None)),
+    Scenario('changes', lambda ctx, rng, state: ('GET', f'/api/changes?since={ctx.cursor}', None, None)),
+    Scenario('export_ndjson', lambda ctx, rng, state: ('GET', '/api/export', None, None)),
+    Scenario('export_csv', lambda ctx, rng, state: ('GET', '/api/export?format=csv&resource=tasks', None, None)),
+    Scenario('import_accounts', lambda ctx, rng, state: multipart('POST', '/api/import/accounts', import_csv(rng, ctx))),
+]
+
+
+def revalidation_target(client, path):
+    _, _, headers = client.request('GET', path)
+    return path, headers.get('ETag', '')
+
+
+# Measurement
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def run_scenario(scenario, base_url, ctx, requests, concurrency, warmup, seed):
+    local = threading.local()
+
+    def call(i):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client(base_url, ctx.token)
+        rng = random.Random(f'{seed}-{scenario.name}-{i}')
+        try:
+            state = scenario.setup(client, ctx, rng) if scenario.setup else None
+        except (RuntimeError, http.client.HTTPException, OSError):
+            return None, 'setup_failed', 0
+        method, path, body, headers = scenario.build(ctx, rng, state)
+        started = time.perf_counter()
+        try:
+            status, data, _ = client.request(method, path, body, headers)
+        except (http.client.HTTPException, OSError):
+            status, data = None, b''
+        return time.perf_counter() - started, status, len(data)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(-warmup, 0)))
+        started = time.perf_counter()
+        samples = list(pool.map(call, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _, _ in samples if latency is not None)
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'statuses': statuses,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else None,
+        'mean_response_bytes': round(sum(size for _, _, size in samples) / len(samples)) if samples else 0
+    }
+
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':<28} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    if baseline:
+        header += f" {'p50 vs base':>12} {'p95 vs base':>12}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<28} {result['throughput_rps'] or 0:>9.1f} {result['p50_ms'] or 0:>9.2f} "
+                f"{result['p95_ms'] or 0:>9.2f} {result['p99_ms'] or 0:>9.2f} {result['errors']:>7}")
+        before = (baseline or {}).get(name)
+        if before:
+            for key in ('p50_ms', 'p95_ms'):
+                if before.get(key) and result.get(key) is not None:
+                    line += f" {(result[key] - before[key]) / before[key] * 100:>+11.1f}%"
+                else:
+                    line += f" {'-':>12}"
+        print(line)
+
+
+# Server under test
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url, work_dir):
+    """Run the app under gunicorn with the repository's config, falling back to the Flask server"""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port))
+    try:
+        import gunicorn  # noqa: F401
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '-c', os.path.join(REPO_DIR, 'gunicorn.conf.py'),
+                   '--bind', f'127.0.0.1:{port}', '--pythonpath', REPO_DIR]
+    except ImportError:
+        command = [sys.executable, os.path.join(REPO_DIR, 'app.py')]
+    log = open(os.path.join(work_dir, 'server.log'), 'wb')
+    # Like the Procfile's release phase: build the schema once before the workers start
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, 'run_migrations.py')],
+                   cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT, check=True)
+    # uploads/ is created relative to the working directory, so keep it inside work_dir
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}, see {log.name}")
+        try:
+            if Client(base_url).request('GET', '/api/health')[0] == 200:
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"Server did not become healthy within 60s, see {log.name}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_benchmark(args):
+    scenarios = SCENARIOS
+    if args.only:
+        names = set(args.only.split(','))
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in names]
+        unknown = names - {scenario.name for scenario in scenarios}
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix='entity-benchmark-')
+    process = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+            process, base_url = start_server(database_url, work_dir)
+            print(f"Server running at {base_url} (working directory {work_dir})")
+
+        rng = random.Random(args.seed)
+        username, password = f'bench-{uuid.uuid4().hex[:12]}', uuid.uuid4().hex
+        client = Client(base_url)
+        client.json('POST', '/api/auth/register', {'username': username, 'email': f'{username}@example.com',
+                                                   'password': password})
+        client.token = client.json('POST', '/api/auth/login', {'username': username, 'password': password})['access_token']
+
+        if not args.no_seed:
+            seed_portfolio(client, rng, args.entities, args.accounts, args.tasks, args.documents, args.document_size)
+        ctx = Portfolio(client)
+        ctx.token, ctx.username, ctx.password = client.token, username, password
+        ctx.document_size = args.document_size
+        # Ask for the last ~100 changes so the change feed has a realistic page to collapse
+        ctx.cursor = max(0, int(client.json('GET', '/api/changes')['next_cursor']) - 100)
+
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = run_scenario(scenario, base_url, ctx, args.requests, args.concurrency,
+                                                  args.warmup, args.seed)
+            result = results[scenario.name]
+            print(f"{scenario.name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                  f"{result['throughput_rps']} req/s, {result['errors']} errors")
+
+        report = {
+            'started_at': datetime.utcnow().isoformat() + 'Z',
+            'commit': git_commit(),
+            'target': args.url or (args.database_url and 'postgresql') or 'sqlite',
+            'parameters': {key: value for key, value in vars(args).items() if key not in ('compare', 'output')},
+            'data': {'entities': len(ctx.entity_ids)},
+            'results': results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}\n")
+
+        baseline = None
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)['results']
+        print_results(results, baseline)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark every API endpoint against synthetic data')
+    parser.add_argument('--url', help='Benchmark an already running server instead of starting one')
+    parser.add_argument('--database-url', help='Database for the started server (default: SQLite in a temp directory)')
+    parser.add_argument('--no-seed', action='store_true', help='Use the data already in the database')
+    parser.add_argument('--entities', type=int, default=100, help='Entities to generate')
+    parser.add_argument('--accounts', type=int, default=20, help='Accounts per entity')
+    parser.add_argument('--tasks', type=int, default=30, help='Tasks per entity')
+    parser.add_argument('--documents', type=int, default=3, help='Documents per entity')
+    parser.add_argument('--document-size', type=int, default=16 * 1024, help='Bytes per generated document')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for generated data and requests')
+    parser.add_argument('--only', help='Comma-separated scenario names to run')
+    parser.add_argument('--output', default=f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json", help='JSON results file')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary database, uploads and server log')
+    run_benchmark(parser.parse_args())
+    sys.exit(0)
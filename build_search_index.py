@@ -0,0 +1,29 @@
+from app import app, db, SearchIndex, SEARCH_FIELDS, reindex_search
+import sys
+
+BATCH_SIZE = 1000
+
+def build_search_index():
+    """Reindex every entity, account, task and document, e.g. after a change to search_terms (safe to re-run)"""
+    with app.app_context():
+        for model, (kind, _, _) in SEARCH_FIELDS.items():
+            indexed = 0
+            last_id = 0
+            while True:
+                ids = db.session.scalars(
+                    db.select(model.id).where(model.id > last_id).order_by(model.id).limit(BATCH_SIZE)
+                ).all()
+                if not ids:
+                    break
+                reindex_search(model, ids)
+                db.session.commit()
+                indexed += len(ids)
+                last_id = ids[-1]
+            print(f"Indexed {indexed} {kind} records")
+
+        total = db.session.scalar(db.select(db.func.count()).select_from(SearchIndex))
+        print(f"Search index contains {total} rows")
+
+if __name__ == '__main__':
+    build_search_index()
+    sys.exit(0)
@@ -0,0 +1,58 @@
+"""Fixtures shared by the test modules that run the app in-process against throwaway SQLite databases.
+
+Each module gets its own working directory, database and app. A module changes the
+app's configuration by overriding `app_config`, and module settings with `module_monkeypatch`.
+"""
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    # The module-level app builds an engine for DATABASE_URL on import; keep it off the real database
+    os.environ['DATABASE_URL'] = f"sqlite:///{tmp_path_factory.mktemp('default') / 'unused.db'}"
+    import app
+    return app
+
+
+@pytest.fixture(scope='module')
+def module_monkeypatch():
+    patcher = pytest.MonkeyPatch()
+    yield patcher
+    patcher.undo()
+
+
+@pytest.fixture(scope='module')
+def work_dir(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp(request.module.__name__)
+    cwd = os.getcwd()
+    # uploads/ is created relative to the working directory
+    os.chdir(path)
+    yield path
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    return {}
+
+
+@pytest.fixture(scope='module')
+def flask_app(server, work_dir, app_config):
+    flask_app = server.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{work_dir / 'test.db'}", **app_config})
+    with flask_app.app_context():
+        server.db.create_all()
+    return flask_app
+
+
+@pytest.fixture(scope='module')
+def client(flask_app):
+    return flask_app.test_client()
+
+
+@pytest.fixture(scope='module')
+def headers(request, flask_app):
+    from flask_jwt_extended import create_access_token
+    with flask_app.app_context():
+        return {'Authorization': 'Bearer ' + create_access_token(identity=request.module.__name__)}
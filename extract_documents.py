@@ -0,0 +1,66 @@
+from app import app, db, Document, DocumentText, document_extension, save_extracted_text
+from text_extraction import extract_document
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+import argparse
+import os
+import sys
+
+BATCH_SIZE = 200
+
+def extract_documents(workers, retry_failed=False):
+    """Extract text for every document that has none yet.
+
+    Each result is committed as soon as it arrives, so an interrupted run
+    resumes where it left off: finished documents are skipped next time.
+    """
+    statuses = ['pending', 'failed'] if retry_failed else ['pending']
+    counts = Counter()
+    with app.app_context(), ProcessPoolExecutor(max_workers=workers) as pool:
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(Document.id, Document.file_path, Document.original_filename,
+                          DocumentText.document_id.label('text_id'))
+                .outerjoin(DocumentText, DocumentText.document_id == Document.id)
+                .where(Document.id > last_id)
+                .where(db.or_(DocumentText.document_id.is_(None), DocumentText.status.in_(statuses)))
+                .order_by(Document.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+
+            missing = [row.id for row in rows if row.text_id is None]
+            if missing:
+                db.session.execute(db.insert(DocumentText), [{'document_id': i, 'status': 'pending'} for i in missing])
+                db.session.commit()
+
+            futures = {
+                pool.submit(extract_document, row.file_path, document_extension(row)): row.id
+                for row in rows if row.file_path
+            }
+            for row in rows:
+                if not row.file_path:
+                    save_extracted_text(row.id, 'failed', None, 'Document has no file')
+                    db.session.commit()
+                    counts['failed'] += 1
+            for future in as_completed(futures):
+                status, content, error = future.result()
+                save_extracted_text(futures[future], status, content, error)
+                db.session.commit()
+                counts[status] += 1
+
+            last_id = rows[-1].id
+            print(f"Processed documents up to id {last_id}: {dict(counts)}")
+
+    print(f"Text extraction finished: {dict(counts)}")
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract searchable text from uploaded documents')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Extraction processes')
+    parser.add_argument('--retry-failed', action='store_true', help='Also retry documents whose extraction failed')
+    args = parser.parse_args()
+    extract_documents(args.workers, args.retry_failed)
+    sys.exit(0)
@@ -0,0 +1,18 @@
+"""Gunicorn settings, picked up automatically when `gunicorn app:app` starts in this directory"""
+import os
+
+# An open /api/events stream parks a thread on a queue instead of tying up a whole sync worker
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 75
+
+# A request holds at most one pooled connection while it runs, and the job worker threads
+# draw from the same pool, so each worker gets one request thread per connection they
+# leave; more would only queue on DB_POOL_TIMEOUT. Event streams give their connection
+# back before they park, so their threads come on top. Defaults as in app.py.
+pool_capacity = int(os.getenv('DB_POOL_SIZE', 10)) + int(os.getenv('DB_MAX_OVERFLOW', 10))
+request_threads = max(pool_capacity - int(os.getenv('JOB_WORKERS', 2)), 1)
+threads = int(os.getenv('GUNICORN_THREADS', request_threads + int(os.getenv('MAX_EVENT_STREAMS', 48))))
+# Streams may use the threads beyond the request threads, never the ones requests need
+os.environ.setdefault('MAX_EVENT_STREAMS', str(max(threads - request_threads, 0)))
@@ -0,0 +1,176 @@
+"""Schema operations for the Alembic revisions in migrations/versions.
+
+Revisions run against databases of every age: ones created with create_all()
+before migrations existed, and ones an earlier revision already upgraded. So
+each operation checks a SchemaSnapshot first and skips objects that are
+already there, and later revisions should use these helpers rather than bare
+op.add_column()/op.create_index() calls.
+
+On PostgreSQL the DDL for one table goes out as one statement inside the
+revision's transaction, indexes are built CONCURRENTLY outside it, and
+backfills commit in small batches, so no step holds a lock on a large table
+for longer than one batch.
+"""
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# Rows updated per committed batch in backfill()
+BACKFILL_BATCH_SIZE = int(os.getenv('MIGRATION_BACKFILL_BATCH_SIZE', 5000))
+# How long ALTER TABLE waits for its lock before failing, instead of queueing every query behind it
+LOCK_TIMEOUT = os.getenv('MIGRATION_LOCK_TIMEOUT', '10s')
+
+
+class SchemaSnapshot:
+    """Tables, columns, foreign keys and indexes of the connected database, reflected in one pass"""
+
+    def __init__(self, bind):
+        inspector = sa.inspect(bind)
+        self.dialect = bind.dialect.name
+        self.tables = set(inspector.get_table_names())
+        self.columns = {table: set() for table in self.tables}
+        for (_, table), columns in inspector.get_multi_columns().items():
+            self.columns[table] = {column['name'] for column in columns}
+        self.foreign_keys = {table: [] for table in self.tables}
+        for (_, table), foreign_keys in inspector.get_multi_foreign_keys().items():
+            self.foreign_keys[table] = foreign_keys
+        # Read index names from the catalog: reflection skips expression indexes like ix_entity_name_lower
+        if self.dialect == 'postgresql':
+            names = bind.exec_driver_sql("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+        elif self.dialect == 'sqlite':
+            names = bind.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+        else:
+            names = ((index['name'],) for indexes in inspector.get_multi_indexes().values() for index in indexes)
+        self.indexes = {name for name, in names}
+
+
+def quote(name):
+    return op.get_bind().dialect.identifier_preparer.quote(name)
+
+
+def create_missing_tables(snapshot, metadata):
+    """Create the tables of the current models the database lacks, with their indexes"""
+    missing = [table for table in metadata.sorted_tables if table.name not in snapshot.tables]
+    if not missing:
+        return
+    print(f"Creating tables {', '.join(table.name for table in missing)}...")
+    metadata.create_all(op.get_bind(), tables=missing)
+    for table in missing:
+        snapshot.tables.add(table.name)
+        snapshot.columns[table.name] = {column.name for column in table.columns}
+        snapshot.indexes.update(index.name for index in table.indexes)
+
+
+def add_columns(snapshot, table, *columns):
+    """Add whichever of the columns the table lacks, in a single ALTER TABLE where the database allows it"""
+    missing = [column for column in columns if column.name not in snapshot.columns[table]]
+    if not missing:
+        return
+    print(f"Adding {', '.join(column.name for column in missing)} to {table}...")
+    # Attach the columns to a throwaway table so they compile exactly as they would in CREATE TABLE
+    sa.Table(table, sa.MetaData(), *missing)
+    dialect = op.get_bind().dialect
+    clauses = [f"ADD COLUMN {sa.schema.CreateColumn(column).compile(dialect=dialect)}" for column in missing]
+    if snapshot.dialect == 'postgresql':
+        # One statement takes the table's ACCESS EXCLUSIVE lock once for the whole batch
+        op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        op.execute(f"ALTER TABLE {quote(table)} {', '.join(clauses)}")
+    else:
+        # SQLite accepts one column per ALTER TABLE
+        for clause in clauses:
+            op.execute(f"ALTER TABLE {quote(table)} {clause}")
+    snapshot.columns[table].update(column.name for column in missing)
+
+
+def create_index(snapshot, name, table, columns, postgresql_columns=None):
+    """CREATE INDEX if it is missing; CONCURRENTLY on PostgreSQL, so the table keeps taking writes
+
+    columns is the SQL between the parentheses, e.g. 'entity_id, status'.
+    """
+    if snapshot.dialect != 'postgresql':
+        if name not in snapshot.indexes:
+            print(f"Creating index {name}...")
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {quote(table)} ({columns})")
+            snapshot.indexes.add(name)
+        return
+
+    bind = op.get_bind()
+    # CONCURRENTLY cannot run inside the revision's transaction
+    with op.get_context().autocommit_block():
+        valid = bind.execute(sa.text("""
+            SELECT i.indisvalid
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name
+        """), {'name': name}).scalar()
+        if valid:
+            return
+        if valid is False:
+            # A failed concurrent build leaves an INVALID index behind; drop it and start over
+            print(f"Dropping invalid index {name}...")
+            bind.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        print(f"Creating index {name} concurrently...")
+        bind.exec_driver_sql(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {quote(table)} ({postgresql_columns or columns})")
+    snapshot.indexes.add(name)
+
+
+# Name for SQLite's unnamed foreign keys while a batch operation rebuilds their table
+SQLITE_FOREIGN_KEY_NAME = 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'
+
+
+def cascade_foreign_key(snapshot, table, column, referred_table):
+    """Make table.column's foreign key to referred_table.id ON DELETE CASCADE"""
+    existing = next((fk for fk in snapshot.foreign_keys[table] if fk['constrained_columns'] == [column]), None)
+    if existing and (existing.get('options') or {}).get('ondelete', '').upper() == 'CASCADE':
+        return
+    print(f"Cascading deletes from {referred_table} to {table}...")
+
+    if snapshot.dialect == 'postgresql':
+        name = existing['name'] if existing else f'{table}_{column}_fkey'
+        op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        if existing:
+            op.drop_constraint(name, table, type_='foreignkey')
+        # NOT VALID skips checking the existing rows, so the swap holds its lock only briefly
+        op.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} FOREIGN KEY ({quote(column)}) "
+                   f"REFERENCES {quote(referred_table)} (id) ON DELETE CASCADE NOT VALID")
+        # Validation scans the table without blocking writes
+        with op.get_context().autocommit_block():
+            op.execute(f"ALTER TABLE {quote(table)} VALIDATE CONSTRAINT {quote(name)}")
+        return
+
+    # SQLite can only change a foreign key by rebuilding the table. Dropping the old table
+    # must not cascade to the rows referencing it, so enforcement is off meanwhile (the
+    # pragma has no effect inside a transaction).
+    name = SQLITE_FOREIGN_KEY_NAME % {'table_name': table, 'column_0_name': column, 'referred_table_name': referred_table}
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys = OFF')
+    try:
+        with op.batch_alter_table(table, recreate='always', naming_convention={'fk': SQLITE_FOREIGN_KEY_NAME}) as batch:
+            if existing:
+                batch.drop_constraint(name, type_='foreignkey')
+            batch.create_foreign_key(name, referred_table, [column], ['id'], ondelete='CASCADE')
+    finally:
+        with op.get_context().autocommit_block():
+            op.execute('PRAGMA foreign_keys = ON')
+
+
+def backfill(table, assignments, where, batch_size=None):
+    """UPDATE table SET assignments WHERE where, committing one primary-key range at a time
+
+    Each batch locks only its own rows, for as long as the batch takes, so writers
+    never wait on the whole table.
+    """
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        low, high = bind.execute(sa.text(f"SELECT min(id), max(id) FROM {quote(table)} WHERE {where}")).one()
+        if low is None:
+            return 0
+        print(f"Backfilling {table} ({assignments})...")
+        updated = 0
+        statement = sa.text(f"UPDATE {quote(table)} SET {assignments} WHERE id >= :low AND id < :high AND ({where})")
+        for start in range(low, high + 1, batch_size):
+            updated += bind.execute(statement, {'low': start, 'high': start + batch_size}).rowcount
+        print(f"Backfilled {updated} {table} rows")
+        return updated
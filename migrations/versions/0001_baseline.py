@@ -0,0 +1,242 @@
+"""Bring databases created before migrations existed up to date
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:12:44.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migration_ops import SchemaSnapshot, add_columns, backfill, create_missing_tables
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# The tables as of this revision, for databases that lack them. Indexes that 0002 builds
+# are left to it; later model changes need their own revisions.
+metadata = sa.MetaData()
+
+sa.Table(
+    'entity', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('name', sa.String(100), nullable=False),
+    sa.Column('description', sa.Text()),
+    sa.Column('ein', sa.String(50)),
+    sa.Column('registered_address', sa.String(500)),
+    sa.Column('registered_phone', sa.String(50)),
+    sa.Column('state_of_incorporation', sa.String(100)),
+    sa.Column('status', sa.String(50)),
+    sa.Column('date_of_incorporation', sa.Date()),
+    sa.Column('created_at', sa.DateTime()),
+    sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+    sa.Column('updated_at', sa.DateTime()),
+)
+sa.Table(
+    'account', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id'), nullable=False),
+    sa.Column('account_name', sa.String(100), nullable=False),
+    sa.Column('account_number', sa.String(50)),
+    sa.Column('balance', sa.Float()),
+    sa.Column('account_type', sa.String(50)),
+    sa.Column('username', sa.String(100)),
+    sa.Column('password', sa.Text()),
+    sa.Column('account_url', sa.String(500)),
+    sa.Column('notes', sa.Text()),
+    sa.Column('created_at', sa.DateTime()),
+)
+sa.Table(
+    'task', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id'), nullable=False),
+    sa.Column('title', sa.String(200), nullable=False),
+    sa.Column('description', sa.Text()),
+    sa.Column('status', sa.String(50)),
+    sa.Column('priority', sa.String(50)),
+    sa.Column('due_date', sa.Date()),
+    sa.Column('category', sa.String(100)),
+    sa.Column('assigned_to', sa.String(100)),
+    sa.Column('estimated_hours', sa.Float()),
+    sa.Column('actual_hours', sa.Float()),
+    sa.Column('start_date', sa.Date()),
+    sa.Column('completion_date', sa.Date()),
+    sa.Column('dependencies', sa.Text()),
+    sa.Column('created_at', sa.DateTime()),
+)
+sa.Table(
+    'task_dependency', metadata,
+    sa.Column('task_id', sa.Integer(), sa.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True),
+    sa.Column('depends_on_id', sa.Integer(), sa.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True,
+              index=True),
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id', ondelete='CASCADE'), nullable=False, index=True),
+)
+sa.Table(
+    'document', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id'), nullable=False),
+    sa.Column('title', sa.String(200), nullable=False),
+    sa.Column('file_path', sa.String(500)),
+    sa.Column('original_filename', sa.String(500)),
+    sa.Column('document_type', sa.String(100)),
+    sa.Column('file_size', sa.Integer()),
+    sa.Column('uploaded_at', sa.DateTime()),
+    sa.Column('content_hash', sa.String(64)),
+)
+sa.Table(
+    'document_text', metadata,
+    sa.Column('document_id', sa.Integer(), sa.ForeignKey('document.id', ondelete='CASCADE'), primary_key=True),
+    sa.Column('status', sa.String(20), nullable=False, index=True),
+    sa.Column('content', sa.Text()),
+    sa.Column('error', sa.String(500)),
+    sa.Column('updated_at', sa.DateTime()),
+)
+sa.Table(
+    'blob', metadata,
+    sa.Column('sha256', sa.String(64), primary_key=True),
+    sa.Column('file_path', sa.String(500), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime()),
+)
+sa.Table(
+    'upload_session', metadata,
+    sa.Column('id', sa.String(32), primary_key=True),
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id', ondelete='CASCADE'), nullable=False),
+    sa.Column('title', sa.String(200), nullable=False),
+    sa.Column('original_filename', sa.String(500), nullable=False),
+    sa.Column('document_type', sa.String(100)),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(64), nullable=False),
+    sa.Column('received', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime()),
+)
+sa.Table(
+    'entity_rollup', metadata,
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id', ondelete='CASCADE'), primary_key=True),
+    sa.Column('account_count', sa.Integer(), nullable=False),
+    sa.Column('total_balance', sa.Float(), nullable=False),
+    sa.Column('task_count', sa.Integer(), nullable=False),
+    sa.Column('document_count', sa.Integer(), nullable=False),
+    sa.Column('document_bytes', sa.BigInteger(), nullable=False),
+)
+sa.Table(
+    'task_rollup', metadata,
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id', ondelete='CASCADE'), primary_key=True),
+    sa.Column('status', sa.String(50), primary_key=True),
+    sa.Column('priority', sa.String(50), primary_key=True),
+    sa.Column('task_count', sa.Integer(), nullable=False),
+)
+sa.Table(
+    'task_due_rollup', metadata,
+    sa.Column('entity_id', sa.Integer(), sa.ForeignKey('entity.id', ondelete='CASCADE'), primary_key=True),
+    sa.Column('due_date', sa.Date(), primary_key=True),
+    sa.Column('open_count', sa.Integer(), nullable=False),
+)
+sa.Table(
+    'change_log', metadata,
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), primary_key=True),
+    sa.Column('kind', sa.String(20), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('entity_id', sa.Integer()),
+    sa.Column('op', sa.String(10), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False, index=True),
+)
+search_index = sa.Table(
+    'search_index', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('kind', sa.String(20), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False, index=True),
+    sa.Column('label', sa.String(500)),
+    sa.Column('title_terms', sa.Text(), nullable=False),
+    sa.Column('body_terms', sa.Text(), nullable=False),
+    sa.UniqueConstraint('kind', 'record_id', name='uq_search_index_kind_record'),
+)
+sa.Index(
+    'ix_search_index_vector',
+    sa.func.setweight(
+        sa.func.to_tsvector(sa.literal_column("'simple'"), search_index.c.title_terms), sa.literal_column("'A'")
+    ).op('||')(sa.func.setweight(
+        sa.func.to_tsvector(sa.literal_column("'simple'"), search_index.c.body_terms), sa.literal_column("'B'")
+    )),
+    postgresql_using='gin'
+).ddl_if(dialect='postgresql')
+sa.Table(
+    'user', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('username', sa.String(80), unique=True, nullable=False),
+    sa.Column('email', sa.String(120), unique=True, nullable=False),
+    sa.Column('password_hash', sa.String(255), nullable=False),
+    sa.Column('created_at', sa.DateTime()),
+)
+
+# SQLite searches through an external-content FTS5 table kept in step with search_index by triggers
+SQLITE_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title_terms, body_terms, content='search_index', content_rowid='id', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS search_index_ai AFTER INSERT ON search_index BEGIN
+        INSERT INTO search_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_index_ad AFTER DELETE ON search_index BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_index_au AFTER UPDATE ON search_index BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title_terms, body_terms)
+        VALUES ('delete', old.id, old.title_terms, old.body_terms);
+        INSERT INTO search_fts(rowid, title_terms, body_terms) VALUES (new.id, new.title_terms, new.body_terms);
+    END""",
+)
+
+
+def upgrade():
+    snapshot = SchemaSnapshot(op.get_bind())
+    create_missing_tables(snapshot, metadata)
+    if snapshot.dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+
+    # Columns added to the models after their tables were first deployed
+    add_columns(snapshot, 'account',
+                sa.Column('username', sa.String(100)),
+                sa.Column('password', sa.Text()),
+                sa.Column('account_url', sa.String(500)),
+                sa.Column('notes', sa.Text()))
+    add_columns(snapshot, 'task',
+                sa.Column('category', sa.String(100)),
+                sa.Column('assigned_to', sa.String(100)),
+                sa.Column('estimated_hours', sa.Float()),
+                sa.Column('actual_hours', sa.Float()),
+                sa.Column('start_date', sa.Date()),
+                sa.Column('completion_date', sa.Date()),
+                sa.Column('dependencies', sa.Text()))
+    add_columns(snapshot, 'entity',
+                sa.Column('ein', sa.String(50)),
+                sa.Column('registered_address', sa.String(500)),
+                sa.Column('registered_phone', sa.String(50)),
+                sa.Column('state_of_incorporation', sa.String(100)),
+                sa.Column('status', sa.String(50), server_default='active'),
+                sa.Column('date_of_incorporation', sa.Date()),
+                sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+                sa.Column('updated_at', sa.DateTime()))
+    add_columns(snapshot, 'document',
+                sa.Column('original_filename', sa.String(500)),
+                sa.Column('file_size', sa.Integer()),
+                sa.Column('content_hash', sa.String(64)))
+
+    # Entities from before updated_at existed sort and sync by their creation time
+    backfill('entity', 'updated_at = created_at', 'updated_at IS NULL AND created_at IS NOT NULL')
+
+    # run_migrations.py recorded an integer version here before Alembic took over
+    if 'schema_version' in snapshot.tables:
+        op.drop_table('schema_version')
+
+
+def downgrade():
+    # Nothing to undo: this revision only fills in what older databases were missing
+    pass
@@ -0,0 +1,50 @@
+"""Build the list, search and lookup indexes online
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:31:05.774610
+
+"""
+from alembic import op
+
+from migration_ops import SchemaSnapshot, create_index
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns); create_all() builds these on new tables, existing tables need them here
+INDEXES = {
+    # Entity list pagination, filters and sorting
+    'ix_entity_created_at_id': ('entity', 'created_at, id'),
+    'ix_entity_name_id': ('entity', 'name, id'),
+    'ix_entity_status_created_at_id': ('entity', 'status, created_at, id'),
+    'ix_entity_state_created_at_id': ('entity', 'state_of_incorporation, created_at, id'),
+    'ix_entity_updated_at': ('entity', 'updated_at'),
+    # Per-entity lookups
+    'ix_entity_ein': ('entity', 'ein'),
+    'ix_account_entity_id_number': ('account', 'entity_id, account_number'),
+    'ix_task_entity_id_status_due_date': ('task', 'entity_id, status, due_date'),
+    'ix_task_entity_id_title': ('task', 'entity_id, title'),
+    'ix_document_entity_id_uploaded_at': ('document', 'entity_id, uploaded_at'),
+    'ix_document_content_hash': ('document', 'content_hash'),
+    'ix_upload_session_created_at': ('upload_session', 'created_at'),
+}
+
+
+def upgrade():
+    snapshot = SchemaSnapshot(op.get_bind())
+    for name, (table, columns) in INDEXES.items():
+        create_index(snapshot, name, table, columns)
+    # Case-insensitive name prefix search; text_pattern_ops lets PostgreSQL use it for LIKE 'abc%'
+    create_index(snapshot, 'ix_entity_name_lower', 'entity', 'lower(name)',
+                 postgresql_columns='lower(name) text_pattern_ops')
+
+
+def downgrade():
+    for name, (table, columns) in INDEXES.items():
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_index('ix_entity_name_lower', table_name='entity', if_exists=True)
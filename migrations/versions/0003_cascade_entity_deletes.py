@@ -0,0 +1,30 @@
+"""Cascade entity deletes to accounts, tasks and documents in the database
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 14:02:37.530981
+
+"""
+from alembic import op
+
+from migration_ops import SchemaSnapshot, cascade_foreign_key
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+TABLES = ('account', 'task', 'document')
+
+
+def upgrade():
+    snapshot = SchemaSnapshot(op.get_bind())
+    for table in TABLES:
+        cascade_foreign_key(snapshot, table, 'entity_id', 'entity')
+
+
+def downgrade():
+    # Without the cascade, deleting an entity with children fails instead of orphaning them
+    pass
@@ -0,0 +1,48 @@
+"""Add the job table the background workers claim work from
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:40:12.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migration_ops import SchemaSnapshot, create_missing_tables
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# The table as this revision creates it; later model changes need their own revisions
+metadata = sa.MetaData()
+sa.Table(
+    'job', metadata,
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('kind', sa.String(50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(20), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('idempotency_key', sa.String(200), unique=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime()),
+    sa.Column('result', sa.Text()),
+    sa.Column('error', sa.String(500)),
+    sa.Column('created_at', sa.DateTime()),
+    sa.Column('updated_at', sa.DateTime()),
+    sa.Column('finished_at', sa.DateTime()),
+    sa.Index('ix_job_status_priority_run_at', 'status', 'priority', 'run_at'),
+)
+
+
+def upgrade():
+    create_missing_tables(SchemaSnapshot(op.get_bind()), metadata)
+
+
+def downgrade():
+    op.drop_table('job')
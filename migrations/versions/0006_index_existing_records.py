@@ -0,0 +1,81 @@
+"""Add the records that predate full-text search to the search index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 11:20:07.318842
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+import migration_ops
+from migration_ops import quote
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# SEARCH_FIELDS and search_terms() in app.py as of this revision
+SEARCH_SOURCES = (
+    # (kind, table, title columns, body columns, join for body columns outside the table)
+    ('entity', 'entity', ('name',), ('description', 'ein'), ''),
+    ('account', 'account', ('account_name',), ('notes',), ''),
+    ('task', 'task', ('title',), ('description', 'category'), ''),
+    ('document', 'document', ('title',), ('original_filename', 'document_text.content'),
+     'LEFT OUTER JOIN document_text ON document_text.document_id = document.id'),
+)
+SEARCH_TERM = re.compile(r'[^\W_]+')
+
+
+def search_terms(*values):
+    return ' '.join(term for value in values if value for term in SEARCH_TERM.findall(str(value).lower()))
+
+
+def upgrade():
+    bind = op.get_bind()
+    insert = sa.text("""INSERT INTO search_index (kind, record_id, entity_id, label, title_terms, body_terms)
+        VALUES (:kind, :record_id, :entity_id, :label, :title_terms, :body_terms)""")
+    # Records the app indexed itself already have their row, so running this again indexes nothing
+    with op.get_context().autocommit_block():
+        for kind, table, title_columns, body_columns, join in SEARCH_SOURCES:
+            owner = 'id' if table == 'entity' else 'entity_id'
+            columns = ', '.join(column if '.' in column else f'{quote(table)}.{column}'
+                                for column in title_columns + body_columns)
+            select = sa.text(f"""
+                SELECT {quote(table)}.id, {quote(table)}.{owner}, {columns}
+                FROM {quote(table)} {join}
+                WHERE {quote(table)}.id > :last_id AND NOT EXISTS (
+                    SELECT 1 FROM search_index WHERE search_index.kind = :kind AND search_index.record_id = {quote(table)}.id)
+                ORDER BY {quote(table)}.id
+                LIMIT :limit
+            """)
+            indexed = 0
+            last_id = 0
+            split = 2 + len(title_columns)
+            batch = {'kind': kind, 'limit': migration_ops.BACKFILL_BATCH_SIZE}
+            while True:
+                rows = bind.execute(select, {**batch, 'last_id': last_id}).all()
+                if not rows:
+                    break
+                bind.execute(insert, [{
+                    'kind': kind,
+                    'record_id': row[0],
+                    'entity_id': row[1],
+                    'label': row[2],
+                    'title_terms': search_terms(*row[2:split]),
+                    'body_terms': search_terms(*row[split:])
+                } for row in rows])
+                indexed += len(rows)
+                last_id = rows[-1][0]
+            if indexed:
+                print(f"Indexed {indexed} existing {kind} records")
+
+
+def downgrade():
+    # The index rows are derived data; leaving them is harmless
+    pass
@@ -0,0 +1,90 @@
+"""Build task_dependency edges from the JSON dependencies column of existing tasks
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 11:52:30.604117
+
+"""
+import json
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+from task_graph import find_cycle
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def resolve_labels(labels, task_ids, ids_by_title):
+    """resolve_dependency_labels() in app.py as of this revision: labels name a task by id or by title"""
+    resolved = []
+    for label in labels:
+        if isinstance(label, int) or (isinstance(label, str) and label.strip().isdigit()):
+            if int(label) in task_ids:
+                resolved.append(int(label))
+                continue
+        if isinstance(label, str) and label.strip().lower() in ids_by_title:
+            resolved.append(ids_by_title[label.strip().lower()])
+    return list(dict.fromkeys(resolved))
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Tasks the app already synced have their edges; running this again finds none left to do
+    entity_ids = bind.execute(sa.text("""
+        SELECT DISTINCT entity_id FROM task
+        WHERE dependencies IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM task_dependency WHERE task_dependency.task_id = task.id)
+        ORDER BY entity_id
+    """)).scalars().all()
+    if not entity_ids:
+        return
+    print(f"Building task dependency edges for {len(entity_ids)} entities...")
+
+    insert = sa.text("""INSERT INTO task_dependency (task_id, depends_on_id, entity_id)
+        VALUES (:task_id, :depends_on_id, :entity_id)""")
+    skipped = 0
+    for entity_id in entity_ids:
+        params = {'entity_id': entity_id}
+        graph = defaultdict(set)
+        for task_id, depends_on_id in bind.execute(
+                sa.text("SELECT task_id, depends_on_id FROM task_dependency WHERE entity_id = :entity_id"), params):
+            graph[task_id].add(depends_on_id)
+        tasks = bind.execute(sa.text("SELECT id, title, dependencies FROM task WHERE entity_id = :entity_id ORDER BY id"),
+                             params).all()
+        task_ids = {task_id for task_id, _, _ in tasks}
+        ids_by_title = {}
+        for task_id, title, _ in tasks:
+            ids_by_title.setdefault(title.strip().lower(), task_id)
+
+        edges = []
+        for task_id, _, dependencies in tasks:
+            if not dependencies or task_id in graph:
+                continue
+            try:
+                labels = json.loads(dependencies)
+            except ValueError:
+                labels = []
+            depends_on = resolve_labels(labels if isinstance(labels, list) else [labels], task_ids, ids_by_title)
+            # Tasks are added in id order, so only the one closing a cycle loses its edges
+            cycle = find_cycle(graph, task_id, depends_on)
+            if cycle:
+                print(f"Skipping dependencies of task {task_id}: cycle {' -> '.join(map(str, cycle))}")
+                skipped += 1
+                continue
+            graph[task_id] = set(depends_on)
+            edges += [{'task_id': task_id, 'depends_on_id': upstream, 'entity_id': entity_id} for upstream in depends_on]
+        if edges:
+            bind.execute(insert, edges)
+    print(f"Task dependency edges built ({skipped} tasks skipped because of cycles)")
+
+
+def downgrade():
+    # The edges are derived from the dependencies column; leaving them is harmless
+    pass
@@ -0,0 +1,14 @@
+from app import app, db, rebuild_rollups
+import sys
+
+def rebuild_dashboard():
+    """Recompute the dashboard rollup tables from accounts, tasks and documents"""
+    with app.app_context():
+        print("Rebuilding dashboard rollups...")
+        rebuild_rollups()
+        db.session.commit()
+        print("Dashboard rollups rebuilt successfully!")
+
+if __name__ == '__main__':
+    rebuild_dashboard()
+    sys.exit(0)
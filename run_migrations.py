@@ -1,4 +1,5 @@
-from app import app, db, User
+from app import app, db, User, SCHEMA_REVISION
+from flask_migrate import stamp, upgrade
 import sys
 import os
 
@@ -10,16 +11,21 @@ def run_migrations():
         print(f"MIGRATION: Database URL configured: {database_url[:50]}...")
         
         with app.app_context():
-            # Try to create all tables
-            print("MIGRATION: Creating database tables...")
-            db.create_all()
-            print("MIGRATION: Database tables created successfully!")
-            
-            # List created tables
             from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            print(f"MIGRATION: Created tables: {tables}")
+            tables = inspect(db.engine).get_table_names()
+            
+            if 'alembic_version' not in tables and 'entity' not in tables:
+                # A new database gets the current schema in one go and starts at the latest revision
+                print("MIGRATION: Creating database tables...")
+                db.create_all()
+                stamp()
+            else:
+                # Older databases, with or without an alembic_version, run the pending revisions
+                print("MIGRATION: Applying pending migrations...")
+                upgrade()
+            
+            # Workers compare this with SCHEMA_REVISION on their first request
+            print(f"MIGRATION: Schema is at revision {SCHEMA_REVISION}")
             
             # Create initial admin user if it doesn't exist
             admin_user = User.query.filter_by(username='iahmatt').first()
@@ -7,6 +7,7 @@ let currentUsername = localStorage.getItem('username');
 
 // Check if user is logged in on page load
 document.addEventListener('DOMContentLoaded', () => {
+    document.querySelector('.sidebar').addEventListener('scroll', handleSidebarScroll);
     if (authToken && currentUsername) {
         showMainApp();
     } else {
@@ -91,10 +92,13 @@ function showMainApp() {
     document.getElementById('register-modal').style.display = 'none';
     document.getElementById('main-app').style.display = 'block';
     document.getElementById('user-greeting').textContent = `Welcome, ${currentUsername}!`;
-    loadEntities();
+    startChangeFeed().then(() => loadEntities());
 }
 
 function logout() {
+    clearInterval(changePollTimer);
+    if (changeEvents) changeEvents.close();
+    changeEvents = null;
     authToken = null;
     currentUsername = null;
     localStorage.removeItem('authToken');
@@ -111,8 +115,8 @@ async function authFetch(url, options = {}) {
         ...options.headers
     };
     
-    // Don't set Content-Type if FormData (browser will set it with boundary)
-    if (!(options.body instanceof FormData)) {
+    // Don't set Content-Type if FormData (browser will set it with boundary) or raw file bytes
+    if (!(options.body instanceof FormData) && !(options.body instanceof Blob)) {
         headers['Content-Type'] = 'application/json';
     }
     
@@ -126,31 +130,82 @@ async function authFetch(url, options = {}) {
     });
 }
 
-async function loadEntities() {
+const ENTITY_PAGE_SIZE = 50;
+// GET /api/entities sort order; applyChange places new and renamed entities by the same rule
+const ENTITY_SORT = 'created_at';
+let entitiesCursor = null;
+let entitiesLoading = false;
+let entitySearchTimer = null;
+
+async function loadEntities(append = false) {
+    if (entitiesLoading) return;
+    if (!append) entitiesCursor = null;
+    entitiesLoading = true;
+    
     try {
-        const response = await authFetch(`${API_URL}/entities`);
-        const entities = await response.json();
-        displayEntities(entities);
+        const params = new URLSearchParams({ limit: ENTITY_PAGE_SIZE, sort: ENTITY_SORT });
+        if (append && entitiesCursor) params.set('cursor', entitiesCursor);
+        const namePrefix = document.getElementById('entity-search').value.trim();
+        const status = document.getElementById('entity-status-filter').value;
+        if (namePrefix) params.set('name_prefix', namePrefix);
+        if (status) params.set('status', status);
+        
+        const response = await authFetch(`${API_URL}/entities?${params}`);
+        const page = await response.json();
+        entitiesCursor = page.next_cursor;
+        displayEntities(page.entities, append);
     } catch (error) {
         console.error('Error loading entities:', error);
         document.getElementById('entities-list').innerHTML = '<p class="empty-state">Error loading entities</p>';
+    } finally {
+        entitiesLoading = false;
+    }
+}
+
+function loadMoreEntities() {
+    if (entitiesCursor) loadEntities(true);
+}
+
+function filterEntities() {
+    // Debounce typing so each keystroke doesn't issue a request
+    clearTimeout(entitySearchTimer);
+    entitySearchTimer = setTimeout(() => loadEntities(), 250);
+}
+
+function handleSidebarScroll(event) {
+    const sidebar = event.currentTarget;
+    if (sidebar.scrollTop + sidebar.clientHeight >= sidebar.scrollHeight - 100) {
+        loadMoreEntities();
     }
 }
 
-function displayEntities(entities) {
+// Loaded sidebar entities and the open entity's detail; the change feed keeps both current
+let entityList = [];
+let entityDetail = null;
+
+function displayEntities(entities, append = false) {
+    entityList = append ? entityList.concat(entities) : entities;
+    renderEntityList();
+}
+
+function renderEntityList() {
     const container = document.getElementById('entities-list');
     
-    if (entities.length === 0) {
+    if (entityList.length === 0) {
         container.innerHTML = '<p class="empty-state">No entities yet. Create one!</p>';
         return;
     }
     
-    container.innerHTML = entities.map(entity => `
-        <div class="entity-item" onclick="selectEntity(${entity.id})">
+    container.innerHTML = entityList.map(entity => `
+        <div class="entity-item${entity.id === selectedEntityId ? ' active' : ''}" data-id="${entity.id}" onclick="selectEntity(${entity.id})">
             <h3>${escapeHtml(entity.name)}</h3>
             <p>${escapeHtml(entity.description || 'No description')}</p>
         </div>
     `).join('');
+    
+    if (entitiesCursor) {
+        container.insertAdjacentHTML('beforeend', '<button id="entities-load-more" class="btn-primary" onclick="loadMoreEntities()">Load more</button>');
+    }
 }
 
 async function selectEntity(id) {
@@ -158,15 +213,14 @@ async function selectEntity(id) {
     
     // Update active state
     document.querySelectorAll('.entity-item').forEach(item => {
-        item.classList.remove('active');
+        item.classList.toggle('active', Number(item.dataset.id) === id);
     });
-    event.currentTarget.classList.add('active');
     
     // Load entity details
     try {
         const response = await authFetch(`${API_URL}/entities/${id}`);
-        const entity = await response.json();
-        displayEntityDetails(entity);
+        entityDetail = await response.json();
+        displayEntityDetails(entityDetail);
     } catch (error) {
         console.error('Error loading entity:', error);
         document.getElementById('entity-details').innerHTML = '<p>Error loading entity details</p>';
@@ -266,6 +320,133 @@ function displayEntityDetails(entity) {
     `;
 }
 
+// Delta sync: take a cursor before the first load, then apply only the changes made since.
+// The event stream announces other sessions' changes; polling is the fallback when it is down.
+const CHANGE_POLL_INTERVAL = 15000;
+const CHANGE_POLL_INTERVAL_LIVE = 120000;
+let changeCursor = null;
+let changeSync = null;
+let changePollTimer = null;
+let changeEvents = null;
+
+async function startChangeFeed() {
+    try {
+        const response = await authFetch(`${API_URL}/changes`);
+        changeCursor = (await response.json()).next_cursor;
+    } catch (error) {
+        console.error('Error starting change feed:', error);
+    }
+    schedulePolling(CHANGE_POLL_INTERVAL);
+    connectChangeEvents();
+}
+
+function schedulePolling(interval) {
+    clearInterval(changePollTimer);
+    changePollTimer = setInterval(syncChanges, interval);
+}
+
+function connectChangeEvents() {
+    if (changeEvents) changeEvents.close();
+    if (!window.EventSource || !authToken) return;
+    // EventSource reconnects by itself and resends the last event id, so missed changes are replayed
+    changeEvents = new EventSource(`${API_URL}/events?token=${encodeURIComponent(authToken)}`);
+    changeEvents.addEventListener('change', () => syncChanges());
+    changeEvents.onopen = () => schedulePolling(CHANGE_POLL_INTERVAL_LIVE);
+    changeEvents.onerror = () => schedulePolling(CHANGE_POLL_INTERVAL);
+}
+
+function syncChanges() {
+    // Coalesce overlapping calls (a save landing during a poll) into the running sync
+    if (!changeSync) {
+        changeSync = pullChanges().finally(() => { changeSync = null; });
+    }
+    return changeSync;
+}
+
+async function pullChanges() {
+    if (!authToken || changeCursor === null) return;
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const response = await authFetch(`${API_URL}/changes?since=${changeCursor}`);
+            if (response.status === 410) {
+                // Too far behind for deltas: start over from a fresh copy
+                await startChangeFeed();
+                loadEntities();
+                if (selectedEntityId) selectEntity(selectedEntityId);
+                return;
+            }
+            const page = await response.json();
+            page.changes.forEach(applyChange);
+            changeCursor = page.next_cursor;
+            hasMore = page.has_more;
+            if (page.changes.length > 0) {
+                renderEntityList();
+                if (entityDetail) displayEntityDetails(entityDetail);
+            }
+        }
+    } catch (error) {
+        console.error('Error syncing changes:', error);
+    }
+}
+
+function matchesEntityFilters(entity) {
+    const namePrefix = document.getElementById('entity-search').value.trim().toLowerCase();
+    const status = document.getElementById('entity-status-filter').value;
+    return entity.name.toLowerCase().startsWith(namePrefix) && (!status || entity.status === status);
+}
+
+function compareEntities(a, b) {
+    // The server's keyset order: the ENTITY_SORT column, then id, both reversed for '-' sorts
+    const descending = ENTITY_SORT.startsWith('-');
+    const key = descending ? ENTITY_SORT.slice(1) : ENTITY_SORT;
+    const order = a[key] < b[key] ? -1 : a[key] > b[key] ? 1 : a.id - b.id;
+    return descending ? -order : order;
+}
+
+function applyChange(change) {
+    if (change.type === 'entity') {
+        const index = entityList.findIndex(entity => entity.id === change.id);
+        if (change.op === 'delete') {
+            if (index !== -1) entityList.splice(index, 1);
+            if (selectedEntityId === change.id) {
+                selectedEntityId = null;
+                entityDetail = null;
+                document.getElementById('entity-details').style.display = 'none';
+                document.getElementById('welcome').style.display = 'block';
+            }
+            return;
+        }
+        // Re-place the entity: an edit can move it in the sort order or out of the filters
+        if (index !== -1) entityList.splice(index, 1);
+        if (matchesEntityFilters(change.data)) {
+            const position = entityList.findIndex(entity => compareEntities(change.data, entity) < 0);
+            if (position !== -1) {
+                entityList.splice(position, 0, change.data);
+            } else if (!entitiesCursor) {
+                // Past the last loaded row it belongs on a page not loaded yet, unless this was the last page
+                entityList.push(change.data);
+            }
+        }
+        if (entityDetail && entityDetail.id === change.id) {
+            Object.assign(entityDetail, change.data);
+        }
+        return;
+    }
+    
+    if (!entityDetail) return;
+    const collection = entityDetail[`${change.type}s`];
+    if (!collection) return;
+    const index = collection.findIndex(item => item.id === change.id);
+    if (change.op === 'delete' || change.data.entity_id !== entityDetail.id) {
+        if (index !== -1) collection.splice(index, 1);
+    } else if (index !== -1) {
+        collection[index] = change.data;
+    } else {
+        collection.push(change.data);
+    }
+}
+
 function showCreateEntityForm() {
     currentEntityId = null;
     document.getElementById('entity-modal-title').textContent = 'Create Entity';
@@ -283,7 +464,7 @@ function showCreateEntityForm() {
 
 async function editEntity(entityId) {
     try {
-        const response = await authFetch(`${API_URL}/entities/${entityId}`);
+        const response = await authFetch(`${API_URL}/entities/${entityId}?include=`);
         const entity = await response.json();
         currentEntityId = entityId;
         document.getElementById('entity-modal-title').textContent = 'Edit Entity';
@@ -337,13 +518,8 @@ async function handleEntitySubmit(event) {
         
         if (response.ok) {
             closeModal();
-            if (currentEntityId) {
-                showSuccessMessage('Entity updated successfully!');
-                selectEntity(currentEntityId);
-            } else {
-                showSuccessMessage('Entity created successfully!');
-                loadEntities();
-            }
+            showSuccessMessage(currentEntityId ? 'Entity updated successfully!' : 'Entity created successfully!');
+            syncChanges();
         } else {
             alert('Error saving entity');
         }
@@ -446,16 +622,20 @@ async function uploadDocument(event) {
         return;
     }
     
+    const file = fileInput.files[0];
     const formData = new FormData();
-    formData.append('file', fileInput.files[0]);
+    formData.append('file', file);
     formData.append('title', title);
     formData.append('document_type', documentType);
     
     try {
-        const response = await authFetch(`${API_URL}/entities/${entityId}/documents`, {
-            method: 'POST',
-            body: formData
-        });
+        // Large files go through the resumable chunked protocol so a dropped connection can resume
+        const response = file.size > CHUNKED_UPLOAD_THRESHOLD
+            ? await uploadInChunks(entityId, file, title, documentType)
+            : await authFetch(`${API_URL}/entities/${entityId}/documents`, {
+                method: 'POST',
+                body: formData
+            });
         
         if (response.ok) {
             closeUploadModal();
@@ -463,7 +643,7 @@ async function uploadDocument(event) {
             document.getElementById('document-type').value = '';
             document.getElementById('document-file').value = '';
             showSuccessMessage('Document uploaded successfully!');
-            selectEntity(entityId);
+            syncChanges();
         } else {
             const error = await response.json();
             alert('Error uploading document: ' + (error.error || 'Unknown error'));
@@ -474,6 +654,53 @@ async function uploadDocument(event) {
     }
 }
 
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 5;
+
+async function sha256Hex(file) {
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadInChunks(entityId, file, title, documentType) {
+    let response = await authFetch(`${API_URL}/entities/${entityId}/uploads`, {
+        method: 'POST',
+        body: JSON.stringify({
+            filename: file.name,
+            size: file.size,
+            sha256: await sha256Hex(file),
+            title: title,
+            document_type: documentType
+        })
+    });
+    if (!response.ok) return response;
+    
+    const upload = await response.json();
+    let offset = upload.offset;
+    let failures = 0;
+    
+    while (offset < file.size) {
+        try {
+            response = await authFetch(`${API_URL}/uploads/${upload.upload_id}?offset=${offset}`, {
+                method: 'PUT',
+                body: file.slice(offset, offset + upload.chunk_size)
+            });
+            // 409 means the server has a different offset than we do; continue from its offset
+            if (!response.ok && response.status !== 409) return response;
+            offset = (await response.json()).offset;
+            failures = 0;
+        } catch (error) {
+            // Connection dropped: back off, then ask the server how much it already has
+            if (++failures > MAX_CHUNK_RETRIES) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            const status = await authFetch(`${API_URL}/uploads/${upload.upload_id}`).catch(() => null);
+            if (status && status.ok) offset = (await status.json()).offset;
+        }
+    }
+    
+    return authFetch(`${API_URL}/uploads/${upload.upload_id}/complete`, { method: 'POST' });
+}
+
 async function viewDocument(documentId, title) {
     const modal = document.getElementById('viewer-modal');
     modal.style.display = 'block';
@@ -507,9 +734,7 @@ async function deleteDocument(documentId) {
         });
         
         if (response.ok) {
-            if (selectedEntityId) {
-                selectEntity(selectedEntityId);
-            }
+            syncChanges();
         } else {
             alert('Error deleting document');
         }
@@ -591,7 +816,7 @@ async function handleAccountSubmit(event) {
         
         if (response.ok) {
             closeAccountModal();
-            selectEntity(entityId);
+            syncChanges();
         } else {
             alert('Error saving account');
         }
@@ -606,8 +831,8 @@ async function deleteAccount(accountId) {
     
     try {
         const response = await authFetch(`${API_URL}/accounts/${accountId}`, { method: 'DELETE' });
-        if (response.ok && selectedEntityId) {
-            selectEntity(selectedEntityId);
+        if (response.ok) {
+            syncChanges();
         } else {
             alert('Error deleting account');
         }
@@ -713,7 +938,7 @@ async function handleTaskSubmit(event) {
         
         if (response.ok) {
             closeTaskModal();
-            selectEntity(entityId);
+            syncChanges();
         } else {
             alert('Error saving task');
         }
@@ -728,8 +953,8 @@ async function deleteTask(taskId) {
     
     try {
         const response = await authFetch(`${API_URL}/tasks/${taskId}`, { method: 'DELETE' });
-        if (response.ok && selectedEntityId) {
-            selectEntity(selectedEntityId);
+        if (response.ok) {
+            syncChanges();
         } else {
             alert('Error deleting task');
         }
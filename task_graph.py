@@ -0,0 +1,147 @@
+"""Dependency graph algorithms for an entity's tasks.
+
+Plain functions over dicts of task ids, with no database access. A graph is an
+adjacency map from each task id to the set of task ids it depends on.
+"""
+import heapq
+from collections import defaultdict
+
+# Working hours in a scheduled day, used to place start and due dates on the estimated_hours timeline
+HOURS_PER_DAY = 8
+
+
+class DependencyCycleError(ValueError):
+    """Adding a dependency would make a task (indirectly) depend on itself"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__('Dependency cycle: ' + ' -> '.join(str(task_id) for task_id in cycle))
+
+
+def find_cycle(graph, task_id, depends_on):
+    """Return the cycle that making task_id depend on `depends_on` would close, or None.
+
+    Only the part of the graph reachable from the new dependencies is searched,
+    so checking an insert costs far less than re-validating the whole graph.
+    """
+    explored = set()
+    for start in depends_on:
+        if start == task_id:
+            return [task_id, task_id]
+        if start in explored:
+            continue
+        parents = {start: None}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for upstream in graph.get(node, ()):
+                if upstream == task_id:
+                    path = [task_id]
+                    while node is not None:
+                        path.append(node)
+                        node = parents[node]
+                    return [task_id] + path[::-1]
+                if upstream not in parents and upstream not in explored:
+                    parents[upstream] = node
+                    stack.append(upstream)
+        explored.update(parents)
+    return None
+
+
+def topological_order(task_ids, graph):
+    """Order tasks so every task comes after the tasks it depends on (lowest id first among ready tasks).
+
+    Returns (order, blocked) where blocked lists tasks on or behind a cycle.
+    """
+    task_ids = set(task_ids)
+    pending = {task_id: 0 for task_id in task_ids}
+    dependents = defaultdict(list)
+    for task_id in task_ids:
+        for upstream in graph.get(task_id, ()):
+            if upstream in task_ids:
+                pending[task_id] += 1
+                dependents[upstream].append(task_id)
+
+    ready = [task_id for task_id, count in pending.items() if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        task_id = heapq.heappop(ready)
+        order.append(task_id)
+        for dependent in dependents[task_id]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                heapq.heappush(ready, dependent)
+    blocked = sorted(task_id for task_id, count in pending.items() if count > 0)
+    return order, blocked
+
+
+def schedule(tasks, graph, origin):
+    """Critical path method over the tasks, measured in working hours from `origin` (a date).
+
+    `tasks` maps id -> {'duration': hours, 'start': date or None, 'due': date or None}.
+    A start date delays a task's earliest start; a due date caps its latest finish,
+    so a task that cannot meet it gets negative slack. Tasks with zero or negative
+    slack are critical. Returns a dict with 'order', 'blocked', 'project_finish',
+    'critical_path' and per-task 'timings'.
+    """
+    order, blocked = topological_order(tasks, graph)
+
+    def offset(day):
+        return (day - origin).days * HOURS_PER_DAY
+
+    earliest_start, earliest_finish = {}, {}
+    for task_id in order:
+        task = tasks[task_id]
+        start = max([earliest_finish[upstream] for upstream in graph.get(task_id, ()) if upstream in tasks]
+                    + [offset(task['start']) if task['start'] else 0, 0])
+        earliest_start[task_id] = start
+        earliest_finish[task_id] = start + task['duration']
+    project_finish = max(earliest_finish.values(), default=0)
+
+    dependents = defaultdict(list)
+    for task_id in order:
+        for upstream in graph.get(task_id, ()):
+            if upstream in earliest_start:
+                dependents[upstream].append(task_id)
+
+    latest_start, latest_finish = {}, {}
+    for task_id in reversed(order):
+        task = tasks[task_id]
+        finish = min([latest_start[dependent] for dependent in dependents[task_id]]
+                     + [offset(task['due']) + HOURS_PER_DAY if task['due'] else project_finish, project_finish])
+        latest_finish[task_id] = finish
+        latest_start[task_id] = finish - task['duration']
+
+    timings = {}
+    for task_id in order:
+        slack = latest_start[task_id] - earliest_start[task_id]
+        timings[task_id] = {
+            'earliest_start': earliest_start[task_id],
+            'earliest_finish': earliest_finish[task_id],
+            'latest_start': latest_start[task_id],
+            'latest_finish': latest_finish[task_id],
+            'slack': slack,
+            'critical': slack <= 0
+        }
+
+    # Walk back from the last critical task to finish through critical predecessors that gate it
+    critical_path = []
+    critical = [task_id for task_id in order if timings[task_id]['critical']]
+    if critical:
+        task_id = max(critical, key=lambda t: (earliest_finish[t], -t))
+        while task_id is not None:
+            critical_path.append(task_id)
+            gating = [upstream for upstream in graph.get(task_id, ())
+                      if upstream in timings and timings[upstream]['critical']
+                      and earliest_finish[upstream] == earliest_start[task_id]]
+            task_id = min(gating) if gating else None
+        critical_path.reverse()
+
+    return {
+        'order': order,
+        'blocked': blocked,
+        'project_finish': project_finish,
+        'critical_path': critical_path,
+        'timings': timings
+    }
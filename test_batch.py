@@ -0,0 +1,94 @@
+"""The :batch endpoints apply all of their items or none, reporting a result per item:
+    python -m pytest test_batch.py
+"""
+import pytest
+
+
+@pytest.fixture(scope='module')
+def entity_id(client, headers):
+    return client.post('/api/entities', json={'name': 'Batched'}, headers=headers).json['id']
+
+
+def create_tasks(client, headers, entity_id, *titles):
+    response = client.post(f'/api/entities/{entity_id}/tasks:batch', headers=headers,
+                           json={'items': [{'title': title} for title in titles]})
+    assert response.status_code == 201, response.data
+    return [result['data']['id'] for result in response.json['results']]
+
+
+def task_titles(client, headers, entity_id):
+    return sorted(task['title'] for task in client.get(f'/api/entities/{entity_id}/tasks', headers=headers).json)
+
+
+def test_one_invalid_item_rejects_the_whole_batch(client, headers, entity_id):
+    response = client.post(f'/api/entities/{entity_id}/accounts:batch', headers=headers, json={'items': [
+        {'account_name': 'Valid'}, {'balance': 10}, {'account_name': 'Bad balance', 'balance': 'lots'}, 'not an object'
+    ]})
+    assert response.status_code == 400
+    assert [(result['index'], result['status']) for result in response.json['results']] == [
+        (0, 424), (1, 400), (2, 400), (3, 400)]
+    assert 'account_name' in response.json['results'][1]['error']
+    assert client.get(f'/api/entities/{entity_id}/accounts', headers=headers).json == []
+
+
+def test_update_reports_unknown_and_repeated_ids(client, headers, entity_id):
+    first, second = create_tasks(client, headers, entity_id, 'Update one', 'Update two')
+    response = client.patch('/api/tasks:batch', headers=headers, json={'items': [
+        {'id': first, 'status': 'completed'}, {'id': 999999, 'status': 'completed'}, {'id': first, 'priority': 'low'}
+    ]})
+    assert response.status_code == 400
+    assert [result['status'] for result in response.json['results']] == [424, 400, 400]
+    assert 'not found' in response.json['results'][1]['error']
+    assert 'more than once' in response.json['results'][2]['error']
+
+    response = client.patch('/api/tasks:batch', headers=headers, json={'items': [
+        {'id': first, 'status': 'completed'}, {'id': second, 'priority': 'low'}]})
+    assert response.status_code == 200
+    assert [result['data']['status'] for result in response.json['results']] == ['completed', 'pending']
+
+
+@pytest.mark.parametrize('bad_id', [[1], {'a': 1}, True, '1', None, 1.5])
+def test_malformed_ids_are_item_errors(client, headers, entity_id, bad_id):
+    task_id, = create_tasks(client, headers, entity_id, f'Malformed {bad_id!r}')
+
+    response = client.patch('/api/tasks:batch', headers=headers, json={'items': [
+        {'id': task_id, 'status': 'completed'}, {'id': bad_id, 'status': 'completed'}]})
+    assert response.status_code == 400
+    assert response.json['results'][1] == {'index': 1, 'status': 400, 'error': 'id must be an integer'}
+
+    response = client.delete('/api/tasks:batch', headers=headers, json={'ids': [task_id, bad_id]})
+    assert response.status_code == 400
+    assert response.json['results'][1] == {'index': 1, 'status': 400, 'error': 'id must be an integer'}
+    assert f'Malformed {bad_id!r}' in task_titles(client, headers, entity_id)
+
+
+def test_delete_removes_every_listed_row(client, headers, entity_id):
+    ids = create_tasks(client, headers, entity_id, 'Delete one', 'Delete two')
+    response = client.delete('/api/tasks:batch', headers=headers, json={'ids': ids + [999999]})
+    assert response.status_code == 400
+    assert [result['status'] for result in response.json['results']] == [424, 424, 400]
+
+    response = client.delete('/api/tasks:batch', headers=headers, json={'ids': ids})
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['results']] == [204, 204]
+    assert not {'Delete one', 'Delete two'} & set(task_titles(client, headers, entity_id))
+
+
+def test_rebuilt_rollups_match_the_ones_batches_maintained(server, flask_app, client, headers, entity_id):
+    create_tasks(client, headers, entity_id, 'Rollup one', 'Rollup two')
+    assert client.patch('/api/tasks:batch', headers=headers, json={'items': [
+        {'id': task['id'], 'status': 'completed', 'due_date': '2030-01-01'}
+        for task in client.get(f'/api/entities/{entity_id}/tasks', headers=headers).json[:2]
+    ]}).status_code == 200
+
+    def rollups():
+        return {table: sorted(map(tuple, server.db.session.execute(server.db.text(f'SELECT * FROM {table}'))))
+                for table in ('entity_rollup', 'task_rollup', 'task_due_rollup')}
+
+    with flask_app.app_context():
+        maintained = rollups()
+        server.rebuild_rollups()
+        rebuilt = rollups()
+        server.db.session.rollback()
+    assert rebuilt == maintained
+    assert maintained['task_rollup']
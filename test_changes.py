@@ -0,0 +1,113 @@
+"""The change feed the web client syncs from, GET /api/changes:
+    python -m pytest test_changes.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+def cursor(client, headers):
+    response = client.get('/api/changes', headers=headers)
+    assert response.json['changes'] == []
+    return response.json['next_cursor']
+
+
+def changes_since(client, headers, since, **params):
+    response = client.get('/api/changes', headers=headers, query_string={'since': since, **params})
+    assert response.status_code == 200, response.data
+    return response.json
+
+
+def summary(changes):
+    return [(change['type'], change['id'], change['op']) for change in changes]
+
+
+def test_changes_after_the_cursor_carry_current_data(client, headers):
+    since = cursor(client, headers)
+    entity = client.post('/api/entities', json={'name': 'Synced'}, headers=headers).json
+    task = client.post(f"/api/entities/{entity['id']}/tasks", json={'title': 'Draft'}, headers=headers).json
+
+    feed = changes_since(client, headers, since)
+    assert summary(feed['changes']) == [('entity', entity['id'], 'upsert'), ('task', task['id'], 'upsert')]
+    assert feed['changes'][1]['data']['title'] == 'Draft'
+    assert feed['has_more'] is False
+    assert feed['next_cursor'] == feed['changes'][-1]['cursor']
+    assert int(feed['next_cursor']) > int(since)
+
+    # Nothing new: the cursor stays put
+    assert changes_since(client, headers, feed['next_cursor']) == {
+        'changes': [], 'next_cursor': feed['next_cursor'], 'has_more': False}
+
+
+def test_repeated_writes_collapse_and_deletes_become_tombstones(client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Collapsed'}, headers=headers).json['id']
+    task_id = client.post(f'/api/entities/{entity_id}/tasks', json={'title': 'First'}, headers=headers).json['id']
+    since = cursor(client, headers)
+
+    for title in ('Second', 'Third'):
+        client.put(f'/api/tasks/{task_id}', json={'title': title}, headers=headers)
+    removed = client.post(f'/api/entities/{entity_id}/tasks', json={'title': 'Short lived'}, headers=headers).json['id']
+    client.delete(f'/api/tasks/{removed}', headers=headers)
+
+    changes = changes_since(client, headers, since)['changes']
+    assert summary(changes) == [('task', task_id, 'upsert'), ('task', removed, 'delete')]
+    assert changes[0]['data']['title'] == 'Third'
+    assert 'data' not in changes[1]
+    # Ordered by the latest write to each record
+    assert int(changes[0]['cursor']) < int(changes[1]['cursor'])
+
+
+def test_pages_follow_next_cursor_until_has_more_is_false(client, headers):
+    since = cursor(client, headers)
+    entity_id = client.post('/api/entities', json={'name': 'Paged changes'}, headers=headers).json['id']
+    task_ids = [client.post(f'/api/entities/{entity_id}/tasks', json={'title': f'Task {n}'}, headers=headers).json['id']
+                for n in range(5)]
+
+    seen, pages = [], 0
+    while True:
+        feed = changes_since(client, headers, since, limit=2)
+        seen += summary(feed['changes'])
+        since = feed['next_cursor']
+        pages += 1
+        if not feed['has_more']:
+            break
+    assert pages == 3
+    assert seen == [('entity', entity_id, 'upsert')] + [('task', task_id, 'upsert') for task_id in task_ids]
+
+
+def test_entity_delete_reports_its_children(client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Deleted'}, headers=headers).json['id']
+    account_id = client.post(f'/api/entities/{entity_id}/accounts', json={'account_name': 'Checking'},
+                             headers=headers).json['id']
+    since = cursor(client, headers)
+    assert client.delete(f'/api/entities/{entity_id}', headers=headers).status_code == 204
+    assert sorted(summary(changes_since(client, headers, since)['changes'])) == [
+        ('account', account_id, 'delete'), ('entity', entity_id, 'delete')]
+
+
+@pytest.mark.parametrize('params', [{'since': 'latest'}, {'since': '0', 'limit': 'all'}])
+def test_malformed_cursors_are_rejected(client, headers, params):
+    assert client.get('/api/changes', headers=headers, query_string=params).status_code == 400
+
+
+def test_a_cursor_older_than_the_retained_log_is_gone(server, flask_app, client, headers, monkeypatch):
+    since = cursor(client, headers)
+    client.post('/api/entities', json={'name': 'Before the cut'}, headers=headers)
+    client.post('/api/entities', json={'name': 'Also before the cut'}, headers=headers)
+
+    monkeypatch.setattr(server, '_change_log_pruned_at', None)
+    with flask_app.app_context():
+        server.prune_change_log(datetime.utcnow() + server.CHANGE_LOG_RETENTION + timedelta(minutes=1))
+        server.db.session.commit()
+
+    assert client.get('/api/changes', headers=headers, query_string={'since': since}).status_code == 410
+    # A client that reloads takes a fresh cursor and carries on
+    since = cursor(client, headers)
+    entity_id = client.post('/api/entities', json={'name': 'After the cut'}, headers=headers).json['id']
+    assert summary(changes_since(client, headers, since)['changes']) == [('entity', entity_id, 'upsert')]
@@ -0,0 +1,114 @@
+"""ETags, conditional GET and the response cache, and their invalidation by writes:
+    python -m pytest test_conditional_get.py
+"""
+import pytest
+
+
+@pytest.fixture
+def entity_id(client, headers):
+    return client.post('/api/entities', json={'name': 'Tagged'}, headers=headers).json['id']
+
+
+def get(client, headers, url, etag=None):
+    return client.get(url, headers={**headers, 'If-None-Match': etag} if etag else headers)
+
+
+def test_an_unchanged_entity_answers_304(client, headers, entity_id):
+    url = f'/api/entities/{entity_id}'
+    response = get(client, headers, url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = get(client, headers, url, etag)
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.get_data() == b''
+    # The second full response comes from the cache
+    fresh = get(client, headers, url + '?include=tasks')
+    cached = get(client, headers, url + '?include=tasks')
+    assert cached.get_data() == fresh.get_data()
+    assert get(client, headers, url, '"stale"').status_code == 200
+
+
+@pytest.mark.parametrize('collection', ['', '/tasks', '/accounts', '/documents'])
+def test_writes_to_children_change_the_entity_tags(client, headers, entity_id, collection):
+    url = f'/api/entities/{entity_id}{collection}'
+    etag = get(client, headers, url).headers['ETag']
+
+    task = client.post(f'/api/entities/{entity_id}/tasks', json={'title': 'First'}, headers=headers).json
+    response = get(client, headers, url, etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    etag = response.headers['ETag']
+
+    client.put(f"/api/tasks/{task['id']}", json={'title': 'Renamed'}, headers=headers)
+    response = get(client, headers, url, etag)
+    assert response.status_code == 200
+    if collection == '/tasks':
+        # Served fresh, not from the cached body of the old version
+        assert [task['title'] for task in response.json] == ['Renamed']
+
+    etag = response.headers['ETag']
+    assert client.delete(f"/api/tasks/{task['id']}", headers=headers).status_code == 204
+    assert get(client, headers, url, etag).status_code == 200
+
+
+def test_a_write_leaves_other_entities_tags_alone(client, headers, entity_id):
+    other = client.post('/api/entities', json={'name': 'Untouched'}, headers=headers).json['id']
+    etag = get(client, headers, f'/api/entities/{other}').headers['ETag']
+    client.post(f'/api/entities/{entity_id}/accounts', json={'account_name': 'Checking'}, headers=headers)
+    assert get(client, headers, f'/api/entities/{other}', etag).status_code == 304
+
+
+def test_entity_list_tag_follows_entity_writes(client, headers, entity_id):
+    def list_etag():
+        response = get(client, headers, '/api/entities?limit=200')
+        assert response.status_code == 200
+        return response.headers['ETag']
+
+    etag = list_etag()
+    assert get(client, headers, '/api/entities?limit=200', etag).status_code == 304
+
+    client.put(f'/api/entities/{entity_id}', json={'name': 'Tagged again'}, headers=headers)
+    response = get(client, headers, '/api/entities?limit=200', etag)
+    assert response.status_code == 200
+    assert 'Tagged again' in [entity['name'] for entity in response.json['entities']]
+
+    etag = list_etag()
+    client.delete(f'/api/entities/{entity_id}', headers=headers)
+    response = get(client, headers, '/api/entities?limit=200', etag)
+    assert response.status_code == 200
+    assert entity_id not in [entity['id'] for entity in response.json['entities']]
+
+
+def test_entity_list_tag_covers_only_its_page(client, headers):
+    url = '/api/entities?sort=-created_at&limit=1&name_prefix=paged%20tag'
+    older = client.post('/api/entities', json={'name': 'Paged tag older'}, headers=headers).json['id']
+    client.post('/api/entities', json={'name': 'Paged tag one'}, headers=headers)
+    client.post('/api/entities', json={'name': 'Paged tag two'}, headers=headers)
+    etag = get(client, headers, url).headers['ETag']
+
+    # Off the page (and not the extra row that decides next_cursor): the tag holds
+    client.put(f'/api/entities/{older}', json={'name': 'Paged tag oldest'}, headers=headers)
+    assert get(client, headers, url, etag).status_code == 304
+    newest = client.post('/api/entities', json={'name': 'Paged tag three'}, headers=headers).json['id']
+    response = get(client, headers, url, etag)
+    assert response.status_code == 200
+    assert [entity['id'] for entity in response.json['entities']] == [newest]
+
+
+def test_missing_entity_is_404_not_cached(client, headers):
+    assert get(client, headers, '/api/entities/999999').status_code == 404
+    assert get(client, headers, '/api/entities/999999/tasks').status_code == 404
+
+
+def test_apps_on_different_databases_keep_separate_caches(server, headers, tmp_path):
+    for name in ('First database', 'Second database'):
+        other = server.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / name}.db"})
+        with other.app_context():
+            server.db.create_all()
+        client = other.test_client()
+        # The same path and tag on both databases, so a shared cache would answer with the first body
+        assert client.post('/api/entities', json={'name': name}, headers=headers).json['id'] == 1
+        assert client.get('/api/entities/1', headers=headers).json['name'] == name
@@ -0,0 +1,73 @@
+"""The dashboard numbers the write handlers keep in the rollup tables, GET /api/dashboard:
+    python -m pytest test_dashboard.py
+"""
+import pytest
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+def summary(client, headers, entity_id):
+    response = client.get('/api/dashboard', headers=headers)
+    assert response.status_code == 200
+    return next(entity for entity in response.json['entities'] if entity['id'] == entity_id)
+
+
+def test_rollups_follow_creates_updates_and_deletes(client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Dashboard'}, headers=headers).json['id']
+    assert summary(client, headers, entity_id) == {
+        'id': entity_id, 'name': 'Dashboard', 'status': 'active', 'accounts': 0, 'total_balance': 0.0, 'tasks': 0,
+        'tasks_by_status': {}, 'tasks_by_priority': {}, 'overdue_tasks': 0, 'documents': 0, 'document_bytes': 0}
+
+    checking = client.post(f'/api/entities/{entity_id}/accounts', json={'account_name': 'Checking', 'balance': 100.5},
+                           headers=headers).json['id']
+    client.post(f'/api/entities/{entity_id}/accounts', json={'account_name': 'Savings', 'balance': 900},
+                headers=headers)
+    late = client.post(f'/api/entities/{entity_id}/tasks', headers=headers, json={
+        'title': 'Late filing', 'priority': 'high', 'due_date': '2020-01-31'}).json['id']
+    client.post(f'/api/entities/{entity_id}/tasks', headers=headers, json={
+        'title': 'Next year', 'priority': 'high', 'due_date': '2999-01-31'})
+    dropped = client.post(f'/api/entities/{entity_id}/tasks', json={'title': 'Someday'}, headers=headers).json['id']
+
+    dashboard = summary(client, headers, entity_id)
+    assert (dashboard['accounts'], dashboard['total_balance']) == (2, 1000.5)
+    assert dashboard['tasks'] == 3
+    assert dashboard['tasks_by_status'] == {'pending': 3}
+    assert dashboard['tasks_by_priority'] == {'high': 2, 'none': 1}
+    assert dashboard['overdue_tasks'] == 1
+
+    client.put(f'/api/accounts/{checking}', json={'balance': 50}, headers=headers)
+    client.put(f'/api/tasks/{late}', json={'status': 'completed'}, headers=headers)
+    client.put(f'/api/tasks/{dropped}', json={'priority': 'low', 'due_date': '2021-06-30'}, headers=headers)
+
+    dashboard = summary(client, headers, entity_id)
+    assert (dashboard['accounts'], dashboard['total_balance']) == (2, 950.0)
+    assert dashboard['tasks_by_status'] == {'pending': 2, 'completed': 1}
+    assert dashboard['tasks_by_priority'] == {'high': 2, 'low': 1}
+    # The completed task is no longer overdue; the one given a past due date now is
+    assert dashboard['overdue_tasks'] == 1
+
+    assert client.delete(f'/api/accounts/{checking}', headers=headers).status_code == 204
+    assert client.delete(f'/api/tasks/{dropped}', headers=headers).status_code == 204
+
+    dashboard = summary(client, headers, entity_id)
+    assert (dashboard['accounts'], dashboard['total_balance']) == (1, 900.0)
+    assert dashboard['tasks'] == 2
+    assert dashboard['tasks_by_status'] == {'pending': 1, 'completed': 1}
+    assert dashboard['tasks_by_priority'] == {'high': 2}
+    assert dashboard['overdue_tasks'] == 0
+
+
+def test_totals_add_up_the_entities(client, headers):
+    other = client.post('/api/entities', json={'name': 'Dashboard total'}, headers=headers).json['id']
+    client.post(f'/api/entities/{other}/accounts', json={'account_name': 'Payroll', 'balance': 25}, headers=headers)
+
+    dashboard = client.get('/api/dashboard', headers=headers).json
+    totals = dashboard['totals']
+    assert totals['entities'] == len(dashboard['entities'])
+    for key in ('accounts', 'total_balance', 'tasks', 'overdue_tasks', 'documents', 'document_bytes'):
+        assert totals[key] == sum(entity[key] for entity in dashboard['entities'])
+    assert sum(totals['tasks_by_status'].values()) == totals['tasks']
@@ -0,0 +1,105 @@
+"""Connection pool telemetry and read-replica routing, with two SQLite files standing in for
+a primary and its replica:
+    python -m pytest test_database_routing.py
+
+The "replica" is only refreshed when a test copies the primary over it, so a read that
+reaches the wrong database shows up as a missing or stale row.
+"""
+import sqlite3
+
+import pytest
+import sqlalchemy as sa
+
+
+@pytest.fixture(scope='module')
+def paths(work_dir):
+    return work_dir, work_dir / 'primary.db', work_dir / 'replica.db'
+
+
+@pytest.fixture(scope='module')
+def app_config(paths):
+    _, primary, replica = paths
+    return {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}', 'DATABASE_REPLICA_URL': f'sqlite:///{replica}'}
+
+
+@pytest.fixture(scope='module', autouse=True)
+def replica_schema(server, flask_app):
+    with flask_app.app_context():
+        server.db.metadata.create_all(server.db.engines[server.REPLICA_BIND])
+    yield
+    # init_app registered an (empty) metadata for the bind on the shared db; other test apps have no such bind
+    server.db.metadatas.pop(server.REPLICA_BIND, None)
+
+
+def replicate(server, flask_app, paths):
+    """Copy the primary over the replica, as streaming replication eventually would"""
+    _, primary, replica = paths
+    with flask_app.app_context():
+        server.db.engines[server.REPLICA_BIND].dispose()
+    source, target = sqlite3.connect(primary), sqlite3.connect(replica)
+    source.backup(target)
+    source.close()
+    target.close()
+
+
+def test_get_requests_read_from_the_replica(server, flask_app, client, headers, paths):
+    response = client.post('/api/entities', json={'name': 'Routed'}, headers=headers)
+    assert response.status_code == 201
+    entity_id = response.json['id']
+
+    # The write went to the primary; the replica hasn't caught up yet
+    assert client.get(f'/api/entities/{entity_id}', headers=headers).status_code == 404
+    changes = client.get('/api/changes?since=0', headers=headers).json['changes']
+    assert [change['id'] for change in changes if change['type'] == 'entity'] == [entity_id]
+
+    replicate(server, flask_app, paths)
+    response = client.get(f'/api/entities/{entity_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.json['name'] == 'Routed'
+
+
+def test_writes_and_their_reads_use_the_primary(server, flask_app, client, headers, paths):
+    entity_id = client.post('/api/entities', json={'name': 'Before'}, headers=headers).json['id']
+    replicate(server, flask_app, paths)
+    # The update loads the row it changes from the primary, where it is current
+    with flask_app.app_context():
+        server.db.session.execute(sa.text("UPDATE entity SET name = 'Primary only' WHERE id = :id"), {'id': entity_id})
+        server.db.session.commit()
+    response = client.put(f'/api/entities/{entity_id}', json={'description': 'Edited'}, headers=headers)
+    assert response.status_code == 200
+    assert response.json['name'] == 'Primary only'
+
+
+def test_metrics_report_both_pools(server, client, headers):
+    client.get('/api/entities', headers=headers)
+    body = client.get('/api/metrics').get_data(as_text=True)
+    for pool in ('primary', server.REPLICA_BIND):
+        assert f'db_pool_checkout_seconds_count{{pool="{pool}"}}' in body
+        assert f'db_pool_connections{{pool="{pool}",state="idle"}}' in body
+        assert f'db_pool_max_connections{{pool="{pool}"}} {server.DB_POOL_SIZE + server.DB_MAX_OVERFLOW}' in body
+
+
+def test_pool_counts_timeouts_and_connections(server, paths):
+    _, primary, _ = paths
+    url = f'sqlite:///{primary}'
+    engine = sa.create_engine(url, **{**server.engine_options(url, 'tiny'),
+                                      'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 0.05})
+
+    def value(metric, **labels):
+        return metric.values.get(metric.key(labels), 0)
+
+    connects = value(server.POOL_CONNECTS, pool='tiny')
+    timeouts = value(server.POOL_TIMEOUTS, pool='tiny')
+    with engine.connect():
+        with pytest.raises(sa.exc.TimeoutError):
+            engine.connect()
+    assert value(server.POOL_TIMEOUTS, pool='tiny') == timeouts + 1
+    assert value(server.POOL_CONNECTS, pool='tiny') == connects + 1
+
+    # dispose() replaces the pool; the new one keeps the label and counts each connection once
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert engine.pool.label == 'tiny'
+    assert value(server.POOL_CONNECTS, pool='tiny') == connects + 2
+    engine.dispose()
@@ -0,0 +1,79 @@
+"""Document downloads: byte ranges, revalidation and proxy offload:
+    python -m pytest test_document_download.py
+"""
+import io
+
+import pytest
+
+CONTENT = b'0123456789' * 100
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+@pytest.fixture(scope='module')
+def document_id(client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Downloads'}, headers=headers).json['id']
+    response = client.post(f'/api/entities/{entity_id}/documents', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(CONTENT), 'digits.txt'), 'title': 'Digits'})
+    assert response.status_code == 201, response.data
+    return response.json['id']
+
+
+def test_full_download_carries_validators(client, headers, document_id):
+    response = client.get(f'/api/documents/{document_id}/download', headers=headers)
+    assert response.status_code == 200
+    assert response.get_data() == CONTENT
+    assert response.headers['Content-Disposition'] == 'attachment; filename=digits.txt'
+    assert response.headers['ETag']
+    assert 'private' in response.headers['Cache-Control']
+
+
+def test_range_answers_206_with_the_requested_bytes(client, headers, document_id):
+    response = client.get(f'/api/documents/{document_id}/download', headers={**headers, 'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.get_data() == CONTENT[10:20]
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(CONTENT)}'
+
+    response = client.get(f'/api/documents/{document_id}/download', headers={**headers, 'Range': 'bytes=-5'})
+    assert response.status_code == 206
+    assert response.get_data() == CONTENT[-5:]
+
+    response = client.get(f'/api/documents/{document_id}/download', headers={**headers, 'Range': 'bytes=5000-'})
+    assert response.status_code == 416
+
+
+def test_if_none_match_answers_304(client, headers, document_id):
+    url = f'/api/documents/{document_id}/view'
+    etag = client.get(url, headers=headers).headers['ETag']
+    response = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert client.get(url, headers={**headers, 'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_x_accel_redirect_hands_the_file_to_the_proxy(server, flask_app, client, headers, document_id, monkeypatch):
+    monkeypatch.setattr(server, 'DOCUMENT_SENDFILE_MODE', 'x-accel-redirect')
+    with flask_app.app_context():
+        file_path = server.db.session.get(server.Document, document_id).file_path
+
+    response = client.get(f'/api/documents/{document_id}/download', headers=headers)
+    assert response.status_code == 200
+    assert response.get_data() == b''
+    relative = file_path[len(server.UPLOAD_FOLDER):].lstrip('/')
+    assert response.headers['X-Accel-Redirect'] == '/protected-uploads/' + relative
+    assert response.headers['Content-Disposition'] == 'attachment; filename=digits.txt'
+    assert response.mimetype == 'text/plain'
+    etag = response.headers['ETag']
+
+    # Revalidation is answered here, without sending the proxy after the file
+    response = client.get(f'/api/documents/{document_id}/view', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert 'X-Accel-Redirect' not in response.headers
+
+
+def test_missing_documents_are_404(client, headers):
+    assert client.get('/api/documents/999999/download', headers=headers).status_code == 404
@@ -0,0 +1,104 @@
+"""Entity deletion through the database's ON DELETE CASCADE, and the cleanup jobs it queues:
+    python -m pytest test_entity_delete.py
+"""
+import io
+import os
+import time
+
+import pytest
+
+SMALL, LARGE = 3, 40
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_extraction(server, module_monkeypatch):
+    # Uploaded documents stay pending; the cleanup jobs still run
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+def upload(client, headers, entity_id, content):
+    response = client.post(f'/api/entities/{entity_id}/documents', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(content), 'statement.pdf')})
+    assert response.status_code == 201, response.data
+    return response.json
+
+
+def seed_entity(client, headers, name, size):
+    entity_id = client.post('/api/entities', json={'name': name}, headers=headers).json['id']
+    assert client.post(f'/api/entities/{entity_id}/accounts:batch', headers=headers, json={
+        'items': [{'account_name': f'Account {i}', 'balance': 100} for i in range(size)]
+    }).status_code == 201
+    assert client.post(f'/api/entities/{entity_id}/tasks:batch', headers=headers, json={
+        'items': [{'title': f'Task {i}', 'dependencies': [f'Task {i - 1}'] if i else []} for i in range(size)]
+    }).status_code == 201
+    for i in range(size):
+        upload(client, headers, entity_id, f'{name} document {i}'.encode())
+    return entity_id
+
+
+def rows(server, model, **filters):
+    return server.db.session.scalar(server.db.select(server.db.func.count()).select_from(model).filter_by(**filters))
+
+
+def test_delete_takes_the_same_statements_for_any_size(server, flask_app, client, headers):
+    counts = []
+    for size in (SMALL, LARGE):
+        entity_id = seed_entity(client, headers, f'Entity {size}', size)
+        with server.query_budget(10) as profile:
+            response = client.delete(f'/api/entities/{entity_id}', headers=headers)
+        assert response.status_code == 204
+        counts.append(profile.queries)
+
+        with flask_app.app_context():
+            for model in (server.Account, server.Task, server.Document, server.TaskDependency,
+                          server.EntityRollup, server.TaskRollup, server.SearchIndex):
+                assert rows(server, model, entity_id=entity_id) == 0, model.__name__
+            assert rows(server, server.DocumentText) == rows(server, server.Document)
+    assert counts[0] == counts[1]
+    assert client.delete(f'/api/entities/{entity_id}', headers=headers).status_code == 404
+
+
+def test_delete_logs_a_tombstone_for_every_child(server, client, headers):
+    entity_id = seed_entity(client, headers, 'Synced', SMALL)
+    detail = client.get(f'/api/entities/{entity_id}', headers=headers).json
+    cursor = client.get('/api/changes?since=0&limit=5000', headers=headers).json['next_cursor']
+
+    assert client.delete(f'/api/entities/{entity_id}', headers=headers).status_code == 204
+    changes = client.get(f'/api/changes?since={cursor}', headers=headers).json['changes']
+    assert {(change['type'], change['id']) for change in changes if change['op'] == 'delete'} == {
+        ('entity', entity_id),
+        *(('account', account['id']) for account in detail['accounts']),
+        *(('task', task['id']) for task in detail['tasks']),
+        *(('document', document['id']) for document in detail['documents']),
+    }
+    assert client.get(f'/api/entities/{entity_id}/tasks', headers=headers).status_code == 404
+
+
+def test_cleanup_jobs_remove_only_unreferenced_files(server, flask_app, client, headers):
+    doomed = client.post('/api/entities', json={'name': 'Doomed'}, headers=headers).json['id']
+    survivor = client.post('/api/entities', json={'name': 'Survivor'}, headers=headers).json['id']
+    shared = upload(client, headers, doomed, b'shared content')
+    upload(client, headers, doomed, b'shared content')
+    kept = upload(client, headers, survivor, b'shared content')
+    unique = upload(client, headers, doomed, b'unique content')
+    staged = client.post(f'/api/entities/{doomed}/uploads', headers=headers, json={
+        'filename': 'large.pdf', 'size': 10, 'sha256': '0' * 64}).json['upload_id']
+    with open(server.staging_path(staged), 'wb') as f:
+        f.write(b'partial')
+
+    assert client.delete(f'/api/entities/{doomed}', headers=headers).status_code == 204
+    deadline = time.monotonic() + 5
+    while (os.path.exists(unique['file_path']) or os.path.exists(server.staging_path(staged))) \
+            and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(unique['file_path'])
+    assert not os.path.exists(server.staging_path(staged))
+    assert os.path.exists(shared['file_path'])
+
+    with flask_app.app_context():
+        blobs = {blob.file_path: blob.ref_count for blob in server.Blob.query.all()}
+    assert blobs[shared['file_path']] == 1
+    assert unique['file_path'] not in blobs
+    response = client.get(f"/api/documents/{kept['id']}/download", headers=headers)
+    assert response.status_code == 200
+    assert response.get_data() == b'shared content'
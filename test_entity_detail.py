@@ -0,0 +1,59 @@
+"""GET /api/entities/<id> and its embedded collections, loaded in one query:
+    python -m pytest test_entity_detail.py
+"""
+import io
+
+import pytest
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+@pytest.fixture(scope='module')
+def entity_id(client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Detailed', 'ein': '12-3456789'}, headers=headers).json['id']
+    client.post(f'/api/entities/{entity_id}/accounts:batch', headers=headers, json={
+        'items': [{'account_name': f'Account {n}', 'balance': n * 10.5} for n in range(3)]})
+    client.post(f'/api/entities/{entity_id}/tasks:batch', headers=headers, json={
+        'items': [{'title': 'Plan', 'due_date': '2030-01-31'}, {'title': 'File', 'dependencies': ['Plan']}]})
+    client.post(f'/api/entities/{entity_id}/documents', headers=headers, content_type='multipart/form-data',
+                data={'file': (io.BytesIO(b'detail'), 'detail.txt'), 'title': 'Detail'})
+    # Another entity's rows must not leak in
+    other = client.post('/api/entities', json={'name': 'Other'}, headers=headers).json['id']
+    client.post(f'/api/entities/{other}/accounts', json={'account_name': 'Elsewhere'}, headers=headers)
+    return entity_id
+
+
+def test_collections_match_the_list_endpoints(client, headers, entity_id):
+    detail = client.get(f'/api/entities/{entity_id}', headers=headers).json
+    assert (detail['name'], detail['ein']) == ('Detailed', '12-3456789')
+    assert detail['has_more'] == {'accounts': False, 'tasks': False, 'documents': False}
+    for name in ('accounts', 'tasks', 'documents'):
+        assert detail[name] == client.get(f'/api/entities/{entity_id}/{name}', headers=headers).json
+    assert [account['balance'] for account in detail['accounts']] == [0.0, 10.5, 21.0]
+    assert detail['tasks'][0]['due_date'] == '2030-01-31'
+    assert detail['tasks'][1]['dependencies'] == ['Plan']
+
+
+def test_include_and_limits_pick_and_truncate_collections(client, headers, entity_id):
+    detail = client.get(f'/api/entities/{entity_id}?include=tasks,accounts&accounts_limit=2', headers=headers).json
+    assert 'documents' not in detail
+    assert [account['account_name'] for account in detail['accounts']] == ['Account 0', 'Account 1']
+    assert detail['has_more'] == {'accounts': True, 'tasks': False}
+
+    detail = client.get(f'/api/entities/{entity_id}?include=&limit=0', headers=headers).json
+    assert detail['has_more'] == {}
+    assert detail['name'] == 'Detailed'
+
+    detail = client.get(f'/api/entities/{entity_id}?limit=0', headers=headers).json
+    assert (detail['accounts'], detail['tasks'], detail['documents']) == ([], [], [])
+    assert detail['has_more'] == {'accounts': True, 'tasks': True, 'documents': True}
+
+
+def test_bad_parameters_and_missing_entities(client, headers, entity_id):
+    assert client.get(f'/api/entities/{entity_id}?include=secrets', headers=headers).status_code == 400
+    assert client.get(f'/api/entities/{entity_id}?limit=all', headers=headers).status_code == 400
+    assert client.get('/api/entities/999999', headers=headers).status_code == 404
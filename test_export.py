@@ -0,0 +1,91 @@
+"""The streamed portfolio export, GET /api/export:
+    python -m pytest test_export.py
+"""
+import csv
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+    # Small batches, so the streams span several partitions and chunks
+    module_monkeypatch.setattr(server, 'EXPORT_BATCH_SIZE', 2)
+
+
+@pytest.fixture(scope='module')
+def entity_ids(client, headers):
+    first, empty, last = (client.post('/api/entities', json={'name': name}, headers=headers).json['id']
+                          for name in ('First', 'Empty', 'Last'))
+    # Children created out of entity order, so grouping cannot lean on insertion order
+    for entity_id, name in ((last, 'Last 1'), (first, 'First 1'), (last, 'Last 2'), (first, 'First 2'),
+                            (first, 'First 3')):
+        client.post(f'/api/entities/{entity_id}/accounts', json={'account_name': name}, headers=headers)
+    client.post(f'/api/entities/{last}/tasks', json={'title': 'Close', 'dependencies': ['Open']}, headers=headers)
+    client.post(f'/api/entities/{first}/documents', headers=headers, content_type='multipart/form-data',
+                data={'file': (io.BytesIO(b'exported'), 'exported.txt'), 'title': 'Exported'})
+    return first, empty, last
+
+
+def export(client, headers, **params):
+    response = client.get('/api/export', headers=headers, query_string=params)
+    assert response.status_code == 200, response.data
+    return response
+
+
+def test_ndjson_nests_each_entitys_children_in_order(client, headers, entity_ids):
+    first, empty, last = entity_ids
+    response = export(client, headers)
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=portfolio.ndjson'
+    entities = [json.loads(line) for line in response.get_data().splitlines()]
+
+    assert [entity['id'] for entity in entities] == [first, empty, last]
+    names = {entity['id']: [account['account_name'] for account in entity['accounts']] for entity in entities}
+    assert names == {first: ['First 1', 'First 2', 'First 3'], empty: [], last: ['Last 1', 'Last 2']}
+    assert [task['dependencies'] for task in entities[2]['tasks']] == [['Open']]
+    assert [document['title'] for document in entities[0]['documents']] == ['Exported']
+    assert entities[1]['tasks'] == entities[1]['documents'] == []
+    # Each line has the GET /api/entities/<id> fields for the entity and its children
+    detail = client.get(f'/api/entities/{first}', headers=headers).json
+    assert entities[0]['accounts'] == detail['accounts']
+    assert entities[0]['name'] == detail['name']
+
+
+def test_ndjson_for_one_resource_is_flat_and_ordered_by_id(client, headers, entity_ids):
+    accounts = [json.loads(line) for line in export(client, headers, resource='accounts').get_data().splitlines()]
+    assert [account['account_name'] for account in accounts] == ['Last 1', 'First 1', 'Last 2', 'First 2', 'First 3']
+    assert all('accounts' not in account for account in accounts)
+
+
+def test_csv_escapes_delimiters_quotes_and_newlines(client, headers, entity_ids):
+    first = entity_ids[0]
+    awkward = 'Savings, "joint"\nsecond line'
+    client.post(f'/api/entities/{first}/accounts', json={'account_name': awkward, 'notes': 'a,b'}, headers=headers)
+
+    response = export(client, headers, format='csv', resource='accounts')
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=accounts.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['account_name'] for row in rows] == ['Last 1', 'First 1', 'Last 2', 'First 2', 'First 3', awkward]
+    assert rows[-1]['notes'] == 'a,b'
+    assert rows[-1]['entity_id'] == str(first)
+
+    # Lists are written as JSON in their cell
+    rows = list(csv.DictReader(io.StringIO(export(client, headers, format='csv', resource='tasks').get_data(True))))
+    assert json.loads(rows[0]['dependencies']) == ['Open']
+
+
+def test_csv_defaults_to_entities(client, headers, entity_ids):
+    response = export(client, headers, format='csv')
+    assert response.headers['Content-Disposition'] == 'attachment; filename=entities.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [int(row['id']) for row in rows] == list(entity_ids)
+
+
+@pytest.mark.parametrize('params', [{'format': 'xlsx'}, {'resource': 'users'}])
+def test_unknown_formats_and_resources_are_rejected(client, headers, params):
+    assert client.get('/api/export', headers=headers, query_string=params).status_code == 400
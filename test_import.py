@@ -0,0 +1,94 @@
+"""Spreadsheet upserts through POST /api/import/<resource>:
+    python -m pytest test_import.py
+"""
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+def import_csv(client, headers, resource, text):
+    response = client.post(f'/api/import/{resource}', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(text.encode()), f'{resource}.csv')})
+    assert response.status_code == 200, response.data
+    events = [json.loads(line) for line in response.get_data().splitlines()]
+    assert events[-1]['event'] == 'complete'
+    return events[-1]
+
+
+def counts(summary):
+    return {key: summary[key] for key in ('rows', 'inserted', 'updated', 'failed')}
+
+
+def test_entities_upsert_by_ein(client, headers):
+    summary = import_csv(client, headers, 'entities', 'Name,EIN,Status\nHoldings,11-1111111,active\nVentures,22-2222222,active\n')
+    assert counts(summary) == {'rows': 2, 'inserted': 2, 'updated': 0, 'failed': 0}
+
+    summary = import_csv(client, headers, 'entities', 'name,ein,status\nHoldings LLC,11-1111111,active\nNew Co,33-3333333,\n')
+    assert counts(summary) == {'rows': 2, 'inserted': 1, 'updated': 1, 'failed': 0}
+    entities = client.get('/api/entities?limit=200', headers=headers).json['entities']
+    by_ein = {entity['ein']: entity['name'] for entity in entities if entity['ein']}
+    assert by_ein == {'11-1111111': 'Holdings LLC', '22-2222222': 'Ventures', '33-3333333': 'New Co'}
+
+
+def test_rows_that_change_nothing_are_not_counted_as_updated(client, headers):
+    text = 'name,ein,description\nUnchanged,44-4444444,Same every time\n'
+    assert counts(import_csv(client, headers, 'entities', text))['inserted'] == 1
+    entity = next(entity for entity in client.get('/api/entities?limit=200', headers=headers).json['entities']
+                  if entity['ein'] == '44-4444444')
+
+    assert counts(import_csv(client, headers, 'entities', text)) == {'rows': 1, 'inserted': 0, 'updated': 0, 'failed': 0}
+    # Not written either: the entity keeps its version
+    assert client.get(f"/api/entities/{entity['id']}", headers=headers).json['version'] == entity['version']
+
+    summary = import_csv(client, headers, 'entities', 'name,ein,description\nUnchanged,44-4444444,Edited\n')
+    assert summary['updated'] == 1
+
+
+def test_accounts_find_their_entity_by_ein_and_parse_money(client, headers):
+    text = ('entity_ein,account_name,account_number,balance\n'
+            '11-1111111,Operating,1001,"$1,000.50"\n'
+            '22-2222222,Reserve,2001,250\n')
+    assert counts(import_csv(client, headers, 'accounts', text)) == {'rows': 2, 'inserted': 2, 'updated': 0, 'failed': 0}
+    entities = {entity['ein']: entity['id']
+                for entity in client.get('/api/entities?limit=200', headers=headers).json['entities']}
+    accounts = client.get(f"/api/entities/{entities['11-1111111']}/accounts", headers=headers).json
+    assert [(account['account_name'], account['balance']) for account in accounts] == [('Operating', 1000.5)]
+
+    # Matched on entity + account_number; the unchanged Reserve row is skipped
+    text = text.replace('"$1,000.50"', '"$2,500"')
+    assert counts(import_csv(client, headers, 'accounts', text)) == {'rows': 2, 'inserted': 0, 'updated': 1, 'failed': 0}
+    accounts = client.get(f"/api/entities/{entities['11-1111111']}/accounts", headers=headers).json
+    assert [account['balance'] for account in accounts] == [2500.0]
+
+
+def test_bad_rows_are_reported_and_the_rest_imported(client, headers):
+    text = ('entity_ein,account_name,account_number,balance,id\n'
+            '11-1111111,Good,1002,10,\n'
+            '99-9999999,Orphan,9001,10,\n'
+            '11-1111111,Bad balance,1003,lots,\n'
+            '11-1111111,,1004,10,\n'
+            ',Ghost,,,999999\n')
+    summary = import_csv(client, headers, 'accounts', text)
+    assert counts(summary) == {'rows': 5, 'inserted': 1, 'updated': 0, 'failed': 4}
+    errors = {error['row']: error['error'] for error in summary['errors']}
+    assert sorted(errors) == [3, 4, 5, 6]
+    assert errors[3].startswith('Unknown entity')
+    assert errors[4].startswith('Invalid value')
+    assert errors[5] == 'Missing required fields: account_name'
+    assert errors[6] == 'Account 999999 not found'
+
+
+def test_unknown_resources_and_files_are_rejected(client, headers):
+    response = client.post('/api/import/documents', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(b'title\nx\n'), 'documents.csv')})
+    assert response.status_code == 400
+    response = client.post('/api/import/entities', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(b'name\nx\n'), 'entities.txt')})
+    assert response.status_code == 400
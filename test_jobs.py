@@ -0,0 +1,223 @@
+"""The background job queue, with the worker threads off so each test runs jobs itself:
+    python -m pytest test_jobs.py
+"""
+import io
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+@pytest.fixture
+def context(server, flask_app):
+    with flask_app.app_context():
+        yield
+        # Leave no due jobs behind for the next test
+        server.Job.query.delete()
+        server.db.session.commit()
+
+
+def enqueue(server, kind, payload=None, **kwargs):
+    job, created = server.enqueue_job(kind, payload, **kwargs)
+    server.db.session.commit()
+    return job.id
+
+
+def make_due(server, job_id):
+    server.db.session.get(server.Job, job_id).run_at = datetime.utcnow()
+    server.db.session.commit()
+
+
+def run_all(server):
+    while server.run_next_job():
+        pass
+
+
+def test_failed_attempts_back_off_and_give_up(server, context, monkeypatch):
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        if len(calls) < 3:
+            raise ValueError(f'attempt {len(calls)} failed')
+        return {'calls': len(calls)}
+
+    monkeypatch.setitem(server.JOB_HANDLERS, 'flaky', flaky)
+    job_id = enqueue(server, 'flaky', {'n': 1}, max_attempts=3)
+
+    previous_delay = timedelta(0)
+    for attempt in (1, 2):
+        assert server.run_next_job()
+        job = server.db.session.get(server.Job, job_id)
+        assert (job.status, job.attempts, job.error) == ('queued', attempt, f'ValueError: attempt {attempt} failed')
+        delay = job.run_at - datetime.utcnow()
+        assert delay > previous_delay
+        previous_delay = delay
+        # Not due until its backoff has passed
+        assert not server.run_next_job()
+        make_due(server, job_id)
+
+    assert server.run_next_job()
+    job = server.db.session.get(server.Job, job_id)
+    assert (job.status, job.attempts, job.error) == ('succeeded', 3, None)
+    assert job.to_dict()['result'] == {'calls': 3}
+
+    monkeypatch.setitem(server.JOB_HANDLERS, 'broken', lambda payload: 1 / 0)
+    job_id = enqueue(server, 'broken', max_attempts=1)
+    assert server.run_next_job()
+    job = server.db.session.get(server.Job, job_id)
+    assert job.status == 'failed'
+    assert job.error.startswith('ZeroDivisionError')
+    assert job.finished_at is not None
+
+
+def test_higher_priority_runs_first(server, context, monkeypatch):
+    order = []
+    monkeypatch.setitem(server.JOB_HANDLERS, 'record', lambda payload: order.append(payload['name']))
+    enqueue(server, 'record', {'name': 'low'}, priority=server.JOB_PRIORITY_LOW)
+    enqueue(server, 'record', {'name': 'normal'})
+    enqueue(server, 'record', {'name': 'high'}, priority=server.JOB_PRIORITY_HIGH)
+    enqueue(server, 'record', {'name': 'normal, later'})
+    run_all(server)
+    assert order == ['high', 'normal', 'normal, later', 'low']
+
+
+def test_idempotency_key_returns_the_existing_job(server, context):
+    first, created = server.enqueue_job('remove_files', {'paths': []}, idempotency_key='cleanup-1')
+    server.db.session.commit()
+    assert created
+    again, created = server.enqueue_job('remove_files', {'paths': ['other']}, idempotency_key='cleanup-1')
+    assert not created
+    assert again.id == first.id
+    assert server.Job.query.count() == 1
+
+
+def test_expired_lease_is_claimed_again(server, context, monkeypatch):
+    monkeypatch.setitem(server.JOB_HANDLERS, 'noop', lambda payload: 'done')
+    retried = enqueue(server, 'noop', max_attempts=2)
+    abandoned = enqueue(server, 'noop', max_attempts=1)
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    # Both were claimed by a worker that died mid-run
+    for job_id in (retried, abandoned):
+        job = server.db.session.get(server.Job, job_id)
+        job.status, job.attempts, job.locked_until = 'running', 1, expired
+    server.db.session.commit()
+
+    run_all(server)
+    assert server.db.session.get(server.Job, retried).status == 'succeeded'
+    job = server.db.session.get(server.Job, abandoned)
+    assert job.status == 'failed'
+    assert 'lease' in job.error
+
+
+def test_async_import_returns_202_and_reports_through_the_job(server, flask_app, client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Imported into'}, headers=headers).json['id']
+    csv = f'entity_id,account_name,account_number\n{entity_id},Checking,0001\n{entity_id},Savings,0002\n'
+    request_headers = {**headers, 'Prefer': 'respond-async', 'Idempotency-Key': 'import-1'}
+
+    def post():
+        return client.post('/api/import/accounts', headers=request_headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(csv.encode()), 'accounts.csv')})
+
+    response = post()
+    assert response.status_code == 202, response.data
+    job_id = response.json['id']
+    assert response.headers['Location'] == f'/api/jobs/{job_id}'
+    assert response.json['status'] == 'queued'
+    # A retried request gets the same job instead of importing twice
+    assert post().json['id'] == job_id
+    assert os.listdir(server.UPLOAD_TEMP_FOLDER) != []
+
+    with flask_app.app_context():
+        run_all(server)
+    job = client.get(f'/api/jobs/{job_id}', headers=headers).json
+    assert job['status'] == 'succeeded'
+    assert (job['result']['inserted'], job['result']['failed']) == (2, 0)
+    assert len(client.get(f'/api/entities/{entity_id}/accounts', headers=headers).json) == 2
+    assert os.listdir(server.UPLOAD_TEMP_FOLDER) == []
+    assert client.get('/api/jobs/999999', headers=headers).status_code == 404
+
+
+def test_document_delete_leaves_the_file_to_a_job(server, flask_app, client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Documents'}, headers=headers).json['id']
+    document = client.post(f'/api/entities/{entity_id}/documents', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(b'to be deleted'), 'statement.pdf')}).json
+
+    assert client.delete(f"/api/documents/{document['id']}", headers=headers).status_code == 204
+    assert os.path.exists(document['file_path'])
+    with flask_app.app_context():
+        assert [job.kind for job in server.Job.query.filter_by(status='queued')] == ['sweep_blobs']
+        run_all(server)
+    assert not os.path.exists(document['file_path'])
+
+
+def test_upload_during_a_blob_sweep_keeps_its_file(server, flask_app, client, headers, monkeypatch):
+    entity_id = client.post('/api/entities', json={'name': 'Sweep race'}, headers=headers).json['id']
+
+    def upload():
+        response = client.post(f'/api/entities/{entity_id}/documents', headers=headers, content_type='multipart/form-data',
+                               data={'file': (io.BytesIO(b'swept and uploaded again'), 'statement.pdf')})
+        assert response.status_code == 201, response.data
+        return response.json
+
+    document = upload()
+    assert client.delete(f"/api/documents/{document['id']}", headers=headers).status_code == 204
+
+    unlinking = threading.Event()
+    remove_file = server.remove_file
+
+    def slow_remove_file(path):
+        unlinking.set()
+        time.sleep(0.3)
+        return remove_file(path)
+
+    def sweep():
+        with flask_app.app_context():
+            server.sweep_blobs()
+
+    monkeypatch.setattr(server, 'remove_file', slow_remove_file)
+    sweeper = threading.Thread(target=sweep)
+    sweeper.start()
+    assert unlinking.wait(5)
+    # Uploaded while the sweep is between deleting the row and unlinking the file
+    again = upload()
+    sweeper.join()
+
+    assert os.path.exists(again['file_path'])
+    response = client.get(f"/api/documents/{again['id']}/download", headers=headers)
+    assert response.status_code == 200
+    assert response.get_data() == b'swept and uploaded again'
+
+
+def test_extraction_fills_document_text_from_a_job_thread(server, flask_app, client, headers, monkeypatch):
+    monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 1)
+    entity_id = client.post('/api/entities', json={'name': 'Extracted'}, headers=headers).json['id']
+    document_id = client.post(f'/api/entities/{entity_id}/documents', headers=headers, content_type='multipart/form-data',
+                              data={'file': (io.BytesIO(b'Quarterly estimated payment'), 'notes.txt')}).json['id']
+    assert client.get(f'/api/documents/{document_id}/text', headers=headers).json['status'] == 'pending'
+
+    def work():
+        with flask_app.app_context():
+            run_all(server)
+
+    # The pool starts from a job thread, the way the worker threads use it
+    worker = threading.Thread(target=work)
+    try:
+        worker.start()
+        worker.join(timeout=60)
+    finally:
+        if server._extraction_pool is not None:
+            server._extraction_pool.shutdown()
+            server._extraction_pool = None
+    assert not worker.is_alive()
+    text = client.get(f'/api/documents/{document_id}/text', headers=headers).json
+    assert (text['status'], text['content']) == ('done', 'Quarterly estimated payment')
+    assert [result['id'] for result in client.get('/api/search?q=quarterly', headers=headers).json['results']] == [document_id]
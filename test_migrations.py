@@ -0,0 +1,169 @@
+"""The Alembic revisions in migrations/versions, run against throwaway SQLite databases:
+    python -m pytest test_migrations.py
+
+Whatever a database started as (a pre-migration deployment, a create_all()
+database that was never stamped), upgrading it must end with exactly the
+schema the models declare.
+"""
+import sqlite3
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+# SQLite can't reflect ix_entity_name_lower, so comparisons leave it out
+pytestmark = pytest.mark.filterwarnings('ignore:.*expression-based index')
+
+
+@pytest.fixture
+def make_app(server, tmp_path, monkeypatch):
+    # uploads/ is created relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+    def make_app(path):
+        return server.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    return make_app
+
+
+def schema_differences(server):
+    """What autogenerate would change to make the database match the models"""
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (type_ == 'table' and name.startswith('search_fts'))
+
+    with server.db.engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={'compare_type': True, 'include_object': include_object})
+        return compare_metadata(context, server.db.metadata)
+
+
+def current_revision(server):
+    with server.db.engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def test_schema_revision_is_the_head(server):
+    assert ScriptDirectory(server.MIGRATIONS_DIR).get_current_head() == server.SCHEMA_REVISION
+
+
+def test_upgrade_brings_a_legacy_database_up_to_date(server, make_app, tmp_path, monkeypatch):
+    import migration_ops
+    from flask_migrate import upgrade
+
+    # The tables as first deployed, before migrate_schema.py added columns to them
+    path = tmp_path / 'legacy.db'
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE entity (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, description TEXT,
+            created_at DATETIME);
+        CREATE TABLE account (id INTEGER NOT NULL PRIMARY KEY, entity_id INTEGER NOT NULL REFERENCES entity (id),
+            account_name VARCHAR(100) NOT NULL, account_number VARCHAR(50), balance FLOAT, account_type VARCHAR(50),
+            created_at DATETIME);
+        CREATE TABLE task (id INTEGER NOT NULL PRIMARY KEY, entity_id INTEGER NOT NULL REFERENCES entity (id),
+            title VARCHAR(200) NOT NULL, description TEXT, status VARCHAR(50), priority VARCHAR(50), due_date DATE,
+            created_at DATETIME);
+        CREATE TABLE document (id INTEGER NOT NULL PRIMARY KEY, entity_id INTEGER NOT NULL REFERENCES entity (id),
+            title VARCHAR(200) NOT NULL, file_path VARCHAR(500), document_type VARCHAR(100), uploaded_at DATETIME);
+        CREATE TABLE schema_version (version INTEGER PRIMARY KEY, applied_at DATETIME);
+    """)
+    connection.executemany("INSERT INTO entity (name, created_at) VALUES (?, '2024-01-01 00:00:00')",
+                           [(f'Entity {n}',) for n in range(12)])
+    connection.executemany("INSERT INTO account (entity_id, account_name, balance) VALUES (?, ?, ?)",
+                           [(1, 'Checking', 100.0), (1, 'Savings', 50.5), (2, 'Checking', None)])
+    connection.executemany("INSERT INTO task (entity_id, title, status, priority, due_date) VALUES (?, ?, ?, ?, ?)",
+                           [(1, 'File', 'pending', 'high', '2024-03-01'), (1, 'Pay', 'completed', 'high', '2024-03-01'),
+                            (1, 'Sign', None, None, '2024-03-01'), (3, 'Plan', 'pending', 'low', None)])
+    connection.executemany("INSERT INTO document (entity_id, title) VALUES (?, ?)", [(2, 'Deed'), (2, 'Lease')])
+    connection.commit()
+    connection.close()
+
+    # Small batches so the backfill has to walk several primary-key ranges
+    monkeypatch.setattr(migration_ops, 'BACKFILL_BATCH_SIZE', 5)
+    with make_app(path).app_context():
+        upgrade()
+        assert current_revision(server) == server.SCHEMA_REVISION
+        assert schema_differences(server) == []
+        rows = server.db.session.execute(server.db.text('SELECT updated_at, version, status FROM entity')).all()
+        assert len(rows) == 12
+        assert all(updated_at == '2024-01-01 00:00:00' and version == 1 for updated_at, version, status in rows)
+        # The dashboard rollups were seeded from the rows that predate them
+        execute = server.db.session.execute
+        assert sorted(execute(server.db.text('SELECT * FROM entity_rollup')).all()) == [
+            (1, 2, 150.5, 3, 0, 0), (2, 1, 0.0, 0, 2, 0), (3, 0, 0.0, 1, 0, 0)]
+        assert sorted(execute(server.db.text('SELECT * FROM task_rollup')).all()) == [
+            (1, '', '', 1), (1, 'completed', 'high', 1), (1, 'pending', 'high', 1), (3, 'pending', 'low', 1)]
+        assert execute(server.db.text('SELECT * FROM task_due_rollup')).all() == [(1, '2024-03-01', 2)]
+        # So were the search index and, on SQLite, its FTS5 table
+        assert execute(server.db.text('SELECT count(*) FROM search_index')).scalar() == 12 + 3 + 4 + 2
+        matches = execute(server.db.text(
+            "SELECT kind, record_id, label FROM search_index JOIN search_fts ON search_fts.rowid = search_index.id "
+            "WHERE search_fts MATCH 'checking' ORDER BY record_id")).all()
+        assert matches == [('account', 1, 'Checking'), ('account', 3, 'Checking')]
+        # Running it again finds nothing to do
+        upgrade()
+        assert schema_differences(server) == []
+
+
+def test_upgrade_accepts_an_unstamped_create_all_database(server, make_app, tmp_path):
+    from flask_migrate import downgrade, upgrade
+
+    with make_app(tmp_path / 'create_all.db').app_context():
+        server.db.create_all()
+        upgrade()
+        assert current_revision(server) == server.SCHEMA_REVISION
+        assert schema_differences(server) == []
+
+        downgrade(revision='0001')
+        assert schema_differences(server)
+        upgrade()
+        assert schema_differences(server) == []
+
+
+def test_revisions_build_an_empty_database_step_by_step(server, make_app, tmp_path):
+    from flask_migrate import upgrade
+
+    with make_app(tmp_path / 'empty.db').app_context():
+        # The baseline creates the tables it knew about, not the ones later revisions add
+        upgrade(revision='0001')
+        tables = set(server.db.inspect(server.db.engine).get_table_names())
+        assert {'entity', 'task_dependency', 'search_index', 'search_fts'} <= tables
+        assert 'job' not in tables
+        upgrade()
+        assert current_revision(server) == server.SCHEMA_REVISION
+        assert schema_differences(server) == []
+
+
+def test_upgrade_builds_edges_for_existing_task_dependencies(server, make_app, tmp_path):
+    from flask_migrate import upgrade
+
+    with make_app(tmp_path / 'dependencies.db').app_context():
+        upgrade(revision='0006')
+        execute = server.db.session.execute
+        execute(server.db.text("INSERT INTO entity (id, name) VALUES (1, 'One'), (2, 'Two')"))
+        insert = "INSERT INTO task (id, entity_id, title, dependencies) VALUES (:id, :entity_id, :title, :dependencies)"
+        execute(server.db.text(insert), [
+            {'id': 1, 'entity_id': 1, 'title': 'Gather', 'dependencies': None},
+            {'id': 2, 'entity_id': 1, 'title': 'File', 'dependencies': '["gather", "3", "Unknown"]'},
+            {'id': 3, 'entity_id': 1, 'title': 'Sign', 'dependencies': '[1]'},
+            # Closes the cycle 4 -> 5 -> 4, so only task 5 loses its edge
+            {'id': 4, 'entity_id': 2, 'title': 'Draft', 'dependencies': '"Review"'},
+            {'id': 5, 'entity_id': 2, 'title': 'Review', 'dependencies': '["Draft"]'},
+            {'id': 6, 'entity_id': 2, 'title': 'Broken', 'dependencies': 'not json'},
+        ])
+        server.db.session.commit()
+
+        upgrade()
+        assert current_revision(server) == server.SCHEMA_REVISION
+        assert sorted(execute(server.db.text('SELECT * FROM task_dependency')).all()) == [
+            (2, 1, 1), (2, 3, 1), (3, 1, 1), (4, 5, 2)]
+
+
+def test_run_migrations_stamps_a_new_database(server, tmp_path, monkeypatch):
+    import run_migrations
+
+    flask_app = server.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'new.db'}"})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_migrations, 'app', flask_app)
+    assert run_migrations.run_migrations()
+    with flask_app.app_context():
+        assert current_revision(server) == server.SCHEMA_REVISION
+        assert schema_differences(server) == []
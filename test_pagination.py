@@ -0,0 +1,75 @@
+"""Keyset pagination, filters and sorting of GET /api/entities:
+    python -m pytest test_pagination.py
+"""
+import pytest
+
+
+@pytest.fixture(scope='module')
+def entities(client, headers):
+    # Repeated names, so sorting by name has to fall back to the id to keep pages apart
+    names = ['Paged Delta', 'Paged alpha', 'Paged Charlie', 'Paged bravo', 'Paged alpha', 'Paged Echo', 'Paged bravo']
+    statuses = ['active', 'inactive']
+    return [client.post('/api/entities', headers=headers,
+                        json={'name': name, 'status': statuses[n % 2]}).json for n, name in enumerate(names)]
+
+
+def walk(client, headers, limit, **params):
+    """Every page of the query, as lists of entity ids"""
+    pages = []
+    params = {'name_prefix': 'paged', 'limit': limit, **params}
+    while True:
+        response = client.get('/api/entities', headers=headers, query_string=params)
+        assert response.status_code == 200, response.data
+        pages.append([entity['id'] for entity in response.json['entities']])
+        if response.json['next_cursor'] is None:
+            return pages
+        params['cursor'] = response.json['next_cursor']
+
+
+@pytest.mark.parametrize('sort', ['created_at', '-created_at', 'name', '-name'])
+def test_pages_cover_every_row_once_in_sort_order(client, headers, entities, sort):
+    key, descending = sort.lstrip('-'), sort.startswith('-')
+    if key == 'name':
+        expected = sorted(entities, key=lambda entity: (entity['name'], entity['id']), reverse=descending)
+    else:
+        expected = sorted(entities, key=lambda entity: entity['id'], reverse=descending)
+
+    pages = walk(client, headers, 3, sort=sort)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [entity_id for page in pages for entity_id in page] == [entity['id'] for entity in expected]
+
+
+def test_a_full_last_page_has_no_next_cursor(client, headers, entities):
+    assert [len(page) for page in walk(client, headers, len(entities))] == [len(entities)]
+
+
+def test_rows_written_between_pages_do_not_shift_the_next_page(client, headers, entities):
+    response = client.get('/api/entities', headers=headers,
+                          query_string={'name_prefix': 'paged', 'sort': 'name', 'limit': 2})
+    first_page = [entity['id'] for entity in response.json['entities']]
+    # Sorts before everything already paged past
+    inserted = client.post('/api/entities', headers=headers, json={'name': 'Paged Aardvark'}).json['id']
+    try:
+        rest = walk(client, headers, 10, sort='name', cursor=response.json['next_cursor'])
+        ids = first_page + [entity_id for page in rest for entity_id in page]
+        assert inserted not in ids
+        assert sorted(ids) == sorted(entity['id'] for entity in entities)
+    finally:
+        client.delete(f'/api/entities/{inserted}', headers=headers)
+
+
+def test_filters_combine_with_pagination(client, headers, entities):
+    active = [entity['id'] for entity in entities if entity['status'] == 'active']
+    pages = walk(client, headers, 2, status='active')
+    assert [entity_id for page in pages for entity_id in page] == active
+
+    response = client.get('/api/entities', headers=headers, query_string={'name_prefix': 'PAGED B', 'sort': 'name'})
+    assert [entity['name'] for entity in response.json['entities']] == ['Paged bravo', 'Paged bravo']
+    # LIKE wildcards in the prefix are matched literally
+    response = client.get('/api/entities', headers=headers, query_string={'name_prefix': 'Paged_'})
+    assert response.json['entities'] == []
+
+
+@pytest.mark.parametrize('params', [{'cursor': 'not a cursor'}, {'sort': 'status'}, {'limit': 'many'}])
+def test_bad_parameters_are_rejected(client, headers, entities, params):
+    assert client.get('/api/entities', headers=headers, query_string=params).status_code == 400
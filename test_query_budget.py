@@ -0,0 +1,83 @@
+"""Query budgets for the read endpoints.
+
+Runs the app against a throwaway SQLite database with Flask's test client:
+    python -m pytest test_query_budget.py
+
+Each endpoint must answer within a fixed number of statements no matter how
+many rows it returns, and never run the same SELECT twice (the N+1 pattern).
+"""
+
+import pytest
+
+SMALL, LARGE = 3, 40
+
+# Endpoint -> statements allowed per request
+ENDPOINT_BUDGETS = {
+    '/api/entities': 2,
+    '/api/entities/{entity_id}': 2,
+    '/api/entities/{entity_id}/accounts': 2,
+    '/api/entities/{entity_id}/tasks': 2,
+    '/api/entities/{entity_id}/documents': 2,
+    '/api/entities/{entity_id}/tasks/graph': 3,
+    '/api/dashboard': 3,
+    '/api/search?q=task': 1,
+    '/api/changes?since=0': 5,
+}
+
+
+def seed_entity(client, headers, size):
+    entity = client.post('/api/entities', json={'name': f'Entity {size}', 'ein': f'00-{size:07d}'}, headers=headers).json
+    entity_id = entity['id']
+    response = client.post(f'/api/entities/{entity_id}/accounts:batch', headers=headers, json={
+        'items': [{'account_name': f'Account {i}', 'balance': i * 100} for i in range(size)]
+    })
+    assert response.status_code == 201
+    response = client.post(f'/api/entities/{entity_id}/tasks:batch', headers=headers, json={
+        'items': [{'title': f'Task {i}', 'estimated_hours': 4, 'dependencies': [f'Task {i - 1}'] if i else []}
+                  for i in range(size)]
+    })
+    assert response.status_code == 201
+    return entity_id
+
+
+@pytest.fixture(scope='module')
+def entities(client, headers):
+    return {size: seed_entity(client, headers, size) for size in (SMALL, LARGE)}
+
+
+@pytest.mark.parametrize('path', list(ENDPOINT_BUDGETS))
+def test_endpoint_query_budget(server, client, headers, entities, path):
+    # Portfolio-wide endpoints see both entities at once; per-entity ones are compared across sizes
+    sizes = (SMALL, LARGE) if '{entity_id}' in path else (LARGE,)
+    counts = []
+    for size in sizes:
+        url = path.format(entity_id=entities[size])
+        with server.query_budget(ENDPOINT_BUDGETS[path], max_repeats=1) as profile:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.data
+        counts.append(profile.queries)
+    # A query count that grows with the data is an N+1 even inside the budget
+    assert len(set(counts)) == 1, f'{path} ran {counts[0]} queries for {SMALL} rows but {counts[-1]} for {LARGE}'
+
+
+def test_revalidation_skips_the_handler(server, client, headers, entities):
+    url = f'/api/entities/{entities[LARGE]}'
+    etag = client.get(url, headers=headers).headers['ETag']
+    with server.query_budget(1):
+        response = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_repeated_statements_exceed_budget(server, flask_app, entities):
+    with flask_app.app_context():
+        with pytest.raises(server.QueryBudgetExceeded, match='more than 1 times'):
+            with server.query_budget(100, max_repeats=1):
+                # Lazy-loading a relationship per row is the pattern the detector exists for
+                for entity in server.Entity.query.all():
+                    len(entity.accounts)
+
+
+def test_statement_fingerprint_ignores_parameters(server):
+    first = server.statement_fingerprint('SELECT id FROM task WHERE id IN (?, ?, ?) LIMIT 10')
+    second = server.statement_fingerprint('SELECT id\n FROM task WHERE id IN (%(id_1_1)s) LIMIT %(param_1)s')
+    assert first == second == 'SELECT id FROM task WHERE id IN (?) LIMIT ?'
@@ -0,0 +1,130 @@
+"""EXPLAIN every SELECT the main endpoints run and fail on full scans of large tables.
+
+Runs against a throwaway SQLite database by default:
+    python -m pytest test_query_plans.py
+
+Set PLAN_CHECK_DATABASE_URL to a scratch PostgreSQL database to check its
+planner instead. The seeded tables are small enough that PostgreSQL would
+rightly prefer sequential scans, so EXPLAIN runs with enable_seqscan off: the
+planner then only picks a Seq Scan when no index can serve the query.
+"""
+import io
+import os
+
+import pytest
+from sqlalchemy import event
+
+ENTITIES, ROWS_PER_ENTITY = 30, 40
+
+# Tables that grow with the portfolio; a full scan of one of these is a missing index
+LARGE_TABLES = {'entity', 'account', 'task', 'document', 'document_text', 'task_dependency',
+                'search_index', 'change_log', 'upload_session', 'user'}
+
+# Endpoint -> large tables it is expected to read in full
+PLAN_ENDPOINTS = {
+    ('GET', '/api/entities'): set(),
+    ('GET', '/api/entities?status=active&sort=name'): set(),
+    ('GET', '/api/entities/{entity_id}'): set(),
+    ('GET', '/api/entities/{entity_id}/accounts'): set(),
+    ('GET', '/api/entities/{entity_id}/tasks'): set(),
+    ('GET', '/api/entities/{entity_id}/tasks/graph'): set(),
+    ('GET', '/api/entities/{entity_id}/documents'): set(),
+    ('GET', '/api/accounts/{account_id}'): set(),
+    ('GET', '/api/tasks/{task_id}'): set(),
+    ('GET', '/api/search?q=seeded'): set(),
+    ('GET', '/api/changes?since=1'): set(),
+    # The dashboard summarizes every entity; its per-entity numbers come from the rollup tables
+    ('GET', '/api/dashboard'): {'entity'},
+    ('POST', '/api/auth/login'): set(),
+    ('POST', '/api/import/accounts'): set(),
+}
+
+
+@pytest.fixture(scope='module')
+def app_config():
+    url = os.getenv('PLAN_CHECK_DATABASE_URL')
+    return {'SQLALCHEMY_DATABASE_URI': url} if url else {}
+
+
+@pytest.fixture(scope='module')
+def seeded(server, flask_app, client):
+    client.post('/api/auth/register', json={'username': 'planner', 'email': 'planner@example.com', 'password': 'secret'})
+    token = client.post('/api/auth/login', json={'username': 'planner', 'password': 'secret'}).json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    ids = {}
+    for n in range(ENTITIES):
+        entity_id = client.post('/api/entities', json={'name': f'Seeded entity {n}', 'ein': f'00-{n:07d}'},
+                                headers=headers).json['id']
+        accounts = client.post(f'/api/entities/{entity_id}/accounts:batch', headers=headers, json={'items': [
+            {'account_name': f'Seeded account {i}', 'account_number': f'{n:04d}-{i:04d}'} for i in range(ROWS_PER_ENTITY)
+        ]}).json['results']
+        tasks = client.post(f'/api/entities/{entity_id}/tasks:batch', headers=headers, json={'items': [
+            {'title': f'Seeded task {i}', 'status': ('pending', 'completed')[i % 2], 'due_date': f'2030-01-{i % 28 + 1:02d}',
+             'dependencies': [f'Seeded task {i - 1}'] if i else []} for i in range(ROWS_PER_ENTITY)
+        ]}).json['results']
+        ids = {'entity_id': entity_id, 'account_id': accounts[0]['data']['id'], 'task_id': tasks[0]['data']['id']}
+
+    with flask_app.app_context():
+        with server.db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+    return headers, ids
+
+
+def full_scans(connection, statement, parameters):
+    """Tables the statement reads without an index, according to EXPLAIN"""
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+        nodes, scans = [plan[0]['Plan']], set()
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan':
+                scans.add(node['Relation Name'])
+            nodes.extend(node.get('Plans', ()))
+        return scans
+    # SQLite reports "SCAN <table>" for a full scan and "SCAN <table> USING [COVERING] INDEX ..." for an index walk
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return {row[-1].split()[1] for row in rows if row[-1].startswith('SCAN ') and ' USING ' not in row[-1]}
+
+
+@pytest.mark.parametrize('method,path', list(PLAN_ENDPOINTS))
+def test_endpoint_avoids_full_scans(server, flask_app, client, seeded, method, path):
+    headers, ids = seeded
+    url = path.format(**ids)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            statements.append((statement, parameters))
+
+    with flask_app.app_context():
+        engine = server.db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        if method == 'GET':
+            response = client.get(url, headers=headers)
+        elif url == '/api/auth/login':
+            response = client.post(url, json={'username': 'planner', 'password': 'secret'})
+        else:
+            csv = 'entity_id,account_name,account_number\n' + ''.join(
+                f"{ids['entity_id']},Imported {i},{i:04d}\n" for i in range(5))
+            response = client.post(url, headers=headers, content_type='multipart/form-data',
+                                   data={'file': (io.BytesIO(csv.encode()), 'accounts.csv')})
+            response.get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200, response.data
+    assert statements
+
+    allowed = PLAN_ENDPOINTS[(method, path)]
+    failures = []
+    with engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Price sequential scans out of the small seeded tables, so only unindexed reads remain;
+            # LOCAL ends with the transaction, before the connection goes back to the pool
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        for statement, parameters in statements:
+            scans = (full_scans(connection, statement, parameters) & LARGE_TABLES) - allowed
+            if scans:
+                failures.append(f"full scan of {', '.join(sorted(scans))}: {' '.join(statement.split())}")
+    assert not failures, '\n'.join(failures)
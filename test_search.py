@@ -0,0 +1,103 @@
+"""Ranked search over the index the write handlers keep, GET /api/search:
+    python -m pytest test_search.py
+"""
+import io
+
+import pytest
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+@pytest.fixture(scope='module')
+def entity_id(client, headers):
+    return client.post('/api/entities', json={'name': 'Harbor Holdings', 'description': 'Marina leases'},
+                       headers=headers).json['id']
+
+
+def search(client, headers, q, **params):
+    response = client.get('/api/search', headers=headers, query_string={'q': q, **params})
+    assert response.status_code == 200, response.data
+    return response.json
+
+
+def found(client, headers, q, **params):
+    return [(result['type'], result['id']) for result in search(client, headers, q, **params)['results']]
+
+
+def upload(client, headers, entity_id, title, filename):
+    response = client.post(f'/api/entities/{entity_id}/documents', headers=headers, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(b'scanned'), filename), 'title': title})
+    assert response.status_code == 201, response.data
+    return response.json['id']
+
+
+def test_words_match_as_prefixes_across_record_types(client, headers, entity_id):
+    account = client.post(f'/api/entities/{entity_id}/accounts', headers=headers,
+                          json={'account_name': 'Harbor operating', 'notes': 'Slip fees'}).json['id']
+    task = client.post(f'/api/entities/{entity_id}/tasks', headers=headers,
+                       json={'title': 'Renew marina permit', 'category': 'harbor'}).json['id']
+    client.post(f'/api/entities/{entity_id}/tasks', json={'title': 'Unrelated'}, headers=headers)
+
+    assert sorted(found(client, headers, 'harb')) == sorted([('entity', entity_id), ('account', account), ('task', task)])
+    # Every word has to match
+    assert found(client, headers, 'marina permit') == [('task', task)]
+    assert found(client, headers, 'slip') == [('account', account)]
+    assert found(client, headers, 'harbor', type='account') == [('account', account)]
+    # A title match outranks a match in the body
+    assert found(client, headers, 'harbor', type='entity,task') == [('entity', entity_id), ('task', task)]
+
+    result = search(client, headers, 'renew')['results'][0]
+    assert (result['entity_id'], result['label']) == (entity_id, 'Renew marina permit')
+    assert search(client, headers, 'nothingmatches') == {'results': [], 'next_offset': None}
+
+
+def test_pages_through_results(client, headers, entity_id):
+    for n in range(3):
+        client.post(f'/api/entities/{entity_id}/tasks', json={'title': f'Paged lookup {n}'}, headers=headers)
+    first = search(client, headers, 'lookup', limit=2)
+    assert (len(first['results']), first['next_offset']) == (2, 2)
+    rest = search(client, headers, 'lookup', limit=2, offset=2)
+    assert (len(rest['results']), rest['next_offset']) == (1, None)
+
+
+def test_updates_and_deletes_keep_the_index_current(client, headers, entity_id):
+    task = client.post(f'/api/entities/{entity_id}/tasks', json={'title': 'Audit ledger'}, headers=headers).json['id']
+    client.put(f'/api/tasks/{task}', json={'title': 'Review ledger'}, headers=headers)
+    assert found(client, headers, 'audit') == []
+    assert found(client, headers, 'review') == [('task', task)]
+
+    assert client.delete(f'/api/tasks/{task}', headers=headers).status_code == 204
+    assert found(client, headers, 'ledger') == []
+
+    document = upload(client, headers, entity_id, 'Lease agreement', 'lease.txt')
+    assert found(client, headers, 'lease agreement') == [('document', document)]
+    assert client.delete(f'/api/documents/{document}', headers=headers).status_code == 204
+    assert found(client, headers, 'agreement') == []
+
+    # Deleting an entity takes everything filed under it out of the index
+    other = client.post('/api/entities', json={'name': 'Quayside Trust'}, headers=headers).json['id']
+    client.post(f'/api/entities/{other}/accounts', json={'account_name': 'Quayside reserve'}, headers=headers)
+    assert len(found(client, headers, 'quayside')) == 2
+    assert client.delete(f'/api/entities/{other}', headers=headers).status_code == 204
+    assert found(client, headers, 'quayside') == []
+
+
+def test_documents_match_on_their_extracted_text(server, flask_app, client, headers, entity_id):
+    document = upload(client, headers, entity_id, 'Scan', 'scan.txt')
+    assert found(client, headers, 'indemnity') == []
+
+    # What the extract_text job stores once the worker returns
+    with flask_app.app_context():
+        server.save_extracted_text(document, 'done', 'The tenant shall provide indemnity insurance.', None)
+        server.db.session.commit()
+    assert found(client, headers, 'indemnity insur') == [('document', document)]
+    assert found(client, headers, 'scan.txt') == [('document', document)]
+
+
+@pytest.mark.parametrize('params', [{'q': ''}, {'q': '!!'}, {'q': 'x', 'type': 'user'}, {'q': 'x', 'limit': 'ten'}])
+def test_bad_queries_are_rejected(client, headers, params):
+    assert client.get('/api/search', headers=headers, query_string=params).status_code == 400
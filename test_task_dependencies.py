@@ -0,0 +1,62 @@
+"""Task dependencies as written through the task endpoints, and the graph built from them:
+    python -m pytest test_task_dependencies.py
+"""
+import pytest
+
+
+@pytest.fixture
+def tasks(client, headers):
+    entity_id = client.post('/api/entities', json={'name': 'Dependent'}, headers=headers).json['id']
+    response = client.post(f'/api/entities/{entity_id}/tasks:batch', headers=headers, json={'items': [
+        {'title': 'Gather', 'estimated_hours': 8},
+        {'title': 'File', 'estimated_hours': 4, 'dependencies': ['Gather']},
+    ]})
+    assert response.status_code == 201, response.data
+    gather, file = (result['data']['id'] for result in response.json['results'])
+    return entity_id, gather, file
+
+
+def graph(client, headers, entity_id):
+    response = client.get(f'/api/entities/{entity_id}/tasks/graph', headers=headers)
+    assert response.status_code == 200
+    return response.json
+
+
+def edges(server, flask_app, task_id):
+    with flask_app.app_context():
+        return server.db.session.scalars(
+            server.db.select(server.TaskDependency.depends_on_id).where(server.TaskDependency.task_id == task_id)).all()
+
+
+@pytest.mark.parametrize('cleared', [[], None])
+def test_update_can_remove_every_dependency(server, flask_app, client, headers, tasks, cleared):
+    entity_id, gather, file = tasks
+    assert edges(server, flask_app, file) == [gather]
+    assert graph(client, headers, entity_id)['critical_path'] == [gather, file]
+
+    response = client.put(f'/api/tasks/{file}', json={'dependencies': cleared}, headers=headers)
+    assert response.status_code == 200
+    assert response.json['dependencies'] is None
+    assert edges(server, flask_app, file) == []
+    plan = graph(client, headers, entity_id)
+    assert plan['project_finish'] == 8
+    assert [task['depends_on'] for task in plan['tasks']] == [[], []]
+
+
+def test_update_without_dependencies_keeps_them(server, flask_app, client, headers, tasks):
+    entity_id, gather, file = tasks
+    assert client.put(f'/api/tasks/{file}', json={'title': 'File return'}, headers=headers).status_code == 200
+    assert edges(server, flask_app, file) == [gather]
+
+
+def test_batch_update_can_remove_every_dependency(server, flask_app, client, headers, tasks):
+    entity_id, gather, file = tasks
+    response = client.patch('/api/tasks:batch', headers=headers, json={'items': [{'id': file, 'dependencies': []}]})
+    assert response.status_code == 200, response.data
+    assert edges(server, flask_app, file) == []
+    assert graph(client, headers, entity_id)['critical_path'] == [gather]
+
+    response = client.patch('/api/tasks:batch', headers=headers, json={'items': [{'id': gather, 'dependencies': [file]}]})
+    assert response.status_code == 200, response.data
+    assert edges(server, flask_app, gather) == [file]
+    assert graph(client, headers, entity_id)['order'] == [file, gather]
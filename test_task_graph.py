@@ -0,0 +1,113 @@
+"""The dependency graph algorithms in task_graph.py, on plain dicts with no app or database:
+    python -m pytest test_task_graph.py
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from task_graph import HOURS_PER_DAY, DependencyCycleError, find_cycle, schedule, topological_order
+
+ORIGIN = date(2026, 1, 5)
+
+
+def task(duration, start=None, due=None):
+    return {'duration': duration, 'start': start, 'due': due}
+
+
+def days(n):
+    return ORIGIN + timedelta(days=n)
+
+
+def test_find_cycle_returns_the_path_the_new_dependencies_would_close():
+    # 3 depends on 2, which depends on 1
+    graph = {2: {1}, 3: {2}}
+    assert find_cycle(graph, 1, [3]) == [1, 3, 2, 1]
+    assert find_cycle(graph, 1, [1]) == [1, 1]
+    assert find_cycle(graph, 4, [3, 2]) is None
+    assert find_cycle(graph, 3, [1]) is None
+    assert find_cycle({}, 1, []) is None
+    assert str(DependencyCycleError([1, 3, 2, 1])) == 'Dependency cycle: 1 -> 3 -> 2 -> 1'
+
+
+def test_find_cycle_ignores_shared_upstreams_it_already_explored():
+    # A diamond: 4 depends on 2 and 3, which both depend on 1
+    graph = {2: {1}, 3: {1}, 4: {2, 3}}
+    assert find_cycle(graph, 5, [2, 3, 4]) is None
+    assert find_cycle(graph, 1, [4]) in ([1, 4, 2, 1], [1, 4, 3, 1])
+
+
+def test_topological_order_breaks_ties_by_lowest_id():
+    order, blocked = topological_order([5, 3, 1, 4, 2], {1: {3}, 4: {5}})
+    assert order == [2, 3, 1, 5, 4]
+    assert blocked == []
+
+
+def test_topological_order_reports_tasks_on_or_behind_a_cycle():
+    # 1 and 2 depend on each other and 3 waits on them; 4 and the dependency on 99 are unaffected
+    order, blocked = topological_order([1, 2, 3, 4], {1: {2}, 2: {1}, 3: {1}, 4: {99}})
+    assert order == [4]
+    assert blocked == [1, 2, 3]
+
+
+def test_schedule_computes_slack_and_the_critical_path():
+    # 3 waits on 1 and 2; 4 is not connected to anything
+    tasks = {1: task(8), 2: task(4), 3: task(16), 4: task(2)}
+    result = schedule(tasks, {3: {1, 2}}, ORIGIN)
+
+    assert result['order'] == [1, 2, 3, 4]
+    assert result['blocked'] == []
+    assert result['project_finish'] == 24
+    assert result['critical_path'] == [1, 3]
+    timings = result['timings']
+    assert {task_id: timing['slack'] for task_id, timing in timings.items()} == {1: 0, 2: 4, 3: 0, 4: 22}
+    assert [task_id for task_id, timing in timings.items() if timing['critical']] == [1, 3]
+    assert timings[2] == {'earliest_start': 0, 'earliest_finish': 4, 'latest_start': 4, 'latest_finish': 8,
+                          'slack': 4, 'critical': False}
+    assert timings[3]['earliest_start'] == 8
+
+
+def test_schedule_honours_start_and_due_dates():
+    tasks = {1: task(8), 2: task(4, start=days(2)), 3: task(16), 4: task(2, due=days(1))}
+    result = schedule(tasks, {3: {1, 2}}, ORIGIN)
+    timings = result['timings']
+
+    # 2 cannot start before day 2, which pushes 3 back and takes 1 off the critical path
+    assert timings[2]['earliest_start'] == 2 * HOURS_PER_DAY
+    assert timings[3]['earliest_start'] == 20
+    assert result['project_finish'] == 36
+    assert result['critical_path'] == [2, 3]
+    assert timings[1]['slack'] == 12
+    # 4 must finish by the end of day 1
+    assert timings[4]['latest_finish'] == 2 * HOURS_PER_DAY
+    assert timings[4]['slack'] == 14
+
+
+def test_a_missed_due_date_gives_negative_slack_upstream_too():
+    tasks = {1: task(8), 2: task(4), 3: task(16, due=ORIGIN)}
+    timings = schedule(tasks, {3: {1, 2}}, ORIGIN)['timings']
+    assert {task_id: timing['slack'] for task_id, timing in timings.items()} == {1: -16, 2: -12, 3: -16}
+    assert all(timing['critical'] for timing in timings.values())
+
+
+@pytest.mark.parametrize('graph, path', [
+    # Two predecessors finish together: the lower id is the one on the path
+    ({3: {1, 2}}, [1, 3]),
+    # Two disconnected tasks finish together: the lower id is the path
+    ({}, [1]),
+])
+def test_critical_path_ties_go_to_the_lowest_id(graph, path):
+    tasks = {1: task(8), 2: task(8), 3: task(4)} if graph else {1: task(8), 2: task(8)}
+    result = schedule(tasks, graph, ORIGIN)
+    assert result['critical_path'] == path
+    assert result['timings'][2]['critical']
+
+
+def test_schedule_leaves_blocked_tasks_out():
+    tasks = {1: task(8), 2: task(4), 3: task(2)}
+    result = schedule(tasks, {1: {2}, 2: {1}}, ORIGIN)
+    assert result['order'] == [3]
+    assert result['blocked'] == [1, 2]
+    assert set(result['timings']) == {3}
+    assert result['critical_path'] == [3]
+    assert schedule({}, {}, ORIGIN) == {'order': [], 'blocked': [], 'project_finish': 0, 'critical_path': [],
+                                        'timings': {}}
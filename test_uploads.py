@@ -0,0 +1,113 @@
+"""The resumable chunked upload protocol under /api/uploads:
+    python -m pytest test_uploads.py
+"""
+import hashlib
+import os
+
+import pytest
+
+CONTENT = b'A statement uploaded in three chunks. ' * 10
+
+
+@pytest.fixture(scope='module', autouse=True)
+def no_workers(server, module_monkeypatch):
+    module_monkeypatch.setattr(server, 'JOB_WORKERS', 0)
+    module_monkeypatch.setattr(server, 'EXTRACTION_WORKERS', 0)
+
+
+@pytest.fixture(scope='module')
+def entity_id(client, headers):
+    return client.post('/api/entities', json={'name': 'Uploaded to'}, headers=headers).json['id']
+
+
+def start(client, headers, entity_id, content=CONTENT, **fields):
+    response = client.post(f'/api/entities/{entity_id}/uploads', headers=headers, json={
+        'filename': 'statement.txt', 'size': len(content), 'sha256': hashlib.sha256(content).hexdigest(), **fields})
+    assert response.status_code == 201, response.data
+    assert response.json['offset'] == 0
+    return response.json['upload_id']
+
+
+def put(client, headers, upload_id, offset, chunk):
+    return client.put(f'/api/uploads/{upload_id}?offset={offset}', headers=headers, data=chunk,
+                      content_type='application/octet-stream')
+
+
+def test_chunks_resume_from_the_reported_offset(server, client, headers, entity_id):
+    upload_id = start(client, headers, entity_id, title='Statement')
+    chunks = [CONTENT[:150], CONTENT[150:300], CONTENT[300:]]
+
+    assert put(client, headers, upload_id, 0, chunks[0]).json['offset'] == 150
+    # The connection drops before the client sees the reply; it asks where to continue
+    assert put(client, headers, upload_id, 150, chunks[1]).status_code == 200
+    assert client.get(f'/api/uploads/{upload_id}', headers=headers).json['offset'] == 300
+
+    # A replayed or skipped chunk is refused with the offset to continue from
+    for offset, chunk in ((150, chunks[1]), (0, chunks[0]), (350, chunks[2][50:])):
+        response = put(client, headers, upload_id, offset, chunk)
+        assert response.status_code == 409
+        assert response.json['offset'] == 300
+
+    response = client.post(f'/api/uploads/{upload_id}/complete', headers=headers)
+    assert response.status_code == 409
+    assert response.json['offset'] == 300
+
+    assert put(client, headers, upload_id, 300, chunks[2]).json['offset'] == len(CONTENT)
+    response = client.post(f'/api/uploads/{upload_id}/complete', headers=headers)
+    assert response.status_code == 201, response.data
+    document = response.json
+    assert (document['title'], document['file_size']) == ('Statement', len(CONTENT))
+    assert client.get(f"/api/documents/{document['id']}/download", headers=headers).get_data() == CONTENT
+
+    # The session and its staging file are gone
+    assert client.get(f'/api/uploads/{upload_id}', headers=headers).status_code == 404
+    assert not os.path.exists(server.staging_path(upload_id))
+
+
+def test_checksum_mismatch_restarts_the_upload(client, headers, entity_id):
+    upload_id = start(client, headers, entity_id)
+    corrupted = CONTENT[:-1] + b'!'
+    assert put(client, headers, upload_id, 0, corrupted).json['offset'] == len(CONTENT)
+
+    response = client.post(f'/api/uploads/{upload_id}/complete', headers=headers)
+    assert response.status_code == 422
+    assert response.json['offset'] == 0
+
+    assert put(client, headers, upload_id, 0, CONTENT).status_code == 200
+    assert client.post(f'/api/uploads/{upload_id}/complete', headers=headers).status_code == 201
+
+
+def test_chunks_cannot_run_past_the_declared_size(client, headers, entity_id):
+    upload_id = start(client, headers, entity_id)
+    response = put(client, headers, upload_id, 0, CONTENT + b'extra')
+    assert response.status_code == 400
+    assert client.get(f'/api/uploads/{upload_id}', headers=headers).json['offset'] == 0
+    assert put(client, headers, upload_id, 0, CONTENT).json['offset'] == len(CONTENT)
+
+
+def test_cancel_discards_the_staged_bytes(server, client, headers, entity_id):
+    upload_id = start(client, headers, entity_id)
+    put(client, headers, upload_id, 0, CONTENT[:100])
+    assert os.path.exists(server.staging_path(upload_id))
+
+    assert client.delete(f'/api/uploads/{upload_id}', headers=headers).status_code == 204
+    assert not os.path.exists(server.staging_path(upload_id))
+    assert put(client, headers, upload_id, 100, CONTENT[100:]).status_code == 404
+
+
+@pytest.mark.parametrize('fields, status', [
+    ({'filename': 'payload.exe'}, 400),
+    ({'size': 0}, 400),
+    ({'size': True}, 400),
+    ({'sha256': 'not a digest'}, 400),
+])
+def test_invalid_uploads_are_refused_up_front(client, headers, entity_id, fields, status):
+    body = {'filename': 'statement.txt', 'size': 10, 'sha256': '0' * 64, **fields}
+    assert client.post(f'/api/entities/{entity_id}/uploads', headers=headers, json=body).status_code == status
+
+
+def test_offset_is_required(client, headers, entity_id):
+    upload_id = start(client, headers, entity_id)
+    response = client.put(f'/api/uploads/{upload_id}', headers=headers, data=CONTENT,
+                          content_type='application/octet-stream')
+    assert response.status_code == 400
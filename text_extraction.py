@@ -0,0 +1,106 @@
+"""Plain-text extraction for uploaded documents.
+
+Runs inside worker processes, so it imports nothing from the app and touches no database.
+"""
+import zipfile
+import xml.etree.ElementTree as ET
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+# Longer documents are truncated; the search index only needs their vocabulary
+MAX_TEXT_CHARS = 1000000
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+class TextCollector:
+    """Accumulates text fragments up to MAX_TEXT_CHARS"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    @property
+    def full(self):
+        return self.size >= MAX_TEXT_CHARS
+
+    def add(self, text):
+        if text and not self.full:
+            text = text[:MAX_TEXT_CHARS - self.size]
+            self.parts.append(text)
+            self.size += len(text)
+
+    def text(self):
+        return ''.join(self.parts).strip()
+
+
+def extract_txt(path, collector):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        collector.add(f.read(MAX_TEXT_CHARS))
+
+
+def extract_docx(path, collector):
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+        for event, element in ET.iterparse(xml, events=('end',)):
+            if element.tag == WORD_NS + 't':
+                collector.add(element.text)
+            elif element.tag == WORD_NS + 'p':
+                collector.add('\n')
+                element.clear()
+            if collector.full:
+                break
+
+
+def extract_xlsx(path, collector):
+    # Cell text lives in the shared string table, or inline in the sheets for some writers
+    with zipfile.ZipFile(path) as archive:
+        names = [name for name in archive.namelist()
+                 if name == 'xl/sharedStrings.xml' or (name.startswith('xl/worksheets/') and name.endswith('.xml'))]
+        for name in names:
+            with archive.open(name) as xml:
+                for event, element in ET.iterparse(xml, events=('end',)):
+                    if element.tag == SHEET_NS + 't':
+                        collector.add(element.text)
+                        collector.add('\n')
+                    elif element.tag in (SHEET_NS + 'si', SHEET_NS + 'row'):
+                        element.clear()
+                    if collector.full:
+                        return
+
+
+def extract_pdf(path, collector):
+    reader = pypdf.PdfReader(path)
+    for page in reader.pages:
+        collector.add(page.extract_text())
+        collector.add('\n')
+        if collector.full:
+            break
+
+
+EXTRACTORS = {
+    'txt': extract_txt,
+    'docx': extract_docx,
+    'xlsx': extract_xlsx,
+}
+if pypdf is not None:
+    EXTRACTORS['pdf'] = extract_pdf
+
+
+def extract_document(path, extension):
+    """Extract a file's text, returning (status, text, error).
+
+    status is 'done', 'unsupported' (no extractor for this file type) or 'failed'.
+    """
+    extractor = EXTRACTORS.get((extension or '').lower())
+    if extractor is None:
+        return 'unsupported', None, None
+    collector = TextCollector()
+    try:
+        extractor(path, collector)
+    except Exception as e:
+        return 'failed', None, f'{type(e).__name__}: {e}'[:500]
+    return 'done', collector.text(), None